@@ -3,25 +3,9 @@ import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MinMaxScaler
-from xgboost import XGBRegressor
-from lightgbm import LGBMRegressor
 from datetime import timedelta
-from sqlalchemy import create_engine
-
-# ----------------------------
-# 🔌 Supabase DB Connection
-# ----------------------------
-username = 'postgres.bmwsulkktotsdxrhxlwp'
-password = 'GreenView1234'
-host = 'aws-1-eu-west-3.pooler.supabase.com'
-port = '5432'
-database = 'postgres'
-table_name = 'sustainability_table'
-
-db_url = f'postgresql://{username}:{password}@{host}:{port}/{database}'
-engine = create_engine(db_url)
+from app.services.data_store import dataset_store
+from app.services.model_registry import FEATURE_COLS, model_registry
 
 # ----------------------------
 # 🧠 App Config
@@ -30,50 +14,23 @@ st.set_page_config(page_title="GreenView Dashboard", layout="wide")
 st.title("🌱 GreenView – Sustainability Intelligence Dashboard")
 
 # ----------------------------
-# 📥 Load Data from Supabase
+# 📥 Load Prepared Data
 # ----------------------------
-@st.cache_data
-def load_data():
-    query = f"SELECT * FROM {table_name}"
-    return pd.read_sql(query, engine)
-
+# Same store as the API: loaded from Supabase (CSV fallback) and scored once per
+# data version, so widget reruns reuse the prepared frame.
 try:
-    df = load_data()
+    snapshot = dataset_store.get()
 except Exception as e:
     st.error(f"❌ Failed to load data from Supabase: {e}")
     st.stop()
 
-# ----------------------------
-# 🕒 Time Features
-# ----------------------------
-if 'Timestamp' in df.columns:
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-    df['Year'] = df['Timestamp'].dt.year
-    df['Month'] = df['Timestamp'].dt.month
-    df['DayOfYear'] = df['Timestamp'].dt.dayofyear
-    df['Elapsed_Days'] = (df['Timestamp'] - df['Timestamp'].min()).dt.days
-else:
-    st.error("⚠️ 'Timestamp' column missing in Supabase table.")
-    st.stop()
+df = snapshot.frame
+
+@st.cache_resource(max_entries=32, show_spinner="Training model...")
+def get_fitted_model(data_version, metric, model_name, _snapshot):
+    """Fitted model per (data version, metric, model); reruns only predict"""
+    return model_registry.get_model(_snapshot, metric, model_name).model
 
-# ----------------------------
-# 🌍 Sustainability Score
-# ----------------------------
-def calculate_sustainability_score(row):
-    weights = {
-        'CO2_Emissions_kg': -0.5,
-        'Energy_Consumption_kWh': -0.3,
-        'Waste_Generated_kg': -0.2
-    }
-    score = 0
-    for feature, weight in weights.items():
-        if feature in row:
-            score += weight * row[feature]
-    return score
-
-df['Sustainability_Score'] = df.apply(calculate_sustainability_score, axis=1)
-scaler = MinMaxScaler()
-df['Sustainability_Score'] = scaler.fit_transform(df[['Sustainability_Score']])
 latest_score = df['Sustainability_Score'].iloc[-1] * 100
 
 st.subheader("📊 Current Sustainability Score")
@@ -113,23 +70,14 @@ forecast_days = st.slider("⏳ Predict how many days into the future?", 30, 1095
 # ----------------------------
 # 🧪 Train Model(s)
 # ----------------------------
-feature_cols = ['Energy_Consumption_kWh', 'Elapsed_Days', 'Month', 'DayOfYear']
+feature_cols = FEATURE_COLS
 
 if metric_choice not in df.columns:
     st.warning(f"⚠️ Column '{metric_choice}' missing in the database.")
     st.stop()
 
-data = df.dropna(subset=feature_cols + [metric_choice])
-X = data[feature_cols]
-y = data[metric_choice]
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-xgb_model = XGBRegressor(n_estimators=100, learning_rate=0.1)
-lgbm_model = LGBMRegressor(n_estimators=100, learning_rate=0.1)
-
-xgb_model.fit(X_train, y_train)
-lgbm_model.fit(X_train, y_train)
+xgb_model = get_fitted_model(snapshot.version, metric_choice, "xgboost", snapshot)
+lgbm_model = get_fitted_model(snapshot.version, metric_choice, "lightgbm", snapshot)
 
 # ----------------------------
 # 🔮 Future Forecasts
@@ -0,0 +1,44 @@
+from fastapi import Request, Response
+from email.utils import format_datetime
+from datetime import timezone
+import hashlib
+import json
+
+def request_etag(snapshot, params):
+    """ETag of a response computed from `snapshot` with request parameters `params`"""
+    digest = hashlib.blake2b(json.dumps(params, sort_keys=True, default=str).encode(), digest_size=6).hexdigest()
+    return f'{snapshot.etag[:-1]}-{digest}"'
+
+def columns_etag(columns):
+    """ETag of a response that depends only on the dataset's column names"""
+    return f'"schema-{hashlib.blake2b(",".join(columns).encode(), digest_size=8).hexdigest()}"'
+
+def etag_matches(request: Request, etag):
+    """Whether `If-None-Match` lists `etag` (weak comparison, as RFC 9110 specifies for it)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+def validator_headers(etag, last_modified=None):
+    """ETag, Last-Modified and a revalidate-every-time Cache-Control"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+def not_modified(request: Request, response: Response, etag, last_modified=None):
+    """
+    Attach validators to `response`; return a bodiless 304 when the client's
+    `If-None-Match` already has `etag`, otherwise None.
+    """
+    headers = validator_headers(etag, last_modified)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,16 @@
+from fastapi import Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+from app.services.admission import API_AUTH, ApiClient, api_keys
+
+async def api_client(request: Request, x_api_key: Optional[str] = Header(None)) -> ApiClient:
+    """Identify the caller by `X-API-Key`; anonymous callers by address unless `API_AUTH=required`"""
+    if x_api_key:
+        name = await run_in_threadpool(api_keys.lookup, x_api_key)
+        if name is None:
+            raise HTTPException(status_code=401, detail="Invalid or expired API key")
+        return ApiClient(f"key:{name}", name, True)
+    if API_AUTH == "required":
+        raise HTTPException(status_code=401, detail="X-API-Key header required")
+    address = request.client.host if request.client else "unknown"
+    return ApiClient(f"anonymous:{address}", f"anonymous client {address}", False)
@@ -1,30 +1,22 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-import pandas as pd
-import numpy as np
+from typing import Optional, List, Dict, Any
 import re
-from xgboost import XGBRegressor
-from lightgbm import LGBMRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.ensemble import RandomForestRegressor
 import os
-from datetime import datetime
+from app.services.data_store import dataset_registry
+from app.services.model_registry import FEATURE_COLS, model_registry
+from app.services.forecast_cache import MAX_FORECAST_DAYS, forecast_cache
+from app.services.schema_catalog import schema_catalog
+from app.services.admission import ApiClient, ml_scheduler, rate_limiter
+from app.api.dependencies import api_client
 
 router = APIRouter(prefix="/ai-copilot", tags=["AI Copilot"])
 
-# Database configuration
-DB_USERNAME = os.getenv('DB_USERNAME', 'postgres.bmwsulkktotsdxrhxlwp')
-DB_PASSWORD = os.getenv('DB_PASSWORD', 'GreenView1234')
-DB_HOST = os.getenv('DB_HOST', 'aws-1-eu-west-3.pooler.supabase.com')
-DB_PORT = os.getenv('DB_PORT', '5432')
-DB_NAME = os.getenv('DB_NAME', 'postgres')
-TABLE_NAME = os.getenv('TABLE_NAME', 'sustainability_table')
-
 # Request/Response models
 class ChatbotRequest(BaseModel):
     question: str
+    dataset_id: Optional[str] = None
 
 class ChatbotResponse(BaseModel):
     metric: str
@@ -41,6 +33,21 @@ class ErrorResponse(BaseModel):
     error: str
     details: Optional[str] = None
 
+class ChatbotBatchRequest(BaseModel):
+    questions: List[str]
+    dataset_id: Optional[str] = None
+
+class ChatbotBatchItem(BaseModel):
+    question: str
+    answer: Optional[ChatbotResponse] = None
+    error: Optional[ErrorResponse] = None
+
+class ChatbotBatchResponse(BaseModel):
+    results: List[ChatbotBatchItem]
+
+# Questions accepted by one /chat/batch request
+COPILOT_BATCH_MAX_QUESTIONS = int(os.getenv('COPILOT_BATCH_MAX_QUESTIONS', '20'))
+
 # Supported metrics and aliases
 METRIC_MAP = {
     "co2": "CO2_Emissions_kg",
@@ -52,70 +59,6 @@ METRIC_MAP = {
     "power": "Electricity_Generation_MWh"
 }
 
-def load_data():
-    """Load data from database or CSV fallback"""
-    try:
-        # Try database first
-        from sqlalchemy import create_engine
-        db_url = f'postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
-        engine = create_engine(db_url)
-        df = pd.read_sql(f"SELECT * FROM {TABLE_NAME}", engine)
-        print("✅ Data loaded from database")
-        return df
-    except Exception as e:
-        print(f"⚠️ Database connection failed: {e}")
-        print("📁 Falling back to CSV data...")
-        try:
-            # Fallback to CSV
-            csv_path = os.path.join(os.path.dirname(__file__), "../../../sustainability_dataset.csv")
-            df = pd.read_csv(csv_path)
-            print("✅ Data loaded from CSV file")
-            return df
-        except Exception as csv_error:
-            print(f"⚠️ CSV loading failed: {csv_error}")
-            print("🔧 Generating sample data...")
-            # Generate sample data as last resort
-            np.random.seed(42)
-            dates = pd.date_range(start='2023-01-01', end='2024-01-01', freq='D')
-            n = len(dates)
-            
-            df = pd.DataFrame({
-                'Timestamp': dates,
-                'CO2_Emissions_kg': np.random.normal(150, 20, n),
-                'Energy_Consumption_kWh': np.random.normal(1000, 100, n),
-                'Waste_Generated_kg': np.random.normal(50, 10, n),
-                'Heat_Generation_MWh': np.random.normal(200, 30, n),
-                'Electricity_Generation_MWh': np.random.normal(1200, 150, n)
-            })
-            print("✅ Sample data generated")
-            return df
-
-def calculate_sustainability_score(row):
-    """Calculate sustainability score for a row"""
-    weights = {
-        'CO2_Emissions_kg': -0.5,
-        'Energy_Consumption_kWh': -0.3,
-        'Waste_Generated_kg': -0.2
-    }
-    return sum(row.get(k, 0) * w for k, w in weights.items())
-
-def prepare_data(df):
-    """Prepare data with time features and sustainability score"""
-    if 'Timestamp' not in df.columns:
-        raise HTTPException(status_code=400, detail="Missing 'Timestamp' column in dataset")
-    
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-    df['Year'] = df['Timestamp'].dt.year
-    df['Month'] = df['Timestamp'].dt.month
-    df['DayOfYear'] = df['Timestamp'].dt.dayofyear
-    df['Elapsed_Days'] = (df['Timestamp'] - df['Timestamp'].min()).dt.days
-    
-    # Calculate sustainability score
-    df['Sustainability_Score'] = df.apply(calculate_sustainability_score, axis=1)
-    df['Sustainability_Score'] = MinMaxScaler().fit_transform(df[['Sustainability_Score']])
-    
-    return df
-
 def parse_question(question: str) -> tuple[str, int, str]:
     """Parse natural language question to extract metric, days, and model"""
     question_lower = question.lower()
@@ -123,6 +66,8 @@ def parse_question(question: str) -> tuple[str, int, str]:
     # Extract days
     days_match = re.search(r"(\d+)\s*(day|days|din)", question_lower)
     days_ahead = int(days_match.group(1)) if days_match else 30
+    if days_ahead > MAX_FORECAST_DAYS:
+        raise HTTPException(status_code=400, detail=f"Forecasts reach at most {MAX_FORECAST_DAYS} days ahead")
     
     # Extract model
     model_name = "lightgbm" if "lightgbm" in question_lower else "xgboost" if "xgboost" in question_lower else "random_forest"
@@ -142,72 +87,97 @@ def parse_question(question: str) -> tuple[str, int, str]:
     
     return target, days_ahead, model_name
 
-def train_model_and_predict(df, target, days_ahead, model_name):
-    """Train model and make prediction"""
-    feature_cols = ['Energy_Consumption_kWh', 'Elapsed_Days', 'Month', 'DayOfYear']
-    
-    if target not in df.columns:
-        raise HTTPException(status_code=400, detail=f"'{target}' column not found in dataset")
-    
-    # Prepare data
-    data = df.dropna(subset=feature_cols + [target])
-    X = data[feature_cols]
-    y = data[target]
+def forecast_horizon(snapshot, target, days_ahead, model_name):
+    """Fetch the registered model and predict `days_ahead` days from the shared forecast horizon"""
+    df = snapshot.frame
     
-    if len(X) == 0:
+    if df[FEATURE_COLS + [target]].dropna().empty:
         raise HTTPException(status_code=400, detail="No valid data for training")
     
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    if days_ahead < 1:
+        raise HTTPException(status_code=400, detail="Forecast horizon must be at least 1 day")
     
-    # Train model based on selection
-    try:
-        if model_name == "xgboost":
-            model = XGBRegressor(n_estimators=100, random_state=42)
-        elif model_name == "lightgbm":
-            model = LGBMRegressor(n_estimators=100, random_state=42)
-        else:
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
-        
-        model.fit(X_train, y_train)
-    except Exception as e:
-        print(f"⚠️ {model_name} failed, falling back to RandomForest: {e}")
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
+    # Same fitted model and horizon cache as /ml-predictions/forecast
+    entry = model_registry.get_model(snapshot, target, model_name)
+    if entry.trained_name.endswith("_fallback"):
         model_name = "random_forest"
+    values, _ = forecast_cache.predict(snapshot, target, entry.trained_name, entry.model, days_ahead)
+    return values, model_name
+
+def forecast_answer(snapshot, target, days_ahead, values):
+    """Prediction `days_ahead` days out and the chart points, from horizon `values`"""
+    prediction = float(values[days_ahead - 1])
     
-    # Make prediction
-    future_day = df['Elapsed_Days'].max() + days_ahead
-    future_month = (df['Month'].iloc[-1] + (days_ahead // 30)) % 12 or 12
-    future_doy = (df['DayOfYear'].iloc[-1] + days_ahead) % 365 or 365
+    # Forecast data for chart, starting from today's observed value
+    step = max(1, days_ahead // 15)
+    forecast_data = [{"days_ahead": 0, "prediction": float(snapshot.frame[target].iloc[-1])}]
+    for d in range(step, days_ahead + 1, step):
+        forecast_data.append({"days_ahead": d, "prediction": float(values[d - 1])})
     
-    future_input = pd.DataFrame([{
-        'Energy_Consumption_kWh': df['Energy_Consumption_kWh'].iloc[-1],
-        'Elapsed_Days': future_day,
-        'Month': future_month,
-        'DayOfYear': future_doy
-    }])
+    return prediction, forecast_data
+
+def train_model_and_predict(snapshot, target, days_ahead, model_name):
+    """Fetch the registered model and read the prediction from the shared forecast horizon"""
+    values, model_name = forecast_horizon(snapshot, target, days_ahead, model_name)
+    prediction, forecast_data = forecast_answer(snapshot, target, days_ahead, values)
+    return prediction, forecast_data, model_name
+
+def chatbot_response(snapshot, target, days_ahead, prediction, forecast_data, actual_model):
+    """Compare a prediction with the latest observed value"""
+    current_value = snapshot.frame[target].iloc[-1]
     
-    prediction = model.predict(future_input)[0]
+    # Handle sustainability score scaling
+    if target == "Sustainability_Score":
+        prediction *= 100
+        current_value *= 100
+        forecast_data = [{**item, "prediction": item["prediction"] * 100} for item in forecast_data]
     
-    # Generate forecast data for chart
-    forecast_data = []
-    for d in range(0, days_ahead + 1, max(1, days_ahead // 15)):
-        ed = df['Elapsed_Days'].max() + d
-        m = (df['Month'].iloc[-1] + (d // 30)) % 12 or 12
-        doy = (df['DayOfYear'].iloc[-1] + d) % 365 or 365
-        row = pd.DataFrame([{
-            'Energy_Consumption_kWh': df['Energy_Consumption_kWh'].iloc[-1],
-            'Elapsed_Days': ed,
-            'Month': m,
-            'DayOfYear': doy
-        }])
-        pred = model.predict(row)[0]
-        forecast_data.append({"days_ahead": d, "prediction": float(pred)})
+    change = prediction - current_value
+    pct_change = (change / current_value) * 100 if current_value else 0
+    change_label = "increase" if change > 0 else "decrease"
     
-    return prediction, forecast_data, model_name
+    return ChatbotResponse(
+        metric=target.replace('_', ' '),
+        model=actual_model.upper(),
+        days_ahead=days_ahead,
+        prediction=round(prediction, 2),
+        current_value=round(current_value, 2),
+        change=round(change, 2),
+        percentage_change=round(pct_change, 1),
+        change_label=change_label,
+        forecast_data=forecast_data
+    )
+
+def answer_batch(snapshot, questions):
+    """
+    Answer parsed `questions` [(index, target, days_ahead, model_name)] with
+    one model and one horizon prediction per (target, model); returns
+    {index: ChatbotResponse or ErrorResponse}.
+    """
+    groups = {}
+    for index, target, days_ahead, model_name in questions:
+        groups.setdefault((target, model_name), []).append((index, days_ahead))
+
+    answers = {}
+    for (target, model_name), members in groups.items():
+        try:
+            values, actual_model = forecast_horizon(
+                snapshot, target, max(days_ahead for _, days_ahead in members), model_name
+            )
+        except HTTPException as e:
+            for index, _ in members:
+                answers[index] = ErrorResponse(error=str(e.detail))
+            continue
+        for index, days_ahead in members:
+            if days_ahead < 1:
+                answers[index] = ErrorResponse(error="Forecast horizon must be at least 1 day")
+                continue
+            prediction, forecast_data = forecast_answer(snapshot, target, days_ahead, values)
+            answers[index] = chatbot_response(snapshot, target, days_ahead, prediction, forecast_data, actual_model)
+    return answers
 
 @router.post("/chat", response_model=ChatbotResponse)
-async def chatbot_query(request: ChatbotRequest):
+async def chatbot_query(request: ChatbotRequest, client: ApiClient = Depends(api_client)):
     """
     Process natural language questions about sustainability metrics and return predictions.
     
@@ -217,44 +187,84 @@ async def chatbot_query(request: ChatbotRequest):
     - "What's the sustainability score in 60 days?"
     """
     try:
-        # Load and prepare data
-        df = load_data()
-        df = prepare_data(df)
-        
-        # Parse question
+        # Parse question and validate the metric before touching any data
         target, days_ahead, model_name = parse_question(request.question)
+        if request.dataset_id is None:
+            await run_in_threadpool(schema_catalog.require_column, target, f"'{target}' column not found in dataset")
+        
+        # Load and prepare data
+        snapshot = await dataset_registry.get_async(request.dataset_id)
+        df = snapshot.frame
+        if target not in df.columns:
+            raise HTTPException(status_code=400, detail=f"'{target}' column not found in dataset '{request.dataset_id}'")
         
         # Train model and predict
-        prediction, forecast_data, actual_model = train_model_and_predict(df, target, days_ahead, model_name)
+        rate_limiter.check(client, days_ahead)
+        async with ml_scheduler.slot(client):
+            prediction, forecast_data, actual_model = await run_in_threadpool(
+                train_model_and_predict, snapshot, target, days_ahead, model_name
+            )
         
-        # Calculate current value and changes
-        current_value = df[target].iloc[-1]
+        return chatbot_response(snapshot, target, days_ahead, prediction, forecast_data, actual_model)
         
-        # Handle sustainability score scaling
-        if target == "Sustainability_Score":
-            prediction *= 100
-            current_value *= 100
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/chat/batch", response_model=ChatbotBatchResponse)
+async def chatbot_batch_query(request: ChatbotBatchRequest, client: ApiClient = Depends(api_client)):
+    """
+    Answer several questions at once, in request order.
+    
+    Questions asking about the same metric with the same model share one
+    fitted model and one forecast over the longest horizon asked; a question
+    that cannot be answered gets an `error` instead of failing the batch.
+    """
+    try:
+        if not request.questions:
+            raise HTTPException(status_code=400, detail="At least one question is required")
+        if len(request.questions) > COPILOT_BATCH_MAX_QUESTIONS:
+            raise HTTPException(
+                status_code=400, detail=f"At most {COPILOT_BATCH_MAX_QUESTIONS} questions per batch"
+            )
         
-        change = prediction - current_value
-        pct_change = (change / current_value) * 100 if current_value else 0
-        change_label = "increase" if change > 0 else "decrease"
+        # Parse everything before touching any data
+        answers, parsed = {}, []
+        for index, question in enumerate(request.questions):
+            try:
+                parsed.append((index, *parse_question(question)))
+            except HTTPException as e:
+                answers[index] = ErrorResponse(error=str(e.detail))
         
-        # Scale forecast data if needed
-        if target == "Sustainability_Score":
-            for item in forecast_data:
-                item["prediction"] *= 100
+        if parsed:
+            snapshot = await dataset_registry.get_async(request.dataset_id)
+            available = []
+            for question in parsed:
+                target = question[1]
+                if target in snapshot.frame.columns:
+                    available.append(question)
+                else:
+                    dataset = f" '{request.dataset_id}'" if request.dataset_id else ""
+                    answers[question[0]] = ErrorResponse(error=f"'{target}' column not found in dataset{dataset}")
+            
+            if available:
+                # Charged for the work done: the longest horizon of each (metric, model)
+                horizons = {}
+                for _, target, days_ahead, model_name in available:
+                    horizons[target, model_name] = max(horizons.get((target, model_name), 0), days_ahead)
+                rate_limiter.check(client, sum(horizons.values()))
+                async with ml_scheduler.slot(client):
+                    answers.update(await run_in_threadpool(answer_batch, snapshot, available))
         
-        return ChatbotResponse(
-            metric=target.replace('_', ' '),
-            model=actual_model.upper(),
-            days_ahead=days_ahead,
-            prediction=round(prediction, 2),
-            current_value=round(current_value, 2),
-            change=round(change, 2),
-            percentage_change=round(pct_change, 1),
-            change_label=change_label,
-            forecast_data=forecast_data
-        )
+        results = []
+        for index, question in enumerate(request.questions):
+            answer = answers[index]
+            if isinstance(answer, ErrorResponse):
+                results.append(ChatbotBatchItem(question=question, error=answer))
+            else:
+                results.append(ChatbotBatchItem(question=question, answer=answer))
+        return ChatbotBatchResponse(results=results)
         
     except HTTPException:
         raise
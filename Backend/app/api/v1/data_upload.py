@@ -1,7 +1,110 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+from datetime import date
+from app.services.data_store import dataset_registry, dataset_store
+from app.services.data_export import EXPORT_FORMATS, EXPORT_MAX_PAGE_ROWS, EXPORT_PAGE_ROWS, export_page, export_stream
+from app.services.model_registry import model_registry
+from app.services.anomaly_detector import anomaly_detector
+from app.services.change_listener import change_listener
 
 router = APIRouter(prefix="/data-upload", tags=["Data Upload"])
 
+class AppendRowsRequest(BaseModel):
+    rows: List[Dict[str, Any]]
+    refresh_models: bool = True
+
+def append_and_refresh(rows, refresh_models):
+    """Append rows to the dataset, score them for anomalies and bring registered models up to date"""
+    # Build the baselines first so the appended rows are scored as they arrive
+    anomaly_detector.ensure_current()
+    snapshot = dataset_store.append_rows(rows)
+    anomalies = anomaly_detector.recent(version=snapshot.version, limit=len(rows) * len(anomaly_detector.metrics))
+    reports = model_registry.refresh_all(snapshot) if refresh_models else []
+    return snapshot, reports, anomalies
+
+@router.post("/rows")
+async def append_rows(request: AppendRowsRequest):
+    """
+    Append newly arrived sustainability rows (e.g. a day's readings).
+
+    Rows must contain every raw dataset column and are written to the
+    database table before they are served. When the dataset was loaded from
+    the CSV fallback the request is refused with 409 (the rows would be lost
+    at the next reload), and with 503 when the write fails. They are scored against each
+    facility's running baselines and any anomalies are returned. When
+    `refresh_models` is set, registered models are warm-started on the new rows, or refit when the
+    refresh policy requires it.
+    """
+    if not request.rows:
+        raise HTTPException(status_code=400, detail="No rows provided")
+
+    try:
+        snapshot, reports, anomalies = await run_in_threadpool(append_and_refresh, request.rows, request.refresh_models)
+        return {
+            "appended_rows": len(request.rows),
+            "dataset": snapshot.info(),
+            "model_refresh": reports,
+            "anomalies": anomalies
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/export")
+async def export_rows(
+    request: Request,
+    format: str = Query("csv", description="csv, ndjson or arrow (an Arrow IPC stream)"),
+    columns: Optional[List[str]] = Query(None, description="Columns to export (default: all, including derived ones)"),
+    start: Optional[date] = Query(None, description="First date to include"),
+    end: Optional[date] = Query(None, description="Last date to include"),
+    facility: Optional[List[str]] = Query(None, description="Only these facilities"),
+    region: Optional[List[str]] = Query(None, description="Only these regions"),
+    supplier: Optional[List[str]] = Query(None, description="Only these suppliers"),
+    cursor: Optional[str] = Query(None, description="`X-Next-Cursor` of the previous page"),
+    limit: int = Query(EXPORT_PAGE_ROWS, ge=1, le=EXPORT_MAX_PAGE_ROWS, description="Rows per page"),
+    dataset_id: Optional[str] = Query(None, description="Uploaded dataset to export instead of the default one")
+):
+    """
+    Stream one page of the prepared dataset in Timestamp order.
+
+    The body is encoded batch by batch as it is sent. When more rows match,
+    the `X-Next-Cursor` header (and a `Link: rel="next"` URL) continues
+    after the last row of this page.
+    """
+    try:
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+        snapshot = await dataset_registry.get_async(dataset_id)
+        filters = {"Facility": facility, "Region": region, "Supplier": supplier}
+        page = await run_in_threadpool(export_page, snapshot, columns, cursor, limit, start, end, filters)
+        body = export_stream(page, format)
+
+        extension = "arrows" if format == "arrow" else format
+        headers = {
+            "X-Data-Version": str(snapshot.version),
+            "X-Row-Count": str(len(page.positions)),
+            "Content-Disposition": f'attachment; filename="{dataset_id or "sustainability"}-v{snapshot.version}.{extension}"'
+        }
+        if page.next_cursor:
+            headers["X-Next-Cursor"] = page.next_cursor
+            headers["Link"] = f'<{request.url.include_query_params(cursor=page.next_cursor)}>; rel="next"'
+        return StreamingResponse(body, media_type=EXPORT_FORMATS[format], headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/changes")
+async def get_change_notifications():
+    """How the API learns about data changes (listening or polling) and what it has refreshed"""
+    return change_listener.stats()
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint for data upload service"""
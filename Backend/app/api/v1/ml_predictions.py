@@ -1,31 +1,39 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
+from datetime import date
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MinMaxScaler
-from xgboost import XGBRegressor
-from lightgbm import LGBMRegressor
-from sklearn.ensemble import RandomForestRegressor
-from datetime import timedelta
+from app.services.data_store import dataset_registry, dataset_store
+from app.services.model_registry import UPDATE_MODES, model_registry, require_models, require_target
+from app.services.downsampling import downsample_indices, downsample_points
+from app.services.result_cache import result_cache
+from app.services.forecast_cache import MAX_FORECAST_DAYS, forecast_cache
+from app.services.scenarios import scenario_label, simulate_scenarios
+from app.services.schema_catalog import schema_catalog
+from app.services.training_jobs import training_jobs
+from app.services.backtesting import BACKTEST_MAX_FOLDS, backtester
+from app.services.memory_budget import memory_budget
+from app.services.admission import TRAINING_FIT_COST, ApiClient, ml_scheduler, rate_limiter
+from app.api.dependencies import api_client
+from app.api.conditional import columns_etag, not_modified, request_etag
+import asyncio
+import json
+import time
 import os
 
 router = APIRouter(prefix="/ml-predictions", tags=["ML Predictions"])
 
-# Database configuration
-DB_USERNAME = os.getenv('DB_USERNAME', 'postgres.bmwsulkktotsdxrhxlwp')
-DB_PASSWORD = os.getenv('DB_PASSWORD', 'GreenView1234')
-DB_HOST = os.getenv('DB_HOST', 'aws-1-eu-west-3.pooler.supabase.com')
-DB_PORT = os.getenv('DB_PORT', '5432')
-DB_NAME = os.getenv('DB_NAME', 'postgres')
-TABLE_NAME = os.getenv('TABLE_NAME', 'sustainability_table')
-
 # Request/Response models
 class PredictionRequest(BaseModel):
     metric: str
-    forecast_days: int = 730
+    forecast_days: int = Field(730, ge=1, le=MAX_FORECAST_DAYS)
     models: Optional[List[str]] = ["xgboost", "lightgbm"]
+    max_points: Optional[int] = Field(None, ge=3)
+    downsample_method: str = Field("lttb", pattern="^(lttb|minmax)$")
+    dataset_id: Optional[str] = None
 
 class PredictionResponse(BaseModel):
     metric: str
@@ -35,151 +43,88 @@ class PredictionResponse(BaseModel):
     predictions: Dict[str, List[Dict[str, Any]]]
     latest_predictions: Dict[str, float]
 
+class ModelRefreshRequest(BaseModel):
+    metric: Optional[str] = None
+    models: Optional[List[str]] = None
+    mode: str = "auto"
+    rounds: Optional[int] = None
+
+class BacktestRequest(BaseModel):
+    metrics: List[str] = ["CO2_Emissions_kg"]
+    models: List[str] = ["xgboost", "lightgbm", "random_forest"]
+    folds: int = Field(5, ge=1, le=BACKTEST_MAX_FOLDS)
+    horizon_days: int = Field(30, ge=1, le=MAX_FORECAST_DAYS)
+    step_days: Optional[int] = Field(None, ge=1)
+
+class TrainingJobRequest(BaseModel):
+    metrics: List[str] = ["CO2_Emissions_kg"]
+    models: List[str] = ["xgboost", "lightgbm"]
+    mode: str = "auto"
+    rounds: Optional[int] = None
+    priority: int = 0
+
+class EnergyScenario(BaseModel):
+    name: Optional[str] = None
+    type: str = "constant"
+    level: Optional[float] = None
+    change_percent: Optional[float] = 0.0
+
+class ScenarioRequest(BaseModel):
+    metric: str
+    forecast_days: int = Field(365, ge=1, le=MAX_FORECAST_DAYS)
+    models: Optional[List[str]] = ["xgboost", "lightgbm"]
+    scenarios: List[EnergyScenario]
+    dataset_id: Optional[str] = None
+
 class SustainabilityScoreResponse(BaseModel):
     current_score: float
     score_percentage: float
     gauge_data: Dict[str, Any]
 
-def load_data():
-    """Load data from database or CSV fallback"""
-    try:
-        # Try database first
-        from sqlalchemy import create_engine
-        db_url = f'postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
-        engine = create_engine(db_url)
-        df = pd.read_sql(f"SELECT * FROM {TABLE_NAME}", engine)
-        print("✅ Data loaded from database")
-        return df
-    except Exception as e:
-        print(f"⚠️ Database connection failed: {e}")
-        print("📁 Falling back to CSV data...")
-        try:
-            # Fallback to CSV
-            csv_path = os.path.join(os.path.dirname(__file__), "../../../sustainability_dataset.csv")
-            df = pd.read_csv(csv_path)
-            print("✅ Data loaded from CSV file")
-            return df
-        except Exception as csv_error:
-            print(f"⚠️ CSV loading failed: {csv_error}")
-            print("🔧 Generating sample data...")
-            # Generate sample data as last resort
-            np.random.seed(42)
-            dates = pd.date_range(start='2023-01-01', end='2024-01-01', freq='D')
-            n = len(dates)
-            
-            df = pd.DataFrame({
-                'Timestamp': dates,
-                'CO2_Emissions_kg': np.random.normal(150, 20, n),
-                'Energy_Consumption_kWh': np.random.normal(1000, 100, n),
-                'Waste_Generated_kg': np.random.normal(50, 10, n),
-                'Heat_Generation_MWh': np.random.normal(200, 30, n),
-                'Electricity_Generation_MWh': np.random.normal(1200, 150, n)
-            })
-            print("✅ Sample data generated")
-            return df
-
-def calculate_sustainability_score(row):
-    """Calculate sustainability score for a row"""
-    weights = {
-        'CO2_Emissions_kg': -0.5,
-        'Energy_Consumption_kWh': -0.3,
-        'Waste_Generated_kg': -0.2
-    }
-    score = 0
-    for feature, weight in weights.items():
-        if feature in row:
-            score += weight * row[feature]
-    return score
-
-def prepare_data(df):
-    """Prepare data with time features and sustainability score"""
-    if 'Timestamp' not in df.columns:
-        raise HTTPException(status_code=400, detail="'Timestamp' column missing in dataset")
-    
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-    df['Year'] = df['Timestamp'].dt.year
-    df['Month'] = df['Timestamp'].dt.month
-    df['DayOfYear'] = df['Timestamp'].dt.dayofyear
-    df['Elapsed_Days'] = (df['Timestamp'] - df['Timestamp'].min()).dt.days
-    
-    # Calculate sustainability score
-    df['Sustainability_Score'] = df.apply(calculate_sustainability_score, axis=1)
-    scaler = MinMaxScaler()
-    df['Sustainability_Score'] = scaler.fit_transform(df[['Sustainability_Score']])
-    
-    return df
-
-def train_models(df, metric, feature_cols, models_to_use):
-    """Train models with fallback"""
-    data = df.dropna(subset=feature_cols + [metric])
-    X = data[feature_cols]
-    y = data[metric]
+def predict_series(snapshot, metric, model_name, model, forecast_days):
+    """Predict one model over the horizon and serialize the points"""
+    # Horizons are prefixes of each other: reuse the longest forecast already computed
+    pred, dates = forecast_cache.predict(snapshot, metric, model_name, model, forecast_days)
     
-    if len(X) == 0:
-        raise HTTPException(status_code=400, detail="No valid data for training")
+    # Scale predictions for sustainability score
+    if metric == 'Sustainability_Score':
+        pred = pred * 100
     
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    trained_models = {}
-    
-    for model_name in models_to_use:
-        try:
-            if model_name == "xgboost":
-                model = XGBRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
-            elif model_name == "lightgbm":
-                model = LGBMRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
-            else:
-                model = RandomForestRegressor(n_estimators=100, random_state=42)
-            
-            model.fit(X_train, y_train)
-            trained_models[model_name] = model
-            print(f"✅ {model_name} trained successfully")
-            
-        except Exception as e:
-            print(f"⚠️ {model_name} failed: {e}")
-            # Fallback to RandomForest
-            fallback_model = RandomForestRegressor(n_estimators=100, random_state=42)
-            fallback_model.fit(X_train, y_train)
-            trained_models[f"{model_name}_fallback"] = fallback_model
-            print(f"✅ {model_name} fallback (RandomForest) trained")
-    
-    return trained_models
+    points = [
+        {
+            "date": dates[i],
+            "prediction": float(pred[i]),
+            "days_ahead": i + 1
+        }
+        for i in range(len(pred))
+    ]
+    return points, float(pred[-1])
 
-def generate_predictions(df, models, metric, forecast_days, feature_cols):
+def generate_predictions(snapshot, models, metric, forecast_days):
     """Generate predictions for future dates"""
-    future_dates = [df['Timestamp'].max() + timedelta(days=i) for i in range(1, forecast_days + 1)]
-    future_df = pd.DataFrame({
-        'Energy_Consumption_kWh': df['Energy_Consumption_kWh'].iloc[-1],
-        'Elapsed_Days': range(df['Elapsed_Days'].max() + 1, df['Elapsed_Days'].max() + forecast_days + 1),
-        'Month': [(df['Month'].iloc[-1] + (i // 30)) % 12 or 12 for i in range(forecast_days)],
-        'DayOfYear': [(df['DayOfYear'].iloc[-1] + i) % 365 or 365 for i in range(forecast_days)]
-    })
-    future_df['Date'] = future_dates
-    
     predictions = {}
     latest_predictions = {}
     
     for model_name, model in models.items():
-        pred = model.predict(future_df[feature_cols])
-        
-        # Scale predictions for sustainability score
-        if metric == 'Sustainability_Score':
-            pred = pred * 100
-        
-        predictions[model_name] = [
-            {
-                "date": future_dates[i].isoformat(),
-                "prediction": float(pred[i]),
-                "days_ahead": i + 1
-            }
-            for i in range(len(pred))
-        ]
-        latest_predictions[model_name] = float(pred[-1])
+        predictions[model_name], latest_predictions[model_name] = predict_series(
+            snapshot, metric, model_name, model, forecast_days
+        )
     
     return predictions, latest_predictions
 
+async def load_snapshot(metric, dataset_id=None):
+    """Snapshot of the default or an uploaded dataset, checking that it has `metric`"""
+    if dataset_id is None:
+        await run_in_threadpool(schema_catalog.require_column, metric)
+        return await dataset_store.get_async()
+    snapshot = await dataset_registry.get_async(dataset_id)
+    if metric not in snapshot.frame.columns:
+        raise HTTPException(status_code=400, detail=f"Column '{metric}' not found in dataset '{dataset_id}'")
+    return snapshot
+
 @router.post("/forecast", response_model=PredictionResponse)
-async def create_forecast(request: PredictionRequest):
+async def create_forecast(request: PredictionRequest, http_request: Request, response: Response,
+                          client: ApiClient = Depends(api_client)):
     """
     Create forecasts for sustainability metrics using XGBoost and LightGBM models.
     
@@ -189,110 +134,544 @@ async def create_forecast(request: PredictionRequest):
     - Sustainability_Score
     - Heat_Generation_MWh
     - Electricity_Generation_MWh
+    
+    Responses carry an ETag of the data version and request; sending it back
+    in `If-None-Match` gets a 304 while the data is unchanged.
     """
     try:
-        # Load and prepare data
-        df = load_data()
-        df = prepare_data(df)
-        
-        metric = request.metric
-        forecast_days = request.forecast_days
-        models_to_use = request.models or ["xgboost", "lightgbm"]
-        
-        if metric not in df.columns:
-            raise HTTPException(status_code=400, detail=f"Column '{metric}' not found in dataset")
-        
-        # Prepare features
-        feature_cols = ['Energy_Consumption_kWh', 'Elapsed_Days', 'Month', 'DayOfYear']
-        
-        # Train models
-        models = train_models(df, metric, feature_cols, models_to_use)
-        
-        if not models:
-            raise HTTPException(status_code=400, detail="No models could be trained")
+        require_target(request.metric)
+        require_models(request.models or ["xgboost", "lightgbm"])
+        snapshot = await load_snapshot(request.metric, request.dataset_id)
+        params = request.model_dump()
+        params["model_identity"] = model_registry.identity(
+            request.dataset_id, request.metric, request.models or ["xgboost", "lightgbm"]
+        )
+        cached = not_modified(http_request, response, request_etag(snapshot, params), snapshot.max_timestamp)
+        if cached is not None:
+            return cached
+        rate_limiter.check(client, len(request.models or ["xgboost", "lightgbm"]) * request.forecast_days)
+        async with ml_scheduler.slot(client):
+            payload = await run_in_threadpool(
+                result_cache.get_or_compute, "forecast", params, snapshot.fingerprint,
+                lambda: compute_forecast(snapshot, request)
+            )
+        return PredictionResponse(**payload)
         
-        # Generate predictions
-        predictions, latest_predictions = generate_predictions(df, models, metric, forecast_days, feature_cols)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def compute_forecast(snapshot, request):
+    """Train or reuse models and build the forecast payload for one request"""
+    df = snapshot.frame
+    
+    metric = request.metric
+    forecast_days = request.forecast_days
+    models_to_use = request.models or ["xgboost", "lightgbm"]
+    
+    # Reuse registered models, warm-starting or refitting them when the data changed
+    models = model_registry.get_models(snapshot, metric, models_to_use)
+    
+    if not models:
+        raise HTTPException(status_code=400, detail="No models could be trained")
+    
+    # Generate predictions
+    predictions, latest_predictions = generate_predictions(snapshot, models, metric, forecast_days)
+    
+    # Reduce each series to what the chart can display, keeping peaks
+    if request.max_points is not None:
+        predictions = {
+            name: downsample_points(points, request.max_points, "prediction", "days_ahead", request.downsample_method)
+            for name, points in predictions.items()
+        }
+    
+    # Get current value
+    current_value = df[metric].iloc[-1]
+    if metric == 'Sustainability_Score':
+        current_value *= 100
+    
+    # Get current sustainability score
+    sustainability_score = df['Sustainability_Score'].iloc[-1] * 100
+    
+    return {
+        "metric": metric,
+        "forecast_days": forecast_days,
+        "current_value": round(float(current_value), 2),
+        "sustainability_score": round(float(sustainability_score), 2),
+        "predictions": predictions,
+        "latest_predictions": latest_predictions
+    }
+
+def format_stream_event(event, payload, stream_format, retry_after=None):
+    """Serialize one forecast stream event as an SSE frame or an NDJSON line"""
+    if stream_format == "sse":
+        retry = f"retry: {int(retry_after * 1000)}\n" if retry_after is not None else ""
+        return f"{retry}event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"event": event, **payload}) + "\n"
+
+def _train_and_predict(snapshot, model_name, forecast_days, metric, max_points=None, downsample_method="lttb"):
+    """Train or refresh one model and predict the full horizon (runs in a worker thread)"""
+    started = time.perf_counter()
+    entry, report = model_registry.refresh(snapshot, metric, model_name)
+    predictions, latest = predict_series(
+        snapshot, metric, entry.trained_name, entry.model, forecast_days
+    )
+    predictions = downsample_points(predictions, max_points, "prediction", "days_ahead", downsample_method)
+    return {
+        "requested_model": model_name,
+        "model": entry.trained_name,
+        "update": report["action"],
+        "predictions": predictions,
+        "latest_prediction": latest,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    }
+
+async def forecast_event_stream(request: PredictionRequest, stream_format: str, client: ApiClient):
+    """Yield forecast events, emitting each model's predictions as soon as it finishes"""
+    started = time.perf_counter()
+    metric = request.metric
+    forecast_days = request.forecast_days
+    models_to_use = request.models or ["xgboost", "lightgbm"]
+    
+    try:
+        yield format_stream_event("progress", {"stage": "loading data"}, stream_format)
+        snapshot = await load_snapshot(metric, request.dataset_id)
+        df = snapshot.frame
         
-        # Get current value
         current_value = df[metric].iloc[-1]
         if metric == 'Sustainability_Score':
             current_value *= 100
         
-        # Get current sustainability score
-        sustainability_score = df['Sustainability_Score'].iloc[-1] * 100
+        yield format_stream_event("summary", {
+            "metric": metric,
+            "forecast_days": forecast_days,
+            "current_value": round(float(current_value), 2),
+            "sustainability_score": round(float(df['Sustainability_Score'].iloc[-1] * 100), 2),
+            "models": models_to_use
+        }, stream_format)
         
-        return PredictionResponse(
-            metric=metric,
-            forecast_days=forecast_days,
-            current_value=round(current_value, 2),
-            sustainability_score=round(sustainability_score, 2),
-            predictions=predictions,
-            latest_predictions=latest_predictions
-        )
+        async with ml_scheduler.slot(client):
+            # Train all requested models concurrently; boosting libraries release the GIL
+            tasks = [
+                asyncio.ensure_future(run_in_threadpool(
+                    _train_and_predict, snapshot, model_name, forecast_days, metric,
+                    request.max_points, request.downsample_method
+                ))
+                for model_name in models_to_use
+            ]
+            for model_name in models_to_use:
+                yield format_stream_event("progress", {"stage": f"training {model_name}"}, stream_format)
+            
+            latest_predictions = {}
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    result = await next_result
+                    latest_predictions[result["model"]] = result["latest_prediction"]
+                    yield format_stream_event("model", result, stream_format)
+            finally:
+                for task in tasks:
+                    task.cancel()
+        
+        yield format_stream_event("complete", {
+            "latest_predictions": latest_predictions,
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }, stream_format)
+        
+    except HTTPException as e:
+        payload = {"status_code": e.status_code, "detail": e.detail}
+        # Headers are already sent; a busy-capacity 429 carries its Retry-After in the event
+        retry_after = (e.headers or {}).get("Retry-After")
+        if retry_after is not None:
+            retry_after = payload["retry_after"] = int(retry_after)
+        yield format_stream_event("error", payload, stream_format, retry_after)
+    except Exception as e:
+        yield format_stream_event("error", {"status_code": 500, "detail": f"Internal server error: {str(e)}"}, stream_format)
+
+@router.post("/forecast/stream")
+async def stream_forecast(
+    request: PredictionRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="Stream encoding: ndjson or sse"),
+    client: ApiClient = Depends(api_client)
+):
+    """
+    Streaming variant of /forecast.
+    
+    Emits `progress` events while data loads and models train, one `summary`
+    event, one `model` event per model as soon as its predictions are ready
+    (fastest model first), and a final `complete` (or `error`) event.
+    Use `format=sse` for Server-Sent Events, otherwise newline-delimited JSON.
+    """
+    require_target(request.metric)
+    require_models(request.models or ["xgboost", "lightgbm"])
+    rate_limiter.check(client, len(request.models or ["xgboost", "lightgbm"]) * request.forecast_days)
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        forecast_event_stream(request, format, client),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/scenarios")
+async def simulate_energy_scenarios(request: ScenarioRequest, client: ApiClient = Depends(api_client)):
+    """
+    What-if forecasts under alternative Energy_Consumption_kWh trajectories.
+    
+    Each scenario is `constant` (a fixed `level` in kWh, or the last observed
+    value changed by `change_percent`) or a linear `ramp` from the last
+    observed value to that target. All scenarios and horizon days are scored
+    in one stacked feature matrix with a single predict call per model;
+    `predictions[model][i][d]` is scenario i on horizon day d + 1.
+    """
+    try:
+        require_target(request.metric)
+        require_models(request.models or ["xgboost", "lightgbm"])
+        rate_limiter.check(client, len(request.models or ["xgboost", "lightgbm"]) * request.forecast_days)
+        async with ml_scheduler.slot(client):
+            snapshot = await load_snapshot(request.metric, request.dataset_id)
+            params = request.model_dump()
+            params["model_identity"] = model_registry.identity(
+                request.dataset_id, request.metric, request.models or ["xgboost", "lightgbm"]
+            )
+            return await run_in_threadpool(
+                result_cache.get_or_compute, "scenarios", params, snapshot.fingerprint,
+                lambda: compute_scenarios(snapshot, request)
+            )
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@router.get("/sustainability-score", response_model=SustainabilityScoreResponse)
-async def get_sustainability_score():
-    """Get current sustainability score with gauge data for visualization"""
-    try:
-        # Load and prepare data
-        df = load_data()
-        df = prepare_data(df)
-        
-        # Get latest sustainability score
-        latest_score = df['Sustainability_Score'].iloc[-1] * 100
-        
-        # Prepare gauge data for visualization
-        gauge_data = {
-            "value": latest_score,
-            "axis_range": [0, 100],
-            "steps": [
-                {"range": [0, 40], "color": "red"},
-                {"range": [40, 70], "color": "orange"},
-                {"range": [70, 100], "color": "lightgreen"}
-            ]
+def compute_scenarios(snapshot, request):
+    """Score every requested energy scenario over the horizon for each model"""
+    df = snapshot.frame
+    metric = request.metric
+    
+    scenarios = [scenario.model_dump() for scenario in request.scenarios]
+    models = model_registry.get_models(snapshot, metric, request.models or ["xgboost", "lightgbm"])
+    future_dates, trajectories, results = simulate_scenarios(df, models, metric, scenarios, request.forecast_days)
+    
+    names = [scenario_label(scenario) for scenario in scenarios]
+    current_value = df[metric].iloc[-1]
+    if metric == 'Sustainability_Score':
+        current_value *= 100
+    
+    return {
+        "metric": metric,
+        "forecast_days": request.forecast_days,
+        "current_value": round(float(current_value), 2),
+        "base_energy_kwh": round(float(df['Energy_Consumption_kWh'].iloc[-1]), 2),
+        "dates": [date.isoformat() for date in future_dates],
+        "scenarios": [
+            {**scenario, "name": name, "final_energy_kwh": round(float(trajectory[-1]), 2)}
+            for scenario, name, trajectory in zip(scenarios, names, trajectories)
+        ],
+        "predictions": {
+            model_name: np.round(pred, 4).tolist()
+            for model_name, pred in results.items()
+        },
+        "final_predictions": {
+            model_name: {name: round(float(value), 2) for name, value in zip(names, pred[:, -1])}
+            for model_name, pred in results.items()
         }
+    }
+
+@router.post("/backtest")
+async def backtest_models(request: BacktestRequest, client: ApiClient = Depends(api_client)):
+    """
+    Rolling-origin backtest of each metric x model.
+    
+    Rows are taken in time order: every fold trains on the history before its
+    origin and forecasts the next `horizon_days` (origins `step_days` apart,
+    default `horizon_days`). Returns MAE and MAPE per horizon day, the best
+    model per metric and the total wall time. Folds run in parallel processes.
+    """
+    try:
+        for metric in request.metrics:
+            await run_in_threadpool(schema_catalog.require_column, metric)
+        rate_limiter.check(client, len(request.metrics) * len(request.models) * request.folds * request.horizon_days)
+        async with ml_scheduler.slot(client):
+            snapshot = await dataset_store.get_async()
+            return await run_in_threadpool(
+                result_cache.get_or_compute, "backtest", request.model_dump(), snapshot.fingerprint,
+                lambda: backtester.run(snapshot.frame, list(dict.fromkeys(request.metrics)), list(dict.fromkeys(request.models)),
+                                       request.folds, request.horizon_days, request.step_days)
+            )
         
-        return SustainabilityScoreResponse(
-            current_score=round(latest_score, 2),
-            score_percentage=round(latest_score, 2),
-            gauge_data=gauge_data
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/sustainability-score", response_model=SustainabilityScoreResponse)
+async def get_sustainability_score(request: Request, response: Response):
+    """Get current sustainability score with gauge data for visualization (304 for a current `If-None-Match`)"""
+    try:
+        snapshot = await dataset_store.get_async()
+        cached = not_modified(request, response, snapshot.etag, snapshot.max_timestamp)
+        if cached is not None:
+            return cached
+        payload = await run_in_threadpool(
+            result_cache.get_or_compute, "sustainability-score", {}, snapshot.fingerprint,
+            lambda: compute_sustainability_score(snapshot.frame)
         )
+        return SustainabilityScoreResponse(**payload)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def compute_sustainability_score(df):
+    """Latest sustainability score with gauge data for visualization"""
+    latest_score = float(df['Sustainability_Score'].iloc[-1] * 100)
+    
+    # Prepare gauge data for visualization
+    gauge_data = {
+        "value": latest_score,
+        "axis_range": [0, 100],
+        "steps": [
+            {"range": [0, 40], "color": "red"},
+            {"range": [40, 70], "color": "orange"},
+            {"range": [70, 100], "color": "lightgreen"}
+        ]
+    }
+    
+    return {
+        "current_score": round(latest_score, 2),
+        "score_percentage": round(latest_score, 2),
+        "gauge_data": gauge_data
+    }
+
 @router.get("/available-metrics")
-async def get_available_metrics():
-    """Get list of available metrics for prediction"""
+async def get_available_metrics(request: Request, response: Response):
+    """Get list of available metrics for prediction (304 for a current `If-None-Match`)"""
     try:
-        df = load_data()
-        available_metrics = [
-            'CO2_Emissions_kg',
-            'Waste_Generated_kg',
-            'Sustainability_Score',
-            'Heat_Generation_MWh',
-            'Electricity_Generation_MWh'
-        ]
+        # Schema metadata only: no data is loaded to answer this
+        raw_columns = await run_in_threadpool(schema_catalog.raw_columns)
+        snapshot = dataset_store.peek()
+        if snapshot is not None:
+            etag, last_modified = snapshot.etag, snapshot.max_timestamp
+        else:
+            # Not loaded yet: the metric list depends on the columns alone
+            etag, last_modified = columns_etag(raw_columns), None
+        cached = not_modified(request, response, etag, last_modified)
+        if cached is not None:
+            return cached
+        return compute_available_metrics(raw_columns)
         
-        # Filter to only include metrics that exist in the dataset
-        existing_metrics = [metric for metric in available_metrics if metric in df.columns]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def compute_available_metrics(raw_columns):
+    """Forecastable metrics present in the raw dataset"""
+    available_metrics = [
+        'CO2_Emissions_kg',
+        'Waste_Generated_kg',
+        'Sustainability_Score',
+        'Heat_Generation_MWh',
+        'Electricity_Generation_MWh'
+    ]
+    
+    # Filter to only include metrics that exist in the dataset
+    existing_metrics = [metric for metric in available_metrics if metric in raw_columns]
+    
+    return {
+        "available_metrics": existing_metrics,
+        "total_metrics": len(existing_metrics)
+    }
+
+@router.get("/schema")
+async def get_schema():
+    """Column names, types and row count of the dataset, without reading any rows"""
+    try:
+        return await run_in_threadpool(schema_catalog.describe)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/history")
+async def get_history(
+    metric: str = Query(..., description="Metric column to return"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample to at most this many points"),
+    method: str = Query("lttb", description="Downsampling method: lttb or minmax"),
+    start: Optional[date] = Query(None, description="First date to include"),
+    end: Optional[date] = Query(None, description="Last date to include"),
+    facility: Optional[List[str]] = Query(None, description="Only these facilities"),
+    region: Optional[List[str]] = Query(None, description="Only these regions"),
+    supplier: Optional[List[str]] = Query(None, description="Only these suppliers")
+):
+    """
+    Historical values of a metric in time order, for charting next to forecasts.
+    
+    With `max_points`, the series is reduced server-side using a shape-preserving
+    method (LTTB by default, or per-bucket min/max) so peaks stay visible.
+    Date and facility/region/supplier filters are pushed down to the data
+    layer, so only matching rows are read.
+    """
+    try:
+        await run_in_threadpool(schema_catalog.require_column, metric)
+        filters = {"Facility": facility, "Region": region, "Supplier": supplier}
+        df, _, pushdown = await run_in_threadpool(
+            dataset_store.query, ['Timestamp', metric], start, end, filters
+        )
+        
+        history = df[['Timestamp', metric]].dropna().sort_values('Timestamp', kind='stable')
+        values = history[metric].to_numpy(dtype=np.float64)
+        if metric == 'Sustainability_Score':
+            values = values * 100
+        timestamps = history['Timestamp'].to_numpy()
+        
+        indices = downsample_indices(timestamps.astype('datetime64[s]').astype(np.float64), values, max_points, method)
+        points = [
+            {"date": pd.Timestamp(timestamps[i]).isoformat(), "value": float(values[i])}
+            for i in indices
+        ]
         
         return {
-            "available_metrics": existing_metrics,
-            "total_metrics": len(existing_metrics)
+            "metric": metric,
+            "pushdown": pushdown,
+            "total_points": len(values),
+            "returned_points": len(points),
+            "points": points
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.get("/models")
+async def list_models():
+    """List registered models with their data version, size and hold-out error"""
+    snapshot = dataset_store.peek()
+    return {
+        "dataset": snapshot.info() if snapshot else None,
+        "models": [entry.info() for entry in model_registry.entries()]
+    }
+
+@router.post("/models/refresh")
+async def refresh_models(request: ModelRefreshRequest, client: ApiClient = Depends(api_client)):
+    """
+    Bring registered models up to date with the latest data.
+    
+    - `auto`: warm-start on the new rows, or refit when the refresh policy requires it
+    - `incremental`: always warm-start unless the trained history changed
+    - `full`: refit from scratch
+    
+    When `models` is given, those models are trained for `metric` even if not yet registered.
+    """
+    try:
+        if request.mode not in UPDATE_MODES:
+            raise HTTPException(status_code=400, detail=f"Unknown update mode '{request.mode}'. Use one of: {', '.join(UPDATE_MODES)}")
+        
+        if request.metric:
+            await run_in_threadpool(schema_catalog.require_column, request.metric)
+            require_target(request.metric)
+        if request.models:
+            require_models(request.models)
+        if request.models and request.metric:
+            fits = len(request.models)
+        else:
+            fits = sum(
+                1 for entry in model_registry.entries("default")
+                if (request.metric is None or entry.metric == request.metric)
+                and (request.models is None or entry.model_name in request.models)
+            )
+        rate_limiter.check(client, fits * TRAINING_FIT_COST)
+        
+        async with ml_scheduler.slot(client):
+            snapshot = await dataset_store.get_async()
+            if request.models and request.metric:
+                reports = []
+                for model_name in request.models:
+                    _, report = await run_in_threadpool(
+                        model_registry.refresh, snapshot, request.metric, model_name, request.mode, request.rounds
+                    )
+                    reports.append(report)
+            else:
+                reports = await run_in_threadpool(
+                    model_registry.refresh_all, snapshot, request.mode, request.rounds, request.metric, request.models
+                )
+        
+        return {"dataset": snapshot.info(), "refreshed": reports}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/jobs", status_code=202)
+async def submit_training_job(request: TrainingJobRequest, client: ApiClient = Depends(api_client)):
+    """
+    Queue training of every metric x model in the background.
+    
+    Returns immediately with the job id; poll `/jobs/{job_id}` for progress.
+    Higher `priority` jobs run first. Models land in the same registry the
+    forecast endpoints read from. `mode="streaming"` instead streams the table
+    in chunks and trains on a bounded time-stratified sample; those models serve
+    the default dataset like any other.
+    """
+    try:
+        rate_limiter.check(client, len(set(request.metrics)) * len(set(request.models)) * TRAINING_FIT_COST)
+        # Queued behind the same fair scheduler as direct training, so one key cannot flood the queue
+        async with ml_scheduler.slot(client):
+            job = await run_in_threadpool(
+                training_jobs.submit, request.metrics, request.models, request.mode, request.rounds, request.priority
+            )
+        return job.info()
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/jobs")
+async def list_training_jobs(
+    status: Optional[str] = Query(None, description="Only jobs with this status"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """List recent training jobs, newest first"""
+    try:
+        jobs = await run_in_threadpool(training_jobs.list, status, limit)
+        return {"jobs": [job.info() for job in jobs]}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """Status, progress and per-task reports of one training job"""
+    job = await run_in_threadpool(training_jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job '{job_id}' not found")
+    return job.info()
+
+@router.delete("/jobs/{job_id}")
+async def cancel_training_job(job_id: str):
+    """Cancel a queued job, or stop a running one after its current task"""
+    job = await run_in_threadpool(training_jobs.cancel, job_id)
+    return job.info()
+
+@router.get("/cache-stats")
+async def cache_stats():
+    """Hit rates of the computed-result cache per endpoint and of forecast horizon reuse"""
+    return {**result_cache.stats(), "forecast_horizons": forecast_cache.stats()}
+
+@router.get("/admission")
+async def admission_stats():
+    """Token buckets per client and the fair training queue"""
+    return {"rate_limits": rate_limiter.stats(), "training_slots": ml_scheduler.stats()}
+
+@router.get("/memory")
+async def memory_residency():
+    """Datasets, training matrices, models and forecasts resident under the memory budget"""
+    return memory_budget.resident()
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint for the ML predictions service"""
@@ -1,7 +1,207 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import date
+from app.services.sector_emissions import STATS, get_sector_index
+from app.services.analytics_cube import AGGREGATES, analytics_cube
+from app.services.anomaly_detector import anomaly_detector
+from app.services.rolling_stats import rolling_stats
 
 router = APIRouter(prefix="/sustainability", tags=["Sustainability"])
 
+# Request/Response models
+class SectorEmissionsQuery(BaseModel):
+    start_year: int
+    end_year: int
+    sectors: Optional[List[str]] = None
+    stats: Optional[List[str]] = None
+
+class SectorEmissionsBatchRequest(BaseModel):
+    queries: List[SectorEmissionsQuery]
+
+@router.get("/sector-emissions")
+async def get_sector_emissions_info():
+    """Year range and sectors available in the world CO2 emissions by sector dataset"""
+    try:
+        return get_sector_index().info()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/sector-emissions/range")
+async def get_sector_emissions_range(
+    start_year: int = Query(..., description="First year of the window (inclusive)"),
+    end_year: int = Query(..., description="Last year of the window (inclusive)"),
+    sectors: Optional[List[str]] = Query(None, description="Sectors to include (default: all)"),
+    stats: Optional[List[str]] = Query(None, description=f"Subset of: {', '.join(STATS)}")
+):
+    """
+    World CO2 emissions by sector over a year window.
+
+    Returns the window total per sector, each sector's share of the window
+    total, compound annual growth rate between the first and last year, and
+    the year-over-year delta of the last year. Every statistic is answered
+    from precomputed prefix sums in constant time.
+    """
+    try:
+        index = get_sector_index()
+        index.validate_window(start_year, end_year)
+        index.sector_positions(sectors)
+        result = index.query(start_year, end_year, sectors, stats or STATS)
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/sector-emissions/query")
+async def query_sector_emissions(request: SectorEmissionsBatchRequest):
+    """
+    Batched form of /sector-emissions/range for dashboard panels.
+
+    All queries are answered in one vectorized pass and returned in request
+    order; an invalid query yields an `error` entry without failing the batch.
+    """
+    try:
+        index = get_sector_index()
+        results = index.query_many([q.model_dump() for q in request.queries])
+        return {"results": results, "total_queries": len(results)}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/rollups/dimensions")
+async def get_rollup_dimensions():
+    """Dimensions, members and measures available in the analytics cube"""
+    try:
+        snapshot = await run_in_threadpool(analytics_cube.ensure_current)
+        return {
+            "data_version": snapshot.version,
+            "dimensions": analytics_cube.dimensions(),
+            "granularities": ["day", "week", "month"],
+            "measures": analytics_cube.measures,
+            "cells": analytics_cube.cell_count()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/rollups")
+async def get_rollups(
+    dimension: str = Query("facility", description="facility, region, supplier or all"),
+    granularity: str = Query("month", description="day, week or month"),
+    start: Optional[date] = Query(None, description="First date to include"),
+    end: Optional[date] = Query(None, description="Last date to include"),
+    members: Optional[List[str]] = Query(None, description="Restrict to these facilities/regions/suppliers"),
+    measures: Optional[List[str]] = Query(None, description="Measures to return (default: all)"),
+    aggregates: Optional[List[str]] = Query(None, description="sum and/or mean")
+):
+    """
+    Energy, CO2, water, waste, renewable and recycled percentage rollups per
+    facility, region or supplier by day, week or month.
+
+    Served from a cube materialized from the cached dataset and updated
+    incrementally as rows are appended, so requests never group the full table.
+    Only rows from `start` through `end` are counted; a week or month cut by
+    either date is summed from its days in range and marked `partial`.
+    """
+    try:
+        snapshot = await run_in_threadpool(analytics_cube.ensure_current)
+        results = analytics_cube.query(
+            dimension, granularity, start, end, members, measures, aggregates or AGGREGATES
+        )
+        return {
+            "dimension": dimension,
+            "granularity": granularity,
+            "data_version": snapshot.version,
+            "rollups": results,
+            "total_cells": len(results)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/rolling")
+async def get_rolling_stats(
+    dimension: str = Query("facility", description="facility or region"),
+    windows: Optional[List[int]] = Query(None, description="Window lengths in days (default: 7, 30 and 90)"),
+    measures: Optional[List[str]] = Query(None, description="Measures to return (default: all)"),
+    percentiles: Optional[List[float]] = Query(None, description="Percentiles to return (default: 50 and 90)"),
+    members: Optional[List[str]] = Query(None, description="Restrict to these facilities/regions")
+):
+    """
+    Rolling means and percentiles of energy, CO2, renewable and recycled
+    percentages per facility or region over the last 7, 30 and 90 days.
+
+    Answered for every member at once from ring-buffer windows that advance
+    as rows are appended, so requests never recompute rolling groups over
+    the full history.
+    """
+    try:
+        snapshot = await run_in_threadpool(rolling_stats.ensure_current)
+        as_of, results = rolling_stats.query(dimension, windows, measures, percentiles or (50, 90), members)
+        return {
+            "dimension": dimension,
+            "as_of": as_of,
+            "data_version": snapshot.version,
+            "stats": results,
+            "total_members": len(results)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/anomalies")
+async def get_anomalies(
+    facility: Optional[str] = Query(None, description="Only this facility"),
+    metric: Optional[str] = Query(None, description="Only this metric"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Recent readings that jumped away from their facility's running baseline.
+
+    Each facility and metric keeps online statistics (Welford mean/variance,
+    EWMA level, streaming quartiles) updated as rows arrive; a reading is
+    reported when both its robust z-score and its deviation from the EWMA
+    level exceed the threshold. Most recent first.
+    """
+    try:
+        snapshot = await run_in_threadpool(anomaly_detector.ensure_current)
+        anomalies = anomaly_detector.recent(facility, metric, limit=limit)
+        return {
+            "data_version": snapshot.version,
+            "threshold": anomaly_detector.threshold,
+            "rows_processed": anomaly_detector.rows_processed,
+            "anomalies": anomalies,
+            "total": len(anomalies)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/anomalies/baselines")
+async def get_anomaly_baselines(facility: Optional[str] = Query(None, description="Only this facility")):
+    """Running mean, standard deviation, EWMA and quartiles per facility and metric"""
+    try:
+        snapshot = await run_in_threadpool(anomaly_detector.ensure_current)
+        return {"data_version": snapshot.version, "baselines": anomaly_detector.baselines(facility)}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint for sustainability service"""
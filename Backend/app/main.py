@@ -1,20 +1,32 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 
 # Import routers with error handling
 try:
     from app.api.v1 import ai_copilot, ml_predictions, sustainability, data_upload
+    from app.services.change_listener import change_listener
     ROUTERS_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Some routers failed to import: {e}")
     ROUTERS_AVAILABLE = False
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the data change listener for the lifetime of the app"""
+    if ROUTERS_AVAILABLE:
+        await change_listener.start()
+    yield
+    if ROUTERS_AVAILABLE:
+        await change_listener.stop()
+
 app = FastAPI(
     title="Sustainability Intelligence Platform API",
     description="API for sustainability data analysis, predictions, and AI-powered insights",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS middleware
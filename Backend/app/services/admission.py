@@ -0,0 +1,293 @@
+"""
+Admission control for the model-training endpoints.
+
+Clients identify themselves with an `X-API-Key` checked against the active
+`api_keys` rows of this service. Each key (or, without a key, each client
+address) has a token bucket refilled at a steady rate; a request spends
+tokens equal to its cost (models x horizon days), so one client looping
+over 3-model, 1095-day forecasts runs out long before one asking for a
+30-day forecast does. A request costing more than a bucket holds (a large
+retrain job, or a long 3-model forecast for an anonymous client) is charged
+the whole bucket: it waits until the bucket is full, so every valid request
+is eventually admitted. Admitted requests then wait for a training slot in a
+fair queue that hands free slots to keys round-robin, so a backlog from one
+key never holds back another key's next request.
+
+Rejections are 429 responses with a `Retry-After` header.
+"""
+
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+import threading
+import asyncio
+import hashlib
+import hmac
+import math
+import time
+import os
+from app.services.data_store import get_engine
+
+API_AUTH = os.getenv('API_AUTH', 'optional')  # required, or optional (anonymous clients limited per address)
+# `api_keys.service` of the keys that grant access to this API
+API_KEY_SERVICE = os.getenv('API_KEY_SERVICE', 'sustainability-api')
+# Extra keys as name=key pairs, for deployments without the table
+API_KEYS = os.getenv('API_KEYS', '')
+API_KEY_CACHE_SECONDS = int(os.getenv('API_KEY_CACHE_SECONDS', '60'))
+
+# Token bucket per client, in model-days (1 model x 1 forecast day)
+RATE_LIMIT_CAPACITY = float(os.getenv('RATE_LIMIT_CAPACITY', '10000'))
+RATE_LIMIT_REFILL_PER_SECOND = float(os.getenv('RATE_LIMIT_REFILL_PER_SECOND', '100'))
+# Anonymous clients get this fraction of a key's budget
+ANONYMOUS_RATE_SHARE = float(os.getenv('ANONYMOUS_RATE_SHARE', '0.25'))
+# Model-days charged per model a training job or refresh fits
+TRAINING_FIT_COST = float(os.getenv('TRAINING_FIT_COST', '365'))
+
+# Requests training concurrently across all clients
+ML_CONCURRENCY = int(os.getenv('ML_CONCURRENCY', str(max(2, os.cpu_count() or 1))))
+# Requests one client may have waiting for a slot, and how long they wait
+FAIR_QUEUE_MAX_WAITING = int(os.getenv('FAIR_QUEUE_MAX_WAITING', '8'))
+FAIR_QUEUE_TIMEOUT_SECONDS = float(os.getenv('FAIR_QUEUE_TIMEOUT_SECONDS', '30'))
+
+def too_many_requests(detail, retry_after):
+    return HTTPException(
+        status_code=429, detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+class ApiClient:
+    """The caller of a request: an API key name, or an anonymous address"""
+
+    def __init__(self, client_id, name, authenticated):
+        self.client_id = client_id
+        self.name = name
+        self.authenticated = authenticated
+
+class ApiKeyStore:
+    """Active keys of `API_KEY_SERVICE` from `api_keys` plus `API_KEYS`, cached for a short TTL"""
+
+    def __init__(self, service=API_KEY_SERVICE, extra=API_KEYS, ttl_seconds=API_KEY_CACHE_SECONDS):
+        self.service = service
+        self.ttl_seconds = ttl_seconds
+        self._extra = self._parse(extra)
+        self._lock = threading.Lock()
+        self._keys = None
+        self._expires_at = 0.0
+
+    @staticmethod
+    def _parse(spec):
+        keys = {}
+        for i, item in enumerate(part.strip() for part in spec.split(',') if part.strip()):
+            name, _, value = item.rpartition('=')
+            keys[value] = (name or f"key-{i + 1}", None)
+        return keys
+
+    def _load(self):
+        keys = dict(self._extra)
+        try:
+            from sqlalchemy import text
+            with get_engine().connect() as conn:
+                rows = conn.execute(text(
+                    "SELECT key_name, key_value, expires_at FROM api_keys "
+                    "WHERE service = :service AND is_active"
+                ), {"service": self.service}).all()
+            for name, value, expires_at in rows:
+                keys[value] = (name, expires_at)
+        except Exception as e:
+            print(f"⚠️ api_keys not loaded from database: {e.__class__.__name__}")
+        return keys
+
+    def lookup(self, key):
+        """Name of an active, unexpired key, or None"""
+        with self._lock:
+            if self._keys is None or time.monotonic() >= self._expires_at:
+                self._keys = self._load()
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            keys = self._keys
+        # Compare digests so lookups do not leak timing about stored keys
+        digest = hashlib.sha256(key.encode()).digest()
+        for value, (name, expires_at) in keys.items():
+            if hmac.compare_digest(digest, hashlib.sha256(value.encode()).digest()):
+                if expires_at is not None and expires_at <= datetime.now(timezone.utc):
+                    return None
+                return name
+        return None
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+
+class TokenBucket:
+    """`capacity` tokens refilled continuously at `rate` per second"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost):
+        """Spend `cost` tokens (at most `capacity`); returns 0, or the seconds until they are available"""
+        cost = min(cost, self.capacity)
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def full(self):
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+class RateLimiter:
+    """Token bucket per client, weighted by request cost"""
+
+    def __init__(self, capacity=RATE_LIMIT_CAPACITY, rate=RATE_LIMIT_REFILL_PER_SECOND,
+                 anonymous_share=ANONYMOUS_RATE_SHARE):
+        self.capacity = capacity
+        self.rate = rate
+        self.anonymous_share = anonymous_share
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.admitted = 0
+        self.rejected = 0
+
+    def _bucket(self, client):
+        bucket = self._buckets.get(client.client_id)
+        if bucket is None:
+            if len(self._buckets) >= 10000:
+                # Full buckets hold no state worth keeping
+                for client_id in [k for k, b in self._buckets.items() if b.full()]:
+                    del self._buckets[client_id]
+            share = 1.0 if client.authenticated else self.anonymous_share
+            bucket = self._buckets[client.client_id] = TokenBucket(self.capacity * share, self.rate * share)
+        return bucket
+
+    def check(self, client, cost):
+        """
+        Charge `cost` to the client's bucket, raising 429 with `Retry-After`
+        when it cannot pay yet. Costs over the bucket size are charged the
+        full bucket (see TokenBucket.take).
+        """
+        if cost < 0:
+            raise HTTPException(status_code=400, detail="Request cost must not be negative")
+        with self._lock:
+            bucket = self._bucket(client)
+            retry_after = bucket.take(cost)
+            if retry_after:
+                self.rejected += 1
+            else:
+                self.admitted += 1
+        if retry_after:
+            raise too_many_requests(
+                f"Rate limit exceeded for {client.name}: request costs {cost:.0f} model-days", retry_after
+            )
+
+    def stats(self):
+        with self._lock:
+            for bucket in self._buckets.values():
+                bucket._refill(time.monotonic())
+            return {
+                "capacity": self.capacity,
+                "refill_per_second": self.rate,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "clients": {client_id: round(bucket.tokens, 1) for client_id, bucket in self._buckets.items()}
+            }
+
+class FairScheduler:
+    """
+    `slots` concurrent training requests shared round-robin between clients.
+
+    Waiters queue per client; each freed slot goes to the client at the front
+    of the rotation, which then moves to the back. Runs on the event loop.
+    """
+
+    def __init__(self, slots=ML_CONCURRENCY, max_waiting=FAIR_QUEUE_MAX_WAITING,
+                 timeout_seconds=FAIR_QUEUE_TIMEOUT_SECONDS):
+        self.slots = slots
+        self.max_waiting = max_waiting
+        self.timeout_seconds = timeout_seconds
+        self.running = {}
+        self._waiting = OrderedDict()  # client id -> deque of futures
+        self.granted = 0
+        self.timed_out = 0
+
+    @property
+    def busy(self):
+        return sum(self.running.values())
+
+    def _grant(self, client_id):
+        self.running[client_id] = self.running.get(client_id, 0) + 1
+        self.granted += 1
+
+    def _release(self, client_id):
+        self.running[client_id] -= 1
+        if not self.running[client_id]:
+            del self.running[client_id]
+        while self._waiting and self.busy < self.slots:
+            next_id, waiters = next(iter(self._waiting.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._waiting.move_to_end(next_id)
+            else:
+                del self._waiting[next_id]
+            if not future.done():
+                self._grant(next_id)
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, client):
+        """Hold one training slot for the duration of the block"""
+        client_id = client.client_id
+        if self.busy < self.slots and not self._waiting:
+            self._grant(client_id)
+        else:
+            waiters = self._waiting.get(client_id)
+            if waiters is not None and len(waiters) >= self.max_waiting:
+                raise too_many_requests(f"Too many queued requests for {client.name}", self.timeout_seconds)
+            future = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(client_id, deque()).append(future)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.timeout_seconds)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done():
+                    # Granted just as the wait ended: hand the slot on
+                    self._release(client_id)
+                else:
+                    future.cancel()
+                    waiters = self._waiting.get(client_id)
+                    if waiters is not None:
+                        waiters.remove(future)
+                        if not waiters:
+                            del self._waiting[client_id]
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self.timed_out += 1
+                raise too_many_requests("Training capacity busy, try again shortly", self.timeout_seconds)
+        try:
+            yield
+        finally:
+            self._release(client_id)
+
+    def stats(self):
+        return {
+            "slots": self.slots,
+            "busy": self.busy,
+            "granted": self.granted,
+            "timed_out": self.timed_out,
+            "running": dict(self.running),
+            "waiting": {client_id: len(waiters) for client_id, waiters in self._waiting.items()}
+        }
+
+api_keys = ApiKeyStore()
+rate_limiter = RateLimiter()
+ml_scheduler = FairScheduler()
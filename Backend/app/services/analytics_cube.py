@@ -0,0 +1,212 @@
+from fastapi import HTTPException
+import pandas as pd
+import numpy as np
+import threading
+from app.services.data_store import dataset_store
+
+# Query name -> dataset column; "all" rolls every row into a single member
+DIMENSIONS = {
+    "facility": "Facility",
+    "region": "Region",
+    "supplier": "Supplier",
+    "all": None
+}
+GRANULARITIES = ("day", "week", "month")
+MEASURES = [
+    'Energy_Consumption_kWh',
+    'CO2_Emissions_kg',
+    'Water_Usage_Liters',
+    'Waste_Generated_kg',
+    'Renewable_Energy_Percentage',
+    'Recycled_Waste_Percentage'
+]
+AGGREGATES = ("sum", "mean")
+
+def period_start(timestamps, granularity):
+    """Truncate timestamps to the start of their day, ISO week (Monday) or month"""
+    days = timestamps.dt.normalize()
+    if granularity == "day":
+        return days
+    if granularity == "week":
+        return days - pd.to_timedelta(days.dt.weekday, unit='D')
+    return days - pd.to_timedelta(days.dt.day - 1, unit='D')
+
+def period_end(start, granularity):
+    """Last day of the day, week or month beginning at `start`"""
+    if granularity == "day":
+        return start
+    if granularity == "week":
+        return start + pd.Timedelta(days=6)
+    return start + pd.offsets.MonthEnd(0)
+
+def aggregate_cells(frame, dimension, granularity):
+    """
+    Group rows into (period, member) cells holding per-measure sums and
+    non-null counts. Sums and counts are additive, so cells built from new
+    rows can be added onto existing ones and means derived at query time.
+    """
+    column = DIMENSIONS[dimension]
+    measures = [m for m in MEASURES if m in frame.columns]
+    period = period_start(frame['Timestamp'], granularity).rename('period')
+    member = (frame[column] if column else pd.Series("All", index=frame.index)).astype(str).rename('member')
+
+    grouped = frame[measures].groupby([period, member], sort=False)
+    cells = pd.concat(
+        [grouped.sum().add_prefix('sum_'), grouped.count().add_prefix('count_')],
+        axis=1
+    )
+    cells['rows'] = grouped.size()
+    return cells.astype(np.float64)
+
+class AnalyticsCube:
+    """
+    Materialized facility/region/supplier × day/week/month rollups of the
+    cached dataset.
+
+    The cube tracks the dataset version it reflects. Appended rows are
+    aggregated on their own and added cell-wise; any other data change
+    marks the cube stale so the next query rebuilds it.
+    """
+
+    def __init__(self, store=dataset_store):
+        self._store = store
+        self._lock = threading.Lock()
+        self._cells = {}
+        self.version = None
+        self.measures = []
+        store.subscribe(self.on_data_change)
+
+    def on_data_change(self, snapshot, new_rows):
+        """DatasetStore subscriber: fold appended rows in, or invalidate"""
+        with self._lock:
+            if self.version is None:
+                return
+            if new_rows is None:
+                self.version = None
+                return
+            self._apply(new_rows)
+            self.version = snapshot.version
+
+    def ensure_current(self):
+        """Return the snapshot the cube reflects, rebuilding if it is stale"""
+        snapshot = self._store.get()
+        with self._lock:
+            if self.version != snapshot.version:
+                self._build(snapshot)
+        return snapshot
+
+    def _build(self, snapshot):
+        frame = snapshot.frame
+        cells = {}
+        for dimension, column in DIMENSIONS.items():
+            if column is not None and column not in frame.columns:
+                continue
+            for granularity in GRANULARITIES:
+                cells[(dimension, granularity)] = aggregate_cells(frame, dimension, granularity).sort_index()
+        self.measures = [m for m in MEASURES if m in frame.columns]
+        self._cells = cells
+        self.version = snapshot.version
+        print(f"🧊 Analytics cube built for dataset version {snapshot.version} ({self.cell_count()} cells)")
+
+    def _apply(self, new_rows):
+        updated = {}
+        for (dimension, granularity), cells in self._cells.items():
+            delta = aggregate_cells(new_rows, dimension, granularity)
+            updated[(dimension, granularity)] = cells.add(delta, fill_value=0).sort_index()
+        # Swap the whole mapping so concurrent readers never see a half-applied update
+        self._cells = updated
+
+    def cell_count(self):
+        return int(sum(len(c) for c in self._cells.values()))
+
+    def dimensions(self):
+        """Available dimensions with their members"""
+        result = {}
+        for (dimension, granularity), cells in self._cells.items():
+            if granularity == "month":
+                result[dimension] = sorted(cells.index.get_level_values('member').unique().tolist())
+        return result
+
+    def query(self, dimension, granularity, start=None, end=None, members=None,
+              measures=None, aggregates=AGGREGATES):
+        """
+        Slice the cube by dimension members and period range.
+
+        Only rows dated `start` through `end` are counted: a week or month
+        cut by either bound is summed from its day cells inside the range
+        and returned with `partial` set.
+        """
+        if dimension not in DIMENSIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown dimension '{dimension}'. Use one of: {', '.join(DIMENSIONS)}")
+        if granularity not in GRANULARITIES:
+            raise HTTPException(status_code=400, detail=f"Unknown granularity '{granularity}'. Use one of: {', '.join(GRANULARITIES)}")
+        unknown = [a for a in aggregates if a not in AGGREGATES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown aggregate(s): {', '.join(unknown)}")
+
+        cells = self._cells.get((dimension, granularity))
+        if cells is None:
+            raise HTTPException(status_code=400, detail=f"Dimension '{dimension}' is not present in the dataset")
+
+        measures = measures or self.measures
+        missing = [m for m in measures if m not in self.measures]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Unknown measure(s): {', '.join(missing)}")
+
+        first = pd.Timestamp(start) if start is not None else None
+        last = pd.Timestamp(end) if end is not None else None
+        # Periods cut by `start` or `end` are answered from the day cells they contain
+        partial = set()
+        if first is not None:
+            first_period = period_start(pd.Series([first]), granularity).iloc[0]
+            if first_period < first:
+                partial.add(first_period)
+        if last is not None:
+            last_period = period_start(pd.Series([last]), granularity).iloc[0]
+            if period_end(last_period, granularity) > last:
+                partial.add(last_period)
+
+        selected = self._select(cells, first, last, members)
+        if partial:
+            selected = selected[~selected.index.get_level_values('period').isin(partial)]
+            days = self._select(self._cells[(dimension, "day")], first, last, members)
+            day_periods = period_start(days.index.get_level_values('period').to_series(), granularity).to_numpy()
+            in_edge = np.isin(day_periods, list(partial))
+            edges = days[in_edge].groupby([
+                pd.Index(day_periods[in_edge], name='period'),
+                days.index.get_level_values('member')[in_edge]
+            ]).sum()
+            selected = pd.concat([selected, edges]).sort_index()
+
+        columns = {name: i for i, name in enumerate(selected.columns)}
+        results = []
+        for (period, member), row in zip(selected.index, selected.to_numpy()):
+            item = {
+                "period": period.date().isoformat(), "member": member,
+                "partial": period in partial, "rows": int(row[columns['rows']])
+            }
+            for m in measures:
+                total = row[columns[f'sum_{m}']]
+                count = row[columns[f'count_{m}']]
+                values = {}
+                if "sum" in aggregates:
+                    values["sum"] = float(total)
+                if "mean" in aggregates:
+                    values["mean"] = float(total / count) if count else None
+                item[m] = values
+            results.append(item)
+        return results
+
+    @staticmethod
+    def _select(cells, first, last, members):
+        periods = cells.index.get_level_values('period')
+        mask = np.ones(len(cells), dtype=bool)
+        if first is not None:
+            mask &= periods >= first
+        if last is not None:
+            mask &= periods <= last
+        if members:
+            mask &= cells.index.get_level_values('member').isin(members)
+        return cells[mask]
+
+analytics_cube = AnalyticsCube()
@@ -0,0 +1,267 @@
+from collections import deque
+from fastapi import HTTPException
+import pandas as pd
+import numpy as np
+import threading
+import math
+import os
+from app.services.data_store import dataset_store
+
+ANOMALY_METRICS = [
+    'CO2_Emissions_kg',
+    'Water_Usage_Liters',
+    'Energy_Consumption_kWh',
+    'Waste_Generated_kg'
+]
+# Score above which a reading is reported
+ANOMALY_THRESHOLD = float(os.getenv('ANOMALY_THRESHOLD', '3.5'))
+# Readings a facility/metric needs before it is scored
+ANOMALY_MIN_SAMPLES = int(os.getenv('ANOMALY_MIN_SAMPLES', '20'))
+ANOMALY_EWMA_ALPHA = float(os.getenv('ANOMALY_EWMA_ALPHA', '0.1'))
+# Most recent anomalies kept for the endpoint
+ANOMALY_HISTORY = int(os.getenv('ANOMALY_HISTORY', '1000'))
+
+# IQR of a normal distribution in standard deviations
+IQR_TO_SIGMA = 1.349
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile with the P-square algorithm
+    (Jain & Chlamtac): five markers, O(1) time and memory per value.
+    """
+
+    __slots__ = ("p", "q", "n", "desired", "increments")
+
+    def __init__(self, p):
+        self.p = p
+        self.q = []
+        self.n = [0, 1, 2, 3, 4]
+        self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self.increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x):
+        q = self.q
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        n = self.n
+        for i in range(k + 1, 5):
+            n[i] += 1
+        desired = self.desired
+        for i in range(5):
+            desired[i] += self.increments[i]
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < candidate < q[i + 1]:
+                    # Parabolic step left the bracket: fall back to linear
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+    def value(self):
+        q = self.q
+        if not q:
+            return None
+        if len(q) < 5:
+            return q[min(int(self.p * len(q)), len(q) - 1)]
+        return q[2]
+
+class RunningStats:
+    """Welford mean/variance, EWMA level/variance and P-square quartiles of one series"""
+
+    __slots__ = ("count", "mean", "m2", "ewma", "ewm_var", "quartiles")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = 0.0
+        self.ewm_var = 0.0
+        self.quartiles = (P2Quantile(0.25), P2Quantile(0.5), P2Quantile(0.75))
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def scores(self, x):
+        """(z, EWMA z, robust z) of `x` against the values seen so far"""
+        std = self.std
+        z = (x - self.mean) / std if std > 0 else 0.0
+        ewm_std = math.sqrt(self.ewm_var)
+        ewma_z = (x - self.ewma) / ewm_std if ewm_std > 0 else 0.0
+        q1, median, q3 = (sketch.value() for sketch in self.quartiles)
+        robust_scale = (q3 - q1) / IQR_TO_SIGMA or std
+        robust_z = (x - median) / robust_scale if robust_scale > 0 else 0.0
+        return z, ewma_z, robust_z
+
+    def add(self, x, alpha=ANOMALY_EWMA_ALPHA):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if self.count == 1:
+            self.ewma = x
+        else:
+            diff = x - self.ewma
+            step = alpha * diff
+            self.ewma += step
+            self.ewm_var = (1 - alpha) * (self.ewm_var + diff * step)
+        for sketch in self.quartiles:
+            sketch.add(x)
+
+    def info(self):
+        q1, median, q3 = (_round(sketch.value()) for sketch in self.quartiles)
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 4),
+            "std": round(self.std, 4),
+            "ewma": round(self.ewma, 4),
+            "ewm_std": round(math.sqrt(self.ewm_var), 4),
+            "p25": q1,
+            "median": median,
+            "p75": q3
+        }
+
+def _round(value):
+    return round(value, 4) if value is not None else None
+
+class AnomalyDetector:
+    """
+    Online per-facility, per-metric anomaly detection over the cached dataset.
+
+    Each (facility, metric) keeps constant-size running statistics. A reading
+    is scored against them before it is added and reported when both its
+    robust z-score (median / IQR) and its deviation from the EWMA level
+    exceed `threshold`: far from the facility's usual range and a sudden
+    change from its recent level. Appended rows reach the detector through the DatasetStore
+    subscription, both from ingestion and from incremental reloads; any
+    other data change rebuilds it from the snapshot on the next query.
+    """
+
+    def __init__(self, store=dataset_store, threshold=ANOMALY_THRESHOLD, min_samples=ANOMALY_MIN_SAMPLES,
+                 alpha=ANOMALY_EWMA_ALPHA, history=ANOMALY_HISTORY, metrics=ANOMALY_METRICS):
+        self._store = store
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._anomalies = deque(maxlen=history)
+        self.rows_processed = 0
+        self.version = None
+        if store is not None:
+            store.subscribe(self.on_data_change)
+
+    def on_data_change(self, snapshot, new_rows):
+        """DatasetStore subscriber: score appended rows, or mark stale"""
+        with self._lock:
+            if self.version is None:
+                return
+            if new_rows is None:
+                self.version = None
+                return
+            self._process(new_rows, snapshot.version)
+            self.version = snapshot.version
+
+    def ensure_current(self):
+        """Return the snapshot the detector reflects, replaying it if stale"""
+        snapshot = self._store.get()
+        with self._lock:
+            if self.version != snapshot.version:
+                self._reset()
+                self._process(snapshot.frame, snapshot.version)
+                self.version = snapshot.version
+                print(f"🚨 Anomaly detector replayed {snapshot.row_count} rows ({len(self._anomalies)} anomalies)")
+        return snapshot
+
+    def _reset(self):
+        self._stats = {}
+        self._anomalies.clear()
+        self.rows_processed = 0
+
+    def process(self, frame, version=None):
+        """Score and absorb rows in order; returns the anomalies they raised"""
+        with self._lock:
+            return self._process(frame, version)
+
+    def _process(self, frame, version):
+        metrics = [m for m in self.metrics if m in frame.columns]
+        if not metrics or frame.empty:
+            return []
+        facilities = (frame['Facility'].astype(str) if 'Facility' in frame.columns
+                      else pd.Series("All", index=frame.index)).tolist()
+        timestamps = frame['Timestamp'].tolist() if 'Timestamp' in frame.columns else [None] * len(frame)
+        columns = [frame[m].to_numpy(dtype=np.float64).tolist() for m in metrics]
+
+        threshold, min_samples, alpha = self.threshold, self.min_samples, self.alpha
+        stats = self._stats
+        found = []
+        for metric, values in zip(metrics, columns):
+            for facility, timestamp, x in zip(facilities, timestamps, values):
+                if x != x:  # NaN
+                    continue
+                state = stats.get((facility, metric))
+                if state is None:
+                    state = stats[(facility, metric)] = RunningStats()
+                if state.count >= min_samples:
+                    z, ewma_z, robust_z = state.scores(x)
+                    if abs(robust_z) >= threshold and abs(ewma_z) >= threshold:
+                        found.append({
+                            "timestamp": timestamp.isoformat() if timestamp is not None else None,
+                            "facility": facility,
+                            "metric": metric,
+                            "value": x,
+                            "expected": state.quartiles[1].value(),
+                            "direction": "spike" if x > state.ewma else "drop",
+                            "z_score": round(z, 3),
+                            "ewma_z": round(ewma_z, 3),
+                            "robust_z": round(robust_z, 3),
+                            "data_version": version
+                        })
+                state.add(x, alpha)
+        self.rows_processed += len(frame)
+        found.sort(key=lambda a: a["timestamp"] or "")
+        self._anomalies.extend(found)
+        return found
+
+    def recent(self, facility=None, metric=None, version=None, limit=100):
+        """Most recent anomalies first, optionally filtered"""
+        if metric is not None and metric not in self.metrics:
+            raise HTTPException(status_code=400, detail=f"Unknown metric '{metric}'. Use one of: {', '.join(self.metrics)}")
+        with self._lock:
+            anomalies = list(self._anomalies)
+        return [
+            a for a in reversed(anomalies)
+            if (facility is None or a["facility"] == facility)
+            and (metric is None or a["metric"] == metric)
+            and (version is None or a["data_version"] == version)
+        ][:limit]
+
+    def baselines(self, facility=None):
+        """Running statistics per facility and metric"""
+        with self._lock:
+            items = sorted(self._stats.items())
+            return {
+                f"{f}/{m}": state.info()
+                for (f, m), state in items if facility is None or f == facility
+            }
+
+anomaly_detector = AnomalyDetector()
@@ -0,0 +1,156 @@
+"""
+Asyncio-native reads of whole tables into DataFrames.
+
+A cache-miss load awaits the database on the event loop instead of holding
+a worker thread for the network round trips. Postgres is read through an
+asyncpg connection pool (one per event loop) with a server-side cursor, in
+batches of `ASYNC_DB_BATCH_ROWS` rows; asyncpg decodes the binary wire
+format and every batch is converted straight into NumPy column arrays.
+
+`ASYNC_DB_URL=sqlite:///path/to/file.db` reads a SQLite file with the same
+table instead, as a local stand-in for tests. It is read in batches on a
+helper thread, since SQLite has no network wait to overlap.
+"""
+
+import sqlite3
+import asyncio
+import numpy as np
+import pandas as pd
+import os
+
+ASYNC_DB = os.getenv('ASYNC_DB', 'auto')  # auto (when asyncpg is installed) or off
+# Empty: the DB_* settings; sqlite:///file.db for a local stand-in
+ASYNC_DB_URL = os.getenv('ASYNC_DB_URL', '')
+ASYNC_DB_POOL_MIN = int(os.getenv('ASYNC_DB_POOL_MIN', '1'))
+ASYNC_DB_POOL_MAX = int(os.getenv('ASYNC_DB_POOL_MAX', '10'))
+ASYNC_DB_BATCH_ROWS = int(os.getenv('ASYNC_DB_BATCH_ROWS', '50000'))
+
+FLOAT_TYPES = {'float4', 'float8', 'numeric'}
+INT_TYPES = {'int2', 'int4', 'int8'}
+TIME_TYPES = {'timestamp', 'timestamptz', 'date'}
+
+def column_array(values, type_name=None):
+    """One batch of a column as a NumPy array (a DatetimeIndex for timestamps)"""
+    if type_name in TIME_TYPES:
+        return pd.DatetimeIndex(pd.to_datetime(values, utc=type_name == 'timestamptz'))
+    if type_name in INT_TYPES:
+        try:
+            return np.array(values, dtype=np.int64)
+        except TypeError:
+            # NULLs: fall back to float with NaN, as pandas does
+            return np.array(values, dtype=np.float64)
+    if type_name in FLOAT_TYPES or (
+        type_name is None and all(v is None or isinstance(v, (int, float)) for v in values)
+    ):
+        return np.array(values, dtype=np.float64)
+    return np.array(values, dtype=object)
+
+class ColumnBatches:
+    """Rows arriving in batches, kept as per-column arrays until the frame is built"""
+
+    def __init__(self, names, type_names=None):
+        self.names = names
+        self.type_names = type_names or [None] * len(names)
+        self.parts = [[] for _ in names]
+        self.rows = 0
+
+    def add(self, rows):
+        if not rows:
+            return
+        for i, type_name in enumerate(self.type_names):
+            self.parts[i].append(column_array([row[i] for row in rows], type_name))
+        self.rows += len(rows)
+
+    def frame(self):
+        columns = {}
+        for name, parts in zip(self.names, self.parts):
+            if not parts:
+                columns[name] = np.empty(0)
+            elif isinstance(parts[0], pd.Index):
+                columns[name] = parts[0].append(parts[1:]) if len(parts) > 1 else parts[0]
+            elif len({part.dtype for part in parts}) > 1:
+                # Some batches had NULL integers; widen all to float
+                columns[name] = np.concatenate([part.astype(np.float64) for part in parts])
+            else:
+                columns[name] = np.concatenate(parts)
+        return pd.DataFrame(columns)
+
+class PostgresReader:
+    """asyncpg pool per event loop; reads run in a read-only transaction through a cursor"""
+
+    def __init__(self, dsn, min_size=ASYNC_DB_POOL_MIN, max_size=ASYNC_DB_POOL_MAX):
+        import asyncpg
+        self._asyncpg = asyncpg
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pools = {}
+
+    async def pool(self):
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = self._pools[loop] = asyncio.ensure_future(
+                self._asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+            )
+        try:
+            return await asyncio.shield(pool)
+        except Exception:
+            self._pools.pop(loop, None)
+            raise
+
+    async def read_frame(self, sql, *args, batch_rows=ASYNC_DB_BATCH_ROWS):
+        pool = await self.pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                statement = await conn.prepare(sql)
+                attributes = statement.get_attributes()
+                batches = ColumnBatches([a.name for a in attributes], [a.type.name for a in attributes])
+                cursor = await statement.cursor(*args, prefetch=batch_rows)
+                while True:
+                    rows = await cursor.fetch(batch_rows)
+                    if not rows:
+                        break
+                    batches.add(rows)
+        return batches.frame()
+
+    async def close(self):
+        pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            if pool.done() and not pool.exception():
+                await pool.result().close()
+
+class SQLiteReader:
+    """Local stand-in: a SQLite file read in batches on a helper thread"""
+
+    def __init__(self, path):
+        self.path = path
+
+    async def read_frame(self, sql, *args, batch_rows=ASYNC_DB_BATCH_ROWS):
+        return await asyncio.to_thread(self._read, sql, args, batch_rows)
+
+    def _read(self, sql, args, batch_rows):
+        with sqlite3.connect(self.path) as conn:
+            cursor = conn.execute(sql.replace('$', '?') if args else sql, args)
+            batches = ColumnBatches([d[0] for d in cursor.description])
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                batches.add(rows)
+        return batches.frame()
+
+    async def close(self):
+        pass
+
+def create_async_reader(url):
+    """Reader for `url`, or None when async access is off or asyncpg is not installed"""
+    if ASYNC_DB == 'off':
+        return None
+    if url.startswith('sqlite:///'):
+        return SQLiteReader(url[len('sqlite:///'):])
+    try:
+        return PostgresReader(url)
+    except ImportError:
+        print("⚠️ asyncpg not installed, dataset loads use worker threads")
+        return None
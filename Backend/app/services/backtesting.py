@@ -0,0 +1,236 @@
+"""
+Rolling-origin backtests of the forecast models.
+
+Rows are ordered by Timestamp and each fold trains on everything before an
+origin and scores the next `horizon_days`, the way `/forecast` is used: the
+energy feature is held at its last observed value. Folds run in a process
+pool; features and targets are published once into a shared-memory segment
+and every fold slices views of it instead of receiving a copy of the frame.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from fastapi import HTTPException
+from lightgbm import LGBMRegressor
+import numpy as np
+import threading
+import time
+import os
+from app.services.model_registry import FEATURE_COLS, build_model, require_target
+
+# Processes running folds; 0 runs them in the calling thread
+BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', str(min(4, os.cpu_count() or 1))))
+BACKTEST_START_METHOD = os.getenv('BACKTEST_START_METHOD', 'spawn')
+BACKTEST_MAX_FOLDS = int(os.getenv('BACKTEST_MAX_FOLDS', '20'))
+# Folds whose training window is shorter than this are skipped
+BACKTEST_MIN_TRAIN_ROWS = int(os.getenv('BACKTEST_MIN_TRAIN_ROWS', '60'))
+
+ENERGY = FEATURE_COLS.index('Energy_Consumption_kWh')
+ELAPSED = FEATURE_COLS.index('Elapsed_Days')
+
+def rolling_origins(elapsed_days, folds, horizon_days, step_days=None, min_train_rows=BACKTEST_MIN_TRAIN_ROWS):
+    """
+    (train_end, test_end) row positions of each fold over time-ordered rows.
+
+    Origins are `step_days` apart (default: `horizon_days`, so test windows do
+    not overlap) and the last fold ends with the data.
+    """
+    step_days = step_days or horizon_days
+    last_day = elapsed_days[-1]
+    windows = []
+    for k in range(folds, 0, -1):
+        origin_day = last_day - horizon_days - (k - 1) * step_days
+        train_end = int(np.searchsorted(elapsed_days, origin_day, side='right'))
+        test_end = int(np.searchsorted(elapsed_days, origin_day + horizon_days, side='right'))
+        if train_end >= min_train_rows and test_end > train_end:
+            windows.append((train_end, test_end))
+    return windows
+
+class SharedArrays:
+    """Features and targets in one shared-memory segment, owned by the caller"""
+
+    def __init__(self, X, Y):
+        self.layout = (X.shape, Y.shape)
+        self.shm = shared_memory.SharedMemory(create=True, size=X.nbytes + Y.nbytes)
+        self.X, self.Y = _views(self.shm.buf, *self.layout)
+        self.X[:] = X
+        self.Y[:] = Y
+
+    @property
+    def handle(self):
+        return self.shm.name, self.layout
+
+    def close(self):
+        del self.X, self.Y
+        self.shm.close()
+        self.shm.unlink()
+
+def _views(buffer, x_shape, y_shape):
+    X = np.ndarray(x_shape, dtype=np.float32, buffer=buffer)
+    Y = np.ndarray(y_shape, dtype=np.float32, buffer=buffer, offset=X.nbytes)
+    return X, Y
+
+# Segment each pool process is attached to: (name, shm, X, Y)
+_attached = None
+
+def _attach(name, layout):
+    global _attached
+    if _attached is None or _attached[0] != name:
+        if _attached is not None:
+            _attached[1].close()
+        # Pool processes share the parent's resource tracker; the parent unlinks the segment
+        shm = shared_memory.SharedMemory(name=name)
+        _attached = (name, shm, *_views(shm.buf, *layout))
+    return _attached[2], _attached[3]
+
+def run_fold(X, y, model_name, train_end, test_end):
+    """Fit on rows before `train_end`; return (days ahead, actual, predicted) of the test window"""
+    model = build_model(model_name)
+    # One core per fold: the pool already provides the parallelism
+    model.set_params(n_jobs=1)
+    if isinstance(model, LGBMRegressor):
+        model.set_params(verbose=-1)
+    model.fit(X[:train_end], y[:train_end])
+
+    X_test = X[train_end:test_end].copy()
+    X_test[:, ENERGY] = X[train_end - 1, ENERGY]
+    days_ahead = (X_test[:, ELAPSED] - X[train_end - 1, ELAPSED]).astype(np.int32)
+    return days_ahead, y[train_end:test_end], np.asarray(model.predict(X_test), dtype=np.float32)
+
+def _timed_fold(X, Y, metric_index, model_name, train_end, test_end):
+    started = time.perf_counter()
+    result = run_fold(X, Y[:, metric_index], model_name, train_end, test_end)
+    return (*result, time.perf_counter() - started)
+
+def _pool_fold(handle, *task):
+    return _timed_fold(*_attach(*handle), *task)
+
+def horizon_errors(days_ahead, actual, predicted, horizon_days, scale=1.0):
+    """MAE and MAPE per horizon day (MAPE skips zero actuals), plus overall"""
+    error = np.abs(predicted - actual).astype(np.float64) * scale
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(actual != 0, error / (np.abs(actual) * scale) * 100, np.nan)
+    horizons = []
+    for day in range(1, horizon_days + 1):
+        at = days_ahead == day
+        if at.any():
+            horizons.append({
+                "days_ahead": day,
+                "mae": round(float(error[at].mean()), 4),
+                "mape": _mean_percent(pct[at]),
+                "samples": int(at.sum())
+            })
+    return {
+        "mae": round(float(error.mean()), 4),
+        "mape": _mean_percent(pct),
+        "samples": int(len(error)),
+        "horizons": horizons
+    }
+
+def _mean_percent(pct):
+    return round(float(np.nanmean(pct)), 4) if np.isfinite(pct).any() else None
+
+class Backtester:
+    """Runs rolling-origin folds for metrics x models on a lazily started process pool"""
+
+    def __init__(self, workers=BACKTEST_WORKERS, start_method=BACKTEST_START_METHOD):
+        self.workers = workers
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=get_context(self.start_method)
+                )
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def run(self, df, metrics, model_names, folds=5, horizon_days=30, step_days=None):
+        """Backtest every metric x model; returns per-model errors and wall time"""
+        if not 1 <= folds <= BACKTEST_MAX_FOLDS:
+            raise HTTPException(status_code=400, detail=f"folds must be between 1 and {BACKTEST_MAX_FOLDS}")
+        if horizon_days < 1:
+            raise HTTPException(status_code=400, detail="horizon_days must be at least 1")
+        if not metrics or not model_names:
+            raise HTTPException(status_code=400, detail="At least one metric and one model are required")
+        for metric in metrics:
+            require_target(metric)
+
+        started = time.perf_counter()
+        data = df.dropna(subset=FEATURE_COLS + list(metrics)).sort_values('Timestamp', kind='stable')
+        X = np.ascontiguousarray(data[FEATURE_COLS].to_numpy(dtype=np.float32))
+        Y = np.ascontiguousarray(data[list(metrics)].to_numpy(dtype=np.float32))
+        windows = rolling_origins(X[:, ELAPSED], folds, horizon_days, step_days)
+        if not windows:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Not enough history for {folds} folds of {horizon_days} days "
+                       f"(each fold needs {BACKTEST_MIN_TRAIN_ROWS} training rows)"
+            )
+
+        tasks = [
+            (metric_index, model_name, train_end, test_end)
+            for metric_index in range(len(metrics))
+            for model_name in model_names
+            for train_end, test_end in windows
+        ]
+        outputs = self._run_tasks(X, Y, tasks)
+
+        results = {}
+        fold_seconds = 0.0
+        for metric_index, metric in enumerate(metrics):
+            scale = 100.0 if metric == 'Sustainability_Score' else 1.0
+            results[metric] = {}
+            for model_name in model_names:
+                fold_outputs = [out for task, out in zip(tasks, outputs) if task[:2] == (metric_index, model_name)]
+                days_ahead, actual, predicted, seconds = zip(*fold_outputs)
+                fold_seconds += sum(seconds)
+                results[metric][model_name] = {
+                    **horizon_errors(np.concatenate(days_ahead), np.concatenate(actual),
+                                     np.concatenate(predicted), horizon_days, scale),
+                    "fit_seconds": round(sum(seconds), 3)
+                }
+
+        wall_seconds = time.perf_counter() - started
+        return {
+            "folds": [
+                {"train_rows": train_end, "test_rows": test_end - train_end,
+                 "origin": data['Timestamp'].iloc[train_end - 1].isoformat()}
+                for train_end, test_end in windows
+            ],
+            "horizon_days": horizon_days,
+            "results": results,
+            "best_model": {
+                metric: min(by_model, key=lambda name: by_model[name]["mae"])
+                for metric, by_model in results.items()
+            },
+            "workers": self.workers,
+            "fold_seconds": round(fold_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3)
+        }
+
+    def _run_tasks(self, X, Y, tasks):
+        if self.workers <= 0:
+            return [_timed_fold(X, Y, *task) for task in tasks]
+        shared = SharedArrays(X, Y)
+        try:
+            pool = self._pool()
+            futures = [pool.submit(_pool_fold, shared.handle, *task) for task in tasks]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            self.shutdown()
+            raise
+        finally:
+            shared.close()
+
+backtester = Backtester()
@@ -0,0 +1,221 @@
+"""
+Push-based invalidation: react to data changes as soon as they are committed.
+
+Triggers from `Database/supabase_schema.sql` send a `NOTIFY` on
+`CHANGE_CHANNEL` with a JSON payload naming the changed table (and the
+dataset, for `datasets`/`dataset_data`). The script puts the table trigger
+on `sustainability_table`; for another `TABLE_NAME`, run
+`SELECT watch_table_changes('<TABLE_NAME>')`. A listener that finds no
+trigger on `TABLE_NAME` polls it as well. A background task holds one asyncpg
+connection LISTENing on the channel. A change to `TABLE_NAME` reloads the
+default dataset right away: append-only changes reach the dataset's
+subscribers (rollups, rolling windows, anomaly baselines, schema) as new
+rows, and registered models are then warm-started on them. A change to an
+uploaded dataset marks it stale so its next request reloads it. Bursts of
+notifications are coalesced over `CHANGE_DEBOUNCE_SECONDS`. Cached responses
+are keyed by the data fingerprint, so they roll over with the reload.
+
+Without LISTEN (no asyncpg, the connection failing, or the SQLite stand-in
+of `ASYNC_DB_URL`) the task polls a change token of the table (row count and
+latest Timestamp) every `CHANGE_POLL_SECONDS` instead. Polling cannot see
+in-place updates; the dataset TTL still catches those.
+"""
+
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime
+import pandas as pd
+import asyncio
+import json
+import os
+from app.services.async_db import ASYNC_DB_URL
+from app.services.data_store import TABLE_NAME, async_reader, dataset_registry, dataset_store, get_db_url, get_engine
+from app.services.model_registry import model_registry
+
+CHANGE_NOTIFICATIONS = os.getenv('CHANGE_NOTIFICATIONS', 'auto')  # auto (listen, else poll), poll or off
+CHANGE_CHANNEL = os.getenv('CHANGE_CHANNEL', 'data_changes')
+CHANGE_POLL_SECONDS = float(os.getenv('CHANGE_POLL_SECONDS', '30'))
+CHANGE_DEBOUNCE_SECONDS = float(os.getenv('CHANGE_DEBOUNCE_SECONDS', '1'))
+
+# Tables whose notifications name an uploaded dataset
+DATASET_TABLES = ('datasets', 'dataset_data')
+# Trigger that `watch_table_changes` puts on TABLE_NAME; payloads carry its unqualified name
+CHANGE_TRIGGER = 'notify_sustainability_change'
+WATCHED_TABLE = TABLE_NAME.rsplit('.', 1)[-1]
+
+class ChangeListener:
+    """Background task turning change notifications (or polled changes) into cache refreshes"""
+
+    def __init__(self, store=dataset_store, registry=dataset_registry, url=None, setting=CHANGE_NOTIFICATIONS,
+                 channel=CHANGE_CHANNEL, poll_seconds=CHANGE_POLL_SECONDS, debounce_seconds=CHANGE_DEBOUNCE_SECONDS):
+        self.store = store
+        self.registry = registry
+        self.url = url or ASYNC_DB_URL or get_db_url()
+        self.setting = setting
+        self.channel = channel
+        self.poll_seconds = poll_seconds
+        self.debounce_seconds = debounce_seconds
+        self.mode = "stopped"
+        self._task = None
+        self._flush_task = None
+        self._pending_default = False
+        self._pending_datasets = set()
+        self._token = None
+        self.notifications = 0
+        self.refreshes = 0
+        self.last_change_at = None
+        self.last_error = None
+
+    async def start(self):
+        if self.setting == 'off' or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        tasks = [task for task in (self._task, self._flush_task) if task is not None]
+        self._task = self._flush_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.mode = "stopped"
+
+    def notify(self, change):
+        """Record one change ({"table": ..., "dataset_id": ...}); refreshes run after the debounce delay"""
+        table = change.get("table")
+        if table == WATCHED_TABLE:
+            self._pending_default = True
+        elif table in DATASET_TABLES and change.get("dataset_id"):
+            self._pending_datasets.add(str(change["dataset_id"]))
+        else:
+            return
+        self.notifications += 1
+        self.last_change_at = datetime.utcnow()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.debounce_seconds)
+        await self.flush()
+
+    async def flush(self):
+        """Apply the pending changes now"""
+        refresh_default, self._pending_default = self._pending_default, False
+        datasets, self._pending_datasets = self._pending_datasets, set()
+        for dataset_id in datasets:
+            self.registry.invalidate(dataset_id)
+        if refresh_default:
+            try:
+                await self.refresh_default()
+            except Exception as e:
+                self.last_error = f"{e.__class__.__name__}: {e}"
+                print(f"⚠️ Refresh after data change failed: {e}")
+
+    async def refresh_default(self):
+        """Reload the default dataset and bring registered models up to date"""
+        previous = self.store.peek()
+        self.store.invalidate()
+        if previous is None:
+            # Nothing cached yet; the next request loads the current data
+            return
+        snapshot = await self.store.get_async()
+        if snapshot.version != previous.version:
+            self.refreshes += 1
+            print(f"🔔 Data change: dataset version {snapshot.version}, refreshing models")
+            await run_in_threadpool(model_registry.refresh_all, snapshot)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            print(f"⚠️ Ignoring malformed change notification: {payload!r}")
+            return
+        self.notify(change)
+
+    async def _run(self):
+        while True:
+            connection = await self._connect() if self.setting != 'poll' else None
+            if connection is None:
+                self.mode = "polling"
+                await self.poll()
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            try:
+                await self._listen(connection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = f"{e.__class__.__name__}: {e}"
+                print(f"⚠️ Change listener connection lost: {e}")
+            finally:
+                if not connection.is_closed():
+                    await connection.close()
+
+    async def _connect(self):
+        """A LISTEN-capable connection, or None to poll instead"""
+        if not self.url.startswith(('postgresql://', 'postgres://')):
+            return None
+        try:
+            import asyncpg
+        except ImportError:
+            return None
+        try:
+            return await asyncpg.connect(self.url, timeout=10)
+        except Exception as e:
+            self.last_error = f"{e.__class__.__name__}: {e}"
+            return None
+
+    async def _listen(self, connection):
+        lost = asyncio.Event()
+        connection.add_termination_listener(lambda _: lost.set())
+        await connection.add_listener(self.channel, self._on_notification)
+        watched = await connection.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass($1) AND tgname = $2)",
+            TABLE_NAME, CHANGE_TRIGGER
+        )
+        if watched:
+            self.mode = "listening"
+        else:
+            self.mode = "listening+polling"
+            print(f"⚠️ {TABLE_NAME} has no change trigger, polling it; "
+                  f"run SELECT watch_table_changes('{TABLE_NAME}') to get notifications")
+        print(f"🔔 Listening for data changes on '{self.channel}'")
+        # Changes committed while nobody was listening
+        await self.poll()
+        while not lost.is_set():
+            try:
+                await asyncio.wait_for(lost.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                # An idle socket may never report a dead server; probe it
+                await connection.execute("SELECT 1")
+                if not watched:
+                    await self.poll()
+
+    async def poll(self):
+        """Compare the table's change token with the last one seen; a difference counts as a change"""
+        snapshot = self.store.peek()
+        if snapshot is None or snapshot.source != "database":
+            return
+        sql = f'SELECT COUNT(*) AS row_count, MAX("Timestamp") AS latest FROM {TABLE_NAME}'
+        try:
+            if async_reader is not None:
+                frame = await async_reader.read_frame(sql)
+            else:
+                frame = await run_in_threadpool(pd.read_sql, sql, get_engine())
+        except Exception as e:
+            self.last_error = f"{e.__class__.__name__}: {e}"
+            return
+        token = tuple(str(value) for value in frame.iloc[0])
+        previous, self._token = self._token, token
+        if previous is not None and token != previous:
+            self.notify({"table": WATCHED_TABLE, "op": "POLL"})
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "channel": self.channel,
+            "notifications": self.notifications,
+            "refreshes": self.refreshes,
+            "last_change_at": self.last_change_at.isoformat() if self.last_change_at else None,
+            "last_error": self.last_error
+        }
+
+change_listener = ChangeListener()
@@ -0,0 +1,113 @@
+"""
+Streaming export of the prepared dataset, raw and derived columns alike.
+
+Pages follow a keyset on (Timestamp, row position): `next_cursor` encodes
+the key of a page's last row and the next page starts right after it, so
+pages stay stable while rows are appended and no page re-reads the ones
+before it. A page is encoded `EXPORT_BATCH_ROWS` rows at a time as CSV,
+NDJSON or an Arrow IPC stream, so memory stays bounded by one batch plus
+the page's row positions however large the table is.
+"""
+
+from fastapi import HTTPException
+import numpy as np
+import binascii
+import base64
+import io
+import os
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+EXPORT_PAGE_ROWS = int(os.getenv('EXPORT_PAGE_ROWS', '100000'))
+EXPORT_MAX_PAGE_ROWS = int(os.getenv('EXPORT_MAX_PAGE_ROWS', '1000000'))
+# Rows encoded and sent per chunk of the response body
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '10000'))
+
+def encode_cursor(stamp_ns, position):
+    return base64.urlsafe_b64encode(f"{stamp_ns}:{position}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """(timestamp ns, row position) of a `next_cursor`"""
+    try:
+        stamp, position = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        return int(stamp), int(position)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+class ExportPage:
+    """Row positions of one page, in export order, and the cursor of the next page"""
+
+    def __init__(self, snapshot, columns, positions, next_cursor):
+        self.snapshot = snapshot
+        self.columns = columns
+        self.positions = positions
+        self.next_cursor = next_cursor
+
+def export_page(snapshot, columns=None, cursor=None, limit=EXPORT_PAGE_ROWS, start=None, end=None, filters=None):
+    """Select one page of `snapshot` for export"""
+    columns = list(dict.fromkeys(columns)) if columns else list(snapshot.frame.columns)
+    missing = [column for column in columns if column not in snapshot.frame.columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Column(s) not found in dataset: {', '.join(missing)}")
+    after = decode_cursor(cursor) if cursor else None
+    positions, more = snapshot.keyset_positions(after, limit, start, end, filters)
+    next_cursor = None
+    if more:
+        last = positions[-1]
+        stamp = snapshot.frame['Timestamp'].to_numpy()[last].astype('datetime64[ns]').astype(np.int64)
+        next_cursor = encode_cursor(int(stamp), int(last))
+    return ExportPage(snapshot, columns, positions, next_cursor)
+
+def _batches(page):
+    frame = page.snapshot.frame[page.columns]
+    for begin in range(0, len(page.positions), EXPORT_BATCH_ROWS):
+        yield frame.take(page.positions[begin:begin + EXPORT_BATCH_ROWS])
+
+def iter_csv(page):
+    header = True
+    for batch in _batches(page):
+        yield batch.to_csv(index=False, header=header).encode()
+        header = False
+    if header:
+        # Empty page: still send the header row
+        yield page.snapshot.frame[page.columns].iloc[:0].to_csv(index=False).encode()
+
+def iter_ndjson(page):
+    for batch in _batches(page):
+        chunk = batch.to_json(orient='records', lines=True, date_format='iso').encode()
+        # Batches must join into one record per line; pandas versions differ on the trailing newline
+        yield chunk if chunk.endswith(b"\n") else chunk + b"\n"
+
+def iter_arrow(page):
+    import pyarrow as pa
+    sink = io.BytesIO()
+    writer, schema = None, None
+    for batch in _batches(page):
+        record_batch = pa.RecordBatch.from_pandas(batch, schema=schema, preserve_index=False)
+        if writer is None:
+            # Later batches are cast to the first one's schema
+            schema = record_batch.schema
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(record_batch)
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is None:
+        writer = pa.ipc.new_stream(sink, pa.Schema.from_pandas(page.snapshot.frame[page.columns].iloc[:0],
+                                                               preserve_index=False))
+    writer.close()
+    yield sink.getvalue()
+
+def export_stream(page, export_format):
+    """Response body chunks of `page` in `export_format` (one of EXPORT_FORMATS)"""
+    if export_format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Arrow export requires pyarrow to be installed")
+        return iter_arrow(page)
+    return iter_csv(page) if export_format == "csv" else iter_ndjson(page)
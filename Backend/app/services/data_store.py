@@ -0,0 +1,674 @@
+import pandas as pd
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime
+from datetime import timedelta
+import threading
+import asyncio
+import hashlib
+import json
+import time
+import re
+import os
+from app.services.shared_dataset import SharedDataset, shared_dataset_enabled
+from app.services.memory_budget import memory_budget
+from app.services.async_db import ASYNC_DB_URL, create_async_reader
+
+# Database configuration
+DB_USERNAME = os.getenv('DB_USERNAME', 'postgres.bmwsulkktotsdxrhxlwp')
+DB_PASSWORD = os.getenv('DB_PASSWORD', 'GreenView1234')
+DB_HOST = os.getenv('DB_HOST', 'aws-1-eu-west-3.pooler.supabase.com')
+DB_PORT = os.getenv('DB_PORT', '5432')
+DB_NAME = os.getenv('DB_NAME', 'postgres')
+TABLE_NAME = os.getenv('TABLE_NAME', 'sustainability_table')
+
+# How long a loaded dataset is served before it is re-read from the source
+DATASET_TTL_SECONDS = int(os.getenv('DATASET_TTL_SECONDS', '300'))
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), "../../sustainability_dataset.csv")
+# Uploaded datasets read as <dataset_id>.csv when they are not in the database
+DATASETS_DIR = os.getenv('DATASETS_DIR', os.path.join(os.path.dirname(__file__), "../../datasets"))
+
+def get_db_url():
+    """Build the SQLAlchemy URL for the sustainability database"""
+    return f'postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Process-wide SQLAlchemy engine for the sustainability database, created on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                # One connection pool shared by every load, filter query and write
+                _engine = create_engine(get_db_url(), pool_pre_ping=True)
+    return _engine
+
+# Event-loop reader for cache-miss loads; None when async access is unavailable
+async_reader = create_async_reader(ASYNC_DB_URL or get_db_url())
+
+def load_data_with_source():
+    """Load data from database or CSV fallback, returning (df, source)"""
+    try:
+        # Try database first
+        df = pd.read_sql(f"SELECT * FROM {TABLE_NAME}", get_engine())
+        print("✅ Data loaded from database")
+        return df, "database"
+    except Exception as e:
+        print(f"⚠️ Database connection failed: {e}")
+        return load_fallback_data()
+
+async def load_data_with_source_async():
+    """`load_data_with_source` on the event loop, through the async reader"""
+    try:
+        df = await async_reader.read_frame(f"SELECT * FROM {TABLE_NAME}")
+        print("✅ Data loaded from database (async)")
+        return df, "database"
+    except Exception as e:
+        print(f"⚠️ Async database read failed: {e}")
+        return await asyncio.to_thread(load_fallback_data)
+
+def load_fallback_data():
+    """CSV data, or generated sample data when the CSV is unreadable"""
+    print("📁 Falling back to CSV data...")
+    try:
+        # Fallback to CSV
+        df = pd.read_csv(CSV_PATH)
+        print("✅ Data loaded from CSV file")
+        return df, "csv"
+    except Exception as csv_error:
+        print(f"⚠️ CSV loading failed: {csv_error}")
+        print("🔧 Generating sample data...")
+        # Generate sample data as last resort
+        np.random.seed(42)
+        dates = pd.date_range(start='2023-01-01', end='2024-01-01', freq='D')
+        n = len(dates)
+
+        df = pd.DataFrame({
+            'Timestamp': dates,
+            'CO2_Emissions_kg': np.random.normal(150, 20, n),
+            'Energy_Consumption_kWh': np.random.normal(1000, 100, n),
+            'Waste_Generated_kg': np.random.normal(50, 10, n),
+            'Heat_Generation_MWh': np.random.normal(200, 30, n),
+            'Electricity_Generation_MWh': np.random.normal(1200, 150, n)
+        })
+        print("✅ Sample data generated")
+        return df, "sample"
+
+_DATASET_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def load_uploaded_dataset(dataset_id):
+    """Load the rows of an uploaded dataset from `dataset_data`, or `DATASETS_DIR/<id>.csv`"""
+    try:
+        from sqlalchemy import text
+        with get_engine().connect() as conn:
+            rows = conn.execute(text(
+                "SELECT data FROM dataset_data WHERE dataset_id = CAST(:dataset_id AS UUID) ORDER BY row_number"
+            ), {"dataset_id": dataset_id}).scalars().all()
+        if rows:
+            print(f"✅ Dataset {dataset_id} loaded from database")
+            return pd.DataFrame([row if isinstance(row, dict) else json.loads(row) for row in rows]), "dataset"
+    except Exception as e:
+        print(f"⚠️ Dataset {dataset_id} not loaded from database: {e}")
+
+    path = os.path.join(DATASETS_DIR, f"{dataset_id}.csv")
+    if os.path.exists(path):
+        print(f"📁 Dataset {dataset_id} loaded from {path}")
+        return pd.read_csv(path), "csv"
+    raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found")
+
+def calculate_sustainability_score(row):
+    """Calculate sustainability score for a row"""
+    weights = {
+        'CO2_Emissions_kg': -0.5,
+        'Energy_Consumption_kWh': -0.3,
+        'Waste_Generated_kg': -0.2
+    }
+    score = 0
+    for feature, weight in weights.items():
+        if feature in row:
+            score += weight * row[feature]
+    return score
+
+def prepare_data(df):
+    """Prepare data with time features and sustainability score"""
+    if 'Timestamp' not in df.columns:
+        raise HTTPException(status_code=400, detail="'Timestamp' column missing in dataset")
+
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    df['Year'] = df['Timestamp'].dt.year
+    df['Month'] = df['Timestamp'].dt.month
+    df['DayOfYear'] = df['Timestamp'].dt.dayofyear
+    df['Elapsed_Days'] = (df['Timestamp'] - df['Timestamp'].min()).dt.days
+
+    # Calculate sustainability score
+    df['Sustainability_Score'] = df.apply(calculate_sustainability_score, axis=1)
+    scaler = MinMaxScaler()
+    df['Sustainability_Score'] = scaler.fit_transform(df[['Sustainability_Score']])
+
+    return df
+
+DERIVED_COLUMNS = ['Year', 'Month', 'DayOfYear', 'Elapsed_Days', 'Sustainability_Score']
+
+# Dimensions scoped queries may filter on
+FILTER_COLUMNS = ('Facility', 'Region', 'Supplier')
+
+# Rows of the Timestamp index examined per step of a keyset scan
+KEYSET_SCAN_ROWS = 65536
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def validate_filters(filters):
+    """Drop empty filters and reject dimensions that cannot be filtered on"""
+    filters = {column: list(values) for column, values in (filters or {}).items() if values}
+    unknown = [column for column in filters if column not in FILTER_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot filter on {', '.join(unknown)}. Use: {', '.join(FILTER_COLUMNS)}")
+    return filters
+
+def time_bounds(start=None, end=None):
+    """Half-open [start, end + 1 day) bounds for inclusive start/end dates"""
+    lower = pd.Timestamp(start) if start is not None else None
+    upper = pd.Timestamp(end) + timedelta(days=1) if end is not None else None
+    if lower is not None and upper is not None and upper <= lower:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    return lower, upper
+
+def build_filtered_query(columns=None, start=None, end=None, filters=None):
+    """
+    Parameterized SELECT with the time window and dimension filters pushed
+    into the WHERE clause, so the database returns only the matching rows
+    (and can use the Timestamp/Facility indexes from the schema).
+    """
+    from sqlalchemy import text, bindparam
+
+    columns = columns or []
+    for column in list(columns) + list(filters or {}):
+        if not _IDENTIFIER.match(column):
+            raise HTTPException(status_code=400, detail=f"Invalid column name '{column}'")
+    if not _IDENTIFIER.match(TABLE_NAME):
+        raise HTTPException(status_code=500, detail=f"Invalid table name '{TABLE_NAME}'")
+
+    select = ", ".join(f'"{column}"' for column in columns) if columns else "*"
+    lower, upper = time_bounds(start, end)
+    clauses, params, binds = [], {}, []
+    if lower is not None:
+        clauses.append('"Timestamp" >= :start')
+        params["start"] = lower.to_pydatetime()
+    if upper is not None:
+        clauses.append('"Timestamp" < :end')
+        params["end"] = upper.to_pydatetime()
+    for i, (column, values) in enumerate((filters or {}).items()):
+        name = f"filter_{i}"
+        clauses.append(f'"{column}" IN :{name}')
+        binds.append(bindparam(name, value=list(values), expanding=True))
+
+    sql = f'SELECT {select} FROM {TABLE_NAME}'
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += ' ORDER BY "Timestamp"'
+    return text(sql).bindparams(*binds, **params)
+
+def load_filtered_from_database(columns=None, start=None, end=None, filters=None):
+    """Read only the rows (and columns) matching the filters from the database"""
+    query = build_filtered_query(columns, start, end, filters)
+    df = pd.read_sql(query, get_engine())
+    if 'Timestamp' in df.columns:
+        df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    return df
+
+class DatasetSnapshot:
+    """An immutable, versioned view of the prepared dataset"""
+
+    def __init__(self, frame, version, source, raw_columns, dataset_id=None):
+        self.frame = frame
+        self.version = version
+        self.source = source
+        self.raw_columns = raw_columns
+        self.dataset_id = dataset_id
+        self.loaded_at = datetime.utcnow()
+        self.row_count = len(frame)
+        self._fingerprint = None
+        self._max_timestamp = None
+        self._nbytes = None
+        self._time_order = None
+        self._dimension_indexes = {}
+
+    @property
+    def nbytes(self):
+        """Memory held by the prepared frame, including string contents"""
+        if self._nbytes is None:
+            self._nbytes = int(self.frame.memory_usage(index=True, deep=True).sum())
+        return self._nbytes
+
+    @property
+    def fingerprint(self):
+        """Content hash of the raw rows; identical across processes and instances for the same data"""
+        if self._fingerprint is None:
+            row_hashes = pd.util.hash_pandas_object(self.frame[self.raw_columns], index=False).to_numpy()
+            self._fingerprint = hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+        return self._fingerprint
+
+    @property
+    def etag(self):
+        """Strong ETag: the data version plus a content prefix, so versions of different workers never collide"""
+        return f'"{self.version}-{self.fingerprint[:16]}"'
+
+    @property
+    def max_timestamp(self):
+        """Latest Timestamp in the data (None when empty), computed once per snapshot"""
+        if self._max_timestamp is None and self.row_count:
+            self._max_timestamp = self.frame['Timestamp'].max().to_pydatetime()
+        return self._max_timestamp
+
+    def _time_index(self):
+        """Row positions ordered by Timestamp, with the sorted timestamps"""
+        if self._time_order is None:
+            stamps = self.frame['Timestamp'].to_numpy()
+            order = np.argsort(stamps, kind='stable')
+            self._time_order = (order, stamps[order])
+        return self._time_order
+
+    def _dimension_index(self, column):
+        """{member: sorted row positions} for a dimension column"""
+        index = self._dimension_indexes.get(column)
+        if index is None:
+            codes, members = pd.factorize(self.frame[column])
+            order = np.argsort(codes, kind='stable')
+            counts = np.bincount(codes[codes >= 0], minlength=len(members))
+            groups = np.split(order[codes[order] >= 0], np.cumsum(counts)[:-1])
+            index = {member: positions for member, positions in zip(members, groups)}
+            self._dimension_indexes[column] = index
+        return index
+
+    def row_positions(self, start=None, end=None, filters=None):
+        """
+        Positions of rows in the time window matching every dimension filter,
+        in dataset order. Uses per-snapshot indexes built on first use: a
+        Timestamp sort order (binary search for the window) and per-member
+        position lists for each filtered dimension.
+        """
+        filters = validate_filters(filters)
+        lower, upper = time_bounds(start, end)
+        positions = None
+        if lower is not None or upper is not None:
+            order, stamps = self._time_index()
+            lo = 0 if lower is None else np.searchsorted(stamps, lower.to_datetime64(), side='left')
+            hi = len(stamps) if upper is None else np.searchsorted(stamps, upper.to_datetime64(), side='left')
+            positions = np.sort(order[lo:hi])
+        for column, values in filters.items():
+            if column not in self.frame.columns:
+                raise HTTPException(status_code=400, detail=f"Column '{column}' not found in dataset")
+            index = self._dimension_index(column)
+            matches = [index[value] for value in values if value in index]
+            selected = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+            positions = selected if positions is None else np.intersect1d(positions, selected, assume_unique=True)
+        return np.arange(self.row_count) if positions is None else positions
+
+    def keyset_positions(self, after=None, limit=None, start=None, end=None, filters=None):
+        """
+        Up to `limit` row positions in (Timestamp, position) order that come
+        after the key `after` = (timestamp ns, position), within the time
+        window and matching the filters; returns (positions, more).
+
+        The Timestamp index is scanned in fixed windows and stops once the
+        page is full, so a page never costs memory proportional to the table.
+        """
+        filters = validate_filters(filters)
+        for column in filters:
+            if column not in self.frame.columns:
+                raise HTTPException(status_code=400, detail=f"Column '{column}' not found in dataset")
+        lower, upper = time_bounds(start, end)
+        order, stamps = self._time_index()
+        lo = 0 if lower is None else np.searchsorted(stamps, lower.to_datetime64(), side='left')
+        hi = len(stamps) if upper is None else np.searchsorted(stamps, upper.to_datetime64(), side='left')
+        if after is not None:
+            stamp = np.datetime64(after[0], 'ns').astype(stamps.dtype)
+            first = np.searchsorted(stamps, stamp, side='left')
+            last = np.searchsorted(stamps, stamp, side='right')
+            # The stable sort keeps rows with equal timestamps in position order
+            lo = max(lo, first + np.searchsorted(order[first:last], after[1], side='right'))
+
+        wanted = (self.row_count if limit is None else limit) + 1
+        pages, found = [], 0
+        for begin in range(lo, hi, KEYSET_SCAN_ROWS):
+            window = order[begin:min(begin + KEYSET_SCAN_ROWS, hi)]
+            for column, values in filters.items():
+                window = window[self.frame[column].take(window).isin(values).to_numpy()]
+            pages.append(window[:wanted - found])
+            found += len(pages[-1])
+            if found >= wanted:
+                break
+        positions = np.concatenate(pages) if pages else np.empty(0, dtype=np.int64)
+        return positions[:wanted - 1], len(positions) == wanted
+
+    def select(self, columns=None, start=None, end=None, filters=None):
+        """Rows of this snapshot matching the filters (optionally only `columns`)"""
+        positions = self.row_positions(start, end, filters)
+        frame = self.frame if columns is None else self.frame[list(columns)]
+        return frame.take(positions)
+
+    def info(self):
+        return {
+            "dataset_id": self.dataset_id,
+            "version": self.version,
+            "source": self.source,
+            "rows": self.row_count,
+            "loaded_at": self.loaded_at.isoformat(),
+            "max_timestamp": self.max_timestamp.isoformat() if self.row_count else None
+        }
+
+class DatasetStore:
+    """
+    Process-wide cache of the prepared dataset.
+
+    Callers must treat `snapshot.frame` as read-only; every change (reload or
+    appended rows) produces a new snapshot with a higher version. Subscribers
+    registered with `subscribe()` are called as `callback(snapshot, new_rows)`
+    where `new_rows` holds the prepared appended rows, or None when the
+    history itself changed and consumers must rebuild from scratch. Derived
+    columns (e.g. the min-max scaled score) of old rows may still change on
+    append, so consumers of derived values must check them themselves.
+
+    With a `shared` SharedDataset, the prepared frame is published once into
+    shared memory and other worker processes map it instead of loading their
+    own copy; versions are then the cross-process shared generations.
+
+    Each published snapshot is charged to the process memory budget; when
+    the budget evicts it, the next `get()` loads it again.
+
+    With an `async_loader`, `get_async()` reads on the event loop and only
+    prepares the frame on a worker thread; concurrent misses share one load.
+
+    Appended rows go through `writer(rows, source)` before they are
+    published, so they survive the next reload; it raises when the source
+    cannot keep them.
+    """
+
+    def __init__(self, loader=load_data_with_source, ttl_seconds=DATASET_TTL_SECONDS, shared=None, dataset_id=None,
+                 async_loader=None, writer=None):
+        self._loader = loader
+        self._writer = writer or persist_rows
+        self._async_loader = async_loader
+        self._loading = None  # (event loop, task) of the async load in flight
+        self._ttl_seconds = ttl_seconds
+        self._shared = shared
+        self.dataset_id = dataset_id
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._expires_at = 0.0
+        self._version = 0
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Register a callback invoked after every data change"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    @property
+    def budget_key(self):
+        return self.dataset_id or "default"
+
+    def get(self):
+        """Return the current snapshot, loading or reloading it when expired"""
+        with self._lock:
+            if self._snapshot is None or time.monotonic() >= self._expires_at:
+                return self.refresh()
+            memory_budget.touch("datasets", self.budget_key)
+            if self._shared is not None:
+                latest = self._shared.latest()
+                if latest is not None and latest[0] > self._snapshot.version:
+                    return self._attach_shared(self._snapshot) or self._snapshot
+            return self._snapshot
+
+    async def get_async(self):
+        """`get()` for coroutines: a cache miss awaits the async loader instead of blocking a worker thread"""
+        if self._async_loader is None or self._shared is not None:
+            return await run_in_threadpool(self.get)
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._expires_at:
+            memory_budget.touch("datasets", self.budget_key)
+            return snapshot
+        loop = asyncio.get_running_loop()
+        if self._loading is None or self._loading[0] is not loop or self._loading[1].done():
+            self._loading = (loop, loop.create_task(self._refresh_async()))
+        # Shielded: one cancelled request must not cancel the load others wait on
+        return await asyncio.shield(self._loading[1])
+
+    async def _refresh_async(self):
+        raw, source = await self._async_loader()
+        return await run_in_threadpool(self._apply, raw, source)
+
+    def peek(self):
+        """Return the current snapshot without triggering a load"""
+        return self._snapshot
+
+    def query(self, columns=None, start=None, end=None, filters=None):
+        """
+        Rows in an inclusive [start, end] date window matching dimension
+        `filters` ({column: [members]}); returns (frame, source, pushdown).
+
+        A current in-memory snapshot answers from its column indexes
+        (pushdown "snapshot"). Without one, the filters are pushed into a
+        parameterized SQL query so only matching rows are read (pushdown
+        "sql"). Derived columns need the whole table and always use the
+        snapshot, as does any request when the database is unreachable.
+        """
+        filters = validate_filters(filters)
+        snapshot = self._snapshot
+        current = snapshot is not None and time.monotonic() < self._expires_at
+        derived = columns is None or any(column in DERIVED_COLUMNS for column in columns)
+        if (self.dataset_id is None and not current and not derived
+                and (snapshot is None or snapshot.source == "database")):
+            try:
+                frame = load_filtered_from_database(columns, start, end, filters)
+                return frame, "database", "sql"
+            except HTTPException:
+                raise
+            except Exception as e:
+                print(f"⚠️ Filtered database query failed, using local snapshot: {e}")
+        snapshot = self.get()
+        missing = [column for column in (columns or []) if column not in snapshot.frame.columns]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Column '{missing[0]}' not found in dataset")
+        return snapshot.select(columns, start, end, filters), snapshot.source, "snapshot"
+
+    def refresh(self):
+        """Reload from the source; keeps the version when nothing changed"""
+        with self._lock:
+            previous = self._snapshot
+            if self._shared is not None:
+                attached = self._attach_shared(previous, max_age=self._ttl_seconds)
+                if attached is not None:
+                    return attached
+
+            raw, source = self._loader()
+            return self._apply(raw, source)
+
+    def _apply(self, raw, source):
+        """Prepare freshly loaded raw rows and publish them unless nothing changed"""
+        with self._lock:
+            previous = self._snapshot
+            raw_columns = [c for c in raw.columns if c not in DERIVED_COLUMNS]
+            frame = prepare_data(raw[raw_columns].copy())
+            self._expires_at = time.monotonic() + self._ttl_seconds
+
+            if previous is not None and _same_rows(previous.frame, frame, previous.raw_columns, raw_columns):
+                if self._shared is not None:
+                    self._shared.touch(previous.version)
+                return previous
+
+            new_rows = None
+            if previous is not None and _is_append_only(previous.frame, frame, previous.raw_columns, raw_columns):
+                new_rows = frame.iloc[previous.row_count:]
+            return self._publish(frame, source, raw_columns, new_rows)
+
+    def append_rows(self, rows):
+        """
+        Append newly arrived raw rows and publish a new snapshot.
+
+        Rows are written through the store's writer first; nothing is
+        published when the write is refused or fails.
+        """
+        with self._lock:
+            current = self.get()
+            rows = pd.DataFrame(rows)
+            missing = [c for c in current.raw_columns if c not in rows.columns]
+            if missing:
+                raise HTTPException(status_code=400, detail=f"Rows are missing columns: {', '.join(missing)}")
+
+            self._writer(rows[current.raw_columns], current.source)
+
+            raw = pd.concat(
+                [current.frame[current.raw_columns], rows[current.raw_columns]],
+                ignore_index=True
+            )
+            frame = prepare_data(raw)
+            new_rows = None
+            if _is_append_only(current.frame, frame, current.raw_columns, current.raw_columns):
+                new_rows = frame.iloc[current.row_count:]
+            return self._publish(frame, current.source, current.raw_columns, new_rows)
+
+    def invalidate(self):
+        """Force the next `get()` to reload from the source"""
+        with self._lock:
+            self._expires_at = 0.0
+
+    def evict(self):
+        """Memory budget callback: drop the snapshot; the next `get()` reloads it"""
+        # No lock: the budget may call this while another store publishes
+        self._snapshot = None
+        self._expires_at = 0.0
+
+    def _attach_shared(self, previous, max_age=None):
+        """Adopt the generation another worker published (within `max_age` seconds)"""
+        latest = self._shared.latest()
+        if latest is None:
+            return None
+        generation, published_at, _ = latest
+        age = time.time() - published_at
+        if max_age is not None and age >= max_age:
+            return None
+        if previous is not None and generation == previous.version:
+            self._expires_at = time.monotonic() + self._ttl_seconds - age
+            return previous
+
+        attached = self._shared.attach()
+        if attached is None:
+            return None
+        frame, raw_columns, source, generation, _ = attached
+        self._expires_at = time.monotonic() + self._ttl_seconds - age
+
+        new_rows = None
+        if previous is not None and _is_append_only(previous.frame, frame, previous.raw_columns, raw_columns):
+            new_rows = frame.iloc[previous.row_count:]
+        return self._publish(frame, source, raw_columns, new_rows, version=generation)
+
+    def _publish(self, frame, source, raw_columns, new_rows, version=None):
+        if version is None and self._shared is not None:
+            # Serve this worker from the shared mapping too, so it holds no private copy
+            version = self._shared.publish(frame, raw_columns, source)
+            attached = self._shared.attach()
+            if attached is not None and attached[3] == version:
+                frame = attached[0]
+        self._version = version if version is not None else self._version + 1
+        snapshot = DatasetSnapshot(frame, self._version, source, raw_columns, self.dataset_id)
+        self._snapshot = snapshot
+        label = f"Dataset {self.dataset_id}" if self.dataset_id else "Dataset"
+        print(f"📦 {label} version {snapshot.version} published ({snapshot.row_count} rows)")
+        memory_budget.charge("datasets", self.budget_key, snapshot.nbytes, self.evict)
+
+        for callback in list(self._subscribers):
+            try:
+                callback(snapshot, new_rows)
+            except Exception as e:
+                print(f"⚠️ Dataset subscriber failed: {e}")
+        return snapshot
+
+def persist_rows(rows, source):
+    """
+    Write appended rows through to the database table.
+
+    A dataset loaded from the CSV fallback has nowhere to keep them (the
+    next reload would drop them), so appends are refused with 409 there and
+    with 503 when the database write fails.
+    """
+    if source != "database":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Rows can only be appended to a database-backed dataset (loaded from {source})"
+        )
+    try:
+        rows.to_sql(TABLE_NAME, get_engine(), if_exists='append', index=False)
+        print(f"✅ {len(rows)} rows written to {TABLE_NAME}")
+    except Exception as e:
+        print(f"❌ Could not persist appended rows: {e}")
+        raise HTTPException(status_code=503, detail=f"Could not write rows to {TABLE_NAME}: {e}")
+
+def _same_rows(old, new, old_columns, new_columns):
+    return (
+        list(old_columns) == list(new_columns)
+        and len(old) == len(new)
+        and _prefix_equal(old, new, old_columns)
+    )
+
+def _is_append_only(old, new, old_columns, new_columns):
+    """True when `new` extends `old` without changing any raw value of the old rows"""
+    if list(old_columns) != list(new_columns) or len(new) < len(old):
+        return False
+    return _prefix_equal(old, new, old_columns)
+
+def _prefix_equal(old, new, columns):
+    columns = [c for c in columns if c in new.columns]
+    head = new.iloc[:len(old)]
+    old_hash = pd.util.hash_pandas_object(old[columns], index=False).to_numpy()
+    new_hash = pd.util.hash_pandas_object(head[columns], index=False).to_numpy()
+    return np.array_equal(old_hash, new_hash)
+
+class DatasetRegistry:
+    """
+    The default dataset (`TABLE_NAME`) plus a lazily created DatasetStore per
+    uploaded dataset, all sharing the process memory budget.
+    """
+
+    def __init__(self, default_store):
+        self.default_store = default_store
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def store(self, dataset_id=None):
+        if dataset_id is None:
+            return self.default_store
+        if not _DATASET_ID.match(dataset_id):
+            raise HTTPException(status_code=400, detail=f"Invalid dataset_id '{dataset_id}'")
+        with self._lock:
+            store = self._stores.get(dataset_id)
+            if store is None:
+                store = DatasetStore(loader=lambda: load_uploaded_dataset(dataset_id), dataset_id=dataset_id)
+                self._stores[dataset_id] = store
+            return store
+
+    def get(self, dataset_id=None):
+        """Current snapshot of a dataset (the default one when `dataset_id` is None)"""
+        return self.store(dataset_id).get()
+
+    async def get_async(self, dataset_id=None):
+        return await self.store(dataset_id).get_async()
+
+    def invalidate(self, dataset_id=None):
+        """Mark a dataset stale so its next read reloads it; datasets never loaded are skipped"""
+        with self._lock:
+            store = self.default_store if dataset_id is None else self._stores.get(dataset_id)
+        if store is not None:
+            store.invalidate()
+
+dataset_store = DatasetStore(
+    shared=SharedDataset() if shared_dataset_enabled() else None,
+    async_loader=load_data_with_source_async if async_reader is not None else None
+)
+dataset_registry = DatasetRegistry(dataset_store)
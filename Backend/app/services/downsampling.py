@@ -0,0 +1,107 @@
+from fastapi import HTTPException
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+def bucket_edges(n, n_buckets, start=0, stop=None):
+    """Split positions [start, stop) into `n_buckets` contiguous, near-equal buckets"""
+    stop = n if stop is None else stop
+    return np.linspace(start, stop, n_buckets + 1).astype(np.int64)
+
+def minmax_indices(y, max_points):
+    """
+    Keep the minimum and maximum of each bucket plus both endpoints. With
+    `max_points=3` there is room for one inner point only: the extreme
+    farthest from the mean.
+
+    Fully vectorized: buckets are reduced with `np.minimum/maximum.reduceat`
+    and the positions of the extremes recovered with one comparison pass.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if max_points >= n or n <= 2:
+        return np.arange(n)
+
+    n_buckets = (max_points - 2) // 2
+    if n_buckets == 0:
+        inner = y[1:n - 1]
+        extreme = 1 + int(np.argmax(np.abs(inner - inner.mean())))
+        return np.array([0, extreme, n - 1])
+    edges = bucket_edges(n, n_buckets, 1, n - 1)
+    starts = edges[:-1]
+    inner = y[1:n - 1]
+    local_starts = starts - 1
+
+    bucket_of = np.repeat(np.arange(n_buckets), np.diff(edges))
+    mins = np.minimum.reduceat(inner, local_starts)
+    maxs = np.maximum.reduceat(inner, local_starts)
+
+    positions = np.arange(1, n - 1)
+    is_min = inner == mins[bucket_of]
+    is_max = inner == maxs[bucket_of]
+    # First occurrence of each bucket's extreme
+    min_pos = np.full(n_buckets, n, dtype=np.int64)
+    max_pos = np.full(n_buckets, n, dtype=np.int64)
+    np.minimum.at(min_pos, bucket_of[is_min], positions[is_min])
+    np.minimum.at(max_pos, bucket_of[is_max], positions[is_max])
+
+    return np.unique(np.concatenate([[0], min_pos, max_pos, [n - 1]]))
+
+def lttb_indices(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets: keep the point of each bucket forming the
+    largest triangle with the previously kept point and the next bucket's
+    average, which preserves peaks and the overall shape.
+
+    Bucket averages are computed for all buckets at once with `reduceat`;
+    the per-bucket selection depends on the previous choice, so only that
+    argmax runs per bucket, over a vectorized triangle-area computation.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    n_buckets = max_points - 2
+    edges = bucket_edges(n, n_buckets, 1, n - 1)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # The "next bucket" of the final bucket is the last point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for b in range(n_buckets):
+        lo, hi = edges[b], edges[b + 1]
+        bx = x[lo:hi]
+        by = y[lo:hi]
+        areas = np.abs((x[a] - next_x[b]) * (by - y[a]) - (x[a] - bx) * (next_y[b] - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[b + 1] = a
+    return selected
+
+def downsample_indices(x, y, max_points, method="lttb"):
+    """Indices of the points to keep so at most `max_points` remain"""
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown downsampling method '{method}'. Use one of: {', '.join(METHODS)}")
+    if max_points is not None and max_points < 3:
+        raise HTTPException(status_code=400, detail="max_points must be at least 3")
+    if max_points is None or len(y) <= max_points:
+        return np.arange(len(y))
+    if method == "minmax":
+        return minmax_indices(y, max_points)
+    return lttb_indices(x, y, max_points)
+
+def downsample_points(points, max_points, value_key, x_key=None, method="lttb"):
+    """Downsample a list of point dicts, keeping the original dict for each kept point"""
+    if max_points is None or len(points) <= max_points:
+        return points
+    y = np.fromiter((p[value_key] for p in points), dtype=np.float64, count=len(points))
+    x = (np.fromiter((p[x_key] for p in points), dtype=np.float64, count=len(points))
+         if x_key else np.arange(len(points), dtype=np.float64))
+    return [points[i] for i in downsample_indices(x, y, max_points, method)]
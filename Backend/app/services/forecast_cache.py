@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from datetime import timedelta
+from fastapi import HTTPException
+import pandas as pd
+import numpy as np
+import threading
+import os
+from app.services.model_registry import FEATURE_COLS
+from app.services.memory_budget import memory_budget
+
+# (metric, model) horizons kept; each holds at most the longest horizon requested
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv('FORECAST_CACHE_MAX_ENTRIES', '64'))
+# Longest horizon any endpoint may forecast, in days
+MAX_FORECAST_DAYS = int(os.getenv('MAX_FORECAST_DAYS', '1825'))
+
+def build_future_frame(df, forecast_days, start=0):
+    """
+    Build the feature frame for horizon days `start + 1 .. forecast_days`.
+
+    Every feature depends only on the day offset, so the frame for a long
+    horizon starts with the frames of all shorter ones.
+    """
+    offsets = range(start, forecast_days)
+    last_timestamp = df['Timestamp'].max()
+    last_elapsed = df['Elapsed_Days'].max()
+    last_month = df['Month'].iloc[-1]
+    last_doy = df['DayOfYear'].iloc[-1]
+    future_dates = [last_timestamp + timedelta(days=i + 1) for i in offsets]
+    future_df = pd.DataFrame({
+        'Energy_Consumption_kWh': df['Energy_Consumption_kWh'].iloc[-1],
+        'Elapsed_Days': [last_elapsed + i + 1 for i in offsets],
+        'Month': [(last_month + (i // 30)) % 12 or 12 for i in offsets],
+        'DayOfYear': [(last_doy + i) % 365 or 365 for i in offsets]
+    })
+    future_df['Date'] = future_dates
+    return future_df, future_dates
+
+class HorizonForecast:
+    """Raw predictions for days 1..n of one model on one data version"""
+
+    def __init__(self, version, model):
+        self.version = version
+        self.model = model
+        self.values = np.empty(0, dtype=np.float64)
+        self.dates = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        # ISO date strings take about 60 bytes each
+        return self.values.nbytes + 60 * len(self.dates)
+
+class ForecastCache:
+    """
+    Longest computed forecast per (dataset, data version, metric, model).
+
+    Shorter horizons are slices of the cached one; a longer horizon only
+    predicts the missing tail. Entries are tied to the fitted model object,
+    so a retrained model never serves predictions of its predecessor, and
+    are charged to the memory budget as they grow.
+    """
+
+    def __init__(self, max_entries=FORECAST_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "extensions": 0, "predicted_days": 0, "served_days": 0}
+
+    def _entry(self, key, snapshot, model):
+        dropped = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != snapshot.version or entry.model is not model:
+                entry = HorizonForecast(snapshot.version, model)
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                dropped.append(self._entries.popitem(last=False)[0])
+        for old_key in dropped:
+            memory_budget.release("forecast_horizons", old_key)
+        return entry
+
+    def _evict(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def predict(self, snapshot, metric, model_name, model, forecast_days):
+        """Raw predictions and ISO dates for horizon days 1..forecast_days"""
+        if not 1 <= forecast_days <= MAX_FORECAST_DAYS:
+            raise HTTPException(status_code=400, detail=f"Forecast horizon must be between 1 and {MAX_FORECAST_DAYS} days")
+        key = (snapshot.dataset_id or "default", metric, model_name)
+        entry = self._entry(key, snapshot, model)
+        with entry.lock:
+            cached = len(entry)
+            if forecast_days > cached:
+                future_df, future_dates = build_future_frame(snapshot.frame, forecast_days, start=cached)
+                tail = np.asarray(model.predict(future_df[FEATURE_COLS]), dtype=np.float64)
+                entry.values = np.concatenate([entry.values, tail])
+                entry.dates.extend(date.isoformat() for date in future_dates)
+            values = entry.values[:forecast_days]
+            dates = entry.dates[:forecast_days]
+            nbytes = entry.nbytes
+        if forecast_days > cached:
+            memory_budget.charge("forecast_horizons", key, nbytes, lambda: self._evict(key, entry))
+        else:
+            memory_budget.touch("forecast_horizons", key)
+        with self._lock:
+            self._stats["hits" if forecast_days <= cached else "extensions"] += 1
+            self._stats["predicted_days"] += max(0, forecast_days - cached)
+            self._stats["served_days"] += forecast_days
+        return values, dates
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+        for key in keys:
+            memory_budget.release("forecast_horizons", key)
+
+    def stats(self):
+        with self._lock:
+            horizons = {"/".join(key): len(entry) for key, entry in self._entries.items()}
+            return {**self._stats, "horizons": horizons}
+
+forecast_cache = ForecastCache()
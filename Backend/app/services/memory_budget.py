@@ -0,0 +1,121 @@
+from collections import OrderedDict
+import threading
+import time
+import os
+
+# Bytes all budgeted caches together may hold before least recently used entries are evicted
+MEMORY_BUDGET_MB = float(os.getenv('MEMORY_BUDGET_MB', '1024'))
+
+class MemoryBudget:
+    """
+    One process-wide memory budget shared by the dataset, training-matrix,
+    model and forecast caches.
+
+    Caches `charge()` each entry with its size in bytes and an eviction
+    callback, and `touch()` it on use. When the total exceeds the budget,
+    entries are evicted in least-recently-used order across all caches
+    until it fits again; the entry being charged is never its own victim.
+
+    Callers must not hold their own cache lock while charging: eviction
+    callbacks take the lock of the cache owning the victim.
+    """
+
+    def __init__(self, limit_bytes=MEMORY_BUDGET_MB * 1024 * 1024):
+        self.limit_bytes = int(limit_bytes)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (cache, key) -> [nbytes, evict, charged_at, last_used, hits]
+        self._total = 0
+        self.evictions = {}
+        self.evicted_bytes = {}
+
+    def charge(self, cache, key, nbytes, evict):
+        """Account for (or re-size) an entry, evicting others when over budget"""
+        now = time.time()
+        with self._lock:
+            previous = self._entries.pop((cache, key), None)
+            if previous is not None:
+                self._total -= previous[0]
+            self._entries[(cache, key)] = [int(nbytes), evict, now, now, 0]
+            self._total += int(nbytes)
+            victims = self._select_victims(protect=(cache, key))
+        self._evict(victims)
+
+    def touch(self, cache, key):
+        with self._lock:
+            item = self._entries.get((cache, key))
+            if item is not None:
+                item[3] = time.time()
+                item[4] += 1
+                self._entries.move_to_end((cache, key))
+
+    def release(self, cache, key):
+        """Forget an entry its cache dropped on its own"""
+        with self._lock:
+            item = self._entries.pop((cache, key), None)
+            if item is not None:
+                self._total -= item[0]
+
+    def _select_victims(self, protect):
+        victims = []
+        for name in list(self._entries):
+            if self._total <= self.limit_bytes:
+                break
+            if name == protect:
+                continue
+            item = self._entries.pop(name)
+            self._total -= item[0]
+            victims.append((name, item))
+        return victims
+
+    def _evict(self, victims):
+        for (cache, key), item in victims:
+            try:
+                item[1]()
+            except Exception as e:
+                print(f"⚠️ Evicting {cache} entry {key} failed: {e}")
+            with self._lock:
+                self.evictions[cache] = self.evictions.get(cache, 0) + 1
+                self.evicted_bytes[cache] = self.evicted_bytes.get(cache, 0) + item[0]
+        if victims:
+            print(f"🧹 Memory budget evicted {len(victims)} entries "
+                  f"({sum(item[0] for _, item in victims) / 1024 / 1024:.1f} MiB)")
+
+    @property
+    def used_bytes(self):
+        return self._total
+
+    def resident(self):
+        """Every resident entry with its size and age, most recently used first"""
+        now = time.time()
+        with self._lock:
+            entries = [
+                {
+                    "cache": cache,
+                    "key": key if isinstance(key, str) else "/".join(str(part) for part in key),
+                    "bytes": nbytes,
+                    "hits": hits,
+                    "age_seconds": round(now - charged_at, 1),
+                    "idle_seconds": round(now - last_used, 1)
+                }
+                for (cache, key), (nbytes, _, charged_at, last_used, hits) in reversed(self._entries.items())
+            ]
+            evictions = dict(self.evictions)
+            evicted_bytes = dict(self.evicted_bytes)
+        caches = {}
+        for entry in entries:
+            summary = caches.setdefault(entry["cache"], {"entries": 0, "bytes": 0})
+            summary["entries"] += 1
+            summary["bytes"] += entry["bytes"]
+        for cache in evictions:
+            caches.setdefault(cache, {"entries": 0, "bytes": 0})
+        for cache, summary in caches.items():
+            summary["evictions"] = evictions.get(cache, 0)
+            summary["evicted_bytes"] = evicted_bytes.get(cache, 0)
+        return {
+            "limit_bytes": self.limit_bytes,
+            "used_bytes": sum(entry["bytes"] for entry in entries),
+            "caches": caches,
+            "entries": entries
+        }
+
+memory_budget = MemoryBudget()
@@ -0,0 +1,83 @@
+import joblib
+import tempfile
+import glob
+import os
+from app.services.shared_dataset import shared_dataset_enabled
+
+# Directory shared by all workers; defaults on when the dataset is shared
+MODEL_ARTIFACT_DIR = os.getenv('MODEL_ARTIFACT_DIR') or (
+    os.path.join(tempfile.gettempdir(), "greenview-models") if shared_dataset_enabled() else ""
+)
+# Artifacts kept per (metric, model); older training-data digests are pruned
+MODEL_ARTIFACT_KEEP = int(os.getenv('MODEL_ARTIFACT_KEEP', '3'))
+
+class ModelArtifactStore:
+    """
+    Fitted models persisted once per (metric, model, training-data digest),
+    so a model trained by one worker is loaded by the others instead of
+    being retrained.
+
+    Artifacts are loaded with `mmap_mode='r'`: NumPy arrays inside them are
+    read-only views of the page cache shared by every worker. Tree
+    ensembles copy their nodes into native structures on load, so for
+    XGBoost, LightGBM and RandomForest the saving is mainly the avoided
+    training rather than resident memory.
+    """
+
+    def __init__(self, directory=MODEL_ARTIFACT_DIR):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def path(self, metric, model_name, digest):
+        return os.path.join(self.directory, f"{metric}__{model_name}__{digest}.joblib")
+
+    def save(self, metric, model_name, digest, payload):
+        """Atomically write an artifact; concurrent writers of the same key are harmless"""
+        if not self.enabled:
+            return
+        target = self.path(metric, model_name, digest)
+        if os.path.exists(target):
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(payload, tmp_path)
+            os.replace(tmp_path, target)
+        except Exception as e:
+            print(f"⚠️ Could not save model artifact {target}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._prune(metric, model_name)
+
+    def _prune(self, metric, model_name):
+        paths = sorted(
+            glob.glob(os.path.join(self.directory, f"{metric}__{model_name}__*.joblib")),
+            key=os.path.getmtime,
+            reverse=True
+        )
+        for stale in paths[MODEL_ARTIFACT_KEEP:]:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    def load(self, metric, model_name, digest):
+        """Load an artifact memory-mapped read-only, or None when absent"""
+        if not self.enabled:
+            return None
+        target = self.path(metric, model_name, digest)
+        if not os.path.exists(target):
+            return None
+        try:
+            return joblib.load(target, mmap_mode='r')
+        except Exception as e:
+            print(f"⚠️ Could not load model artifact {target}: {e}")
+            return None
+
+model_artifacts = ModelArtifactStore()
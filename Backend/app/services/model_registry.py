@@ -0,0 +1,639 @@
+from fastapi import HTTPException
+from sklearn.model_selection import train_test_split
+from sklearn.ensemble import RandomForestRegressor
+from xgboost import XGBRegressor
+from lightgbm import LGBMRegressor
+from collections import OrderedDict
+from datetime import datetime
+import lightgbm as lgb
+import pandas as pd
+import numpy as np
+import threading
+import hashlib
+import copy
+import time
+import os
+from app.services.model_artifacts import model_artifacts
+from app.services.memory_budget import memory_budget
+
+FEATURE_COLS = ['Energy_Consumption_kWh', 'Elapsed_Days', 'Month', 'DayOfYear']
+
+# Incremental update policy (see ModelRegistry.choose_update)
+INCREMENTAL_ROUNDS = int(os.getenv('INCREMENTAL_ROUNDS', '10'))
+INCREMENTAL_MAX_NEW_FRACTION = float(os.getenv('INCREMENTAL_MAX_NEW_FRACTION', '0.25'))
+INCREMENTAL_MAX_UPDATES = int(os.getenv('INCREMENTAL_MAX_UPDATES', '10'))
+INCREMENTAL_REPLAY_ROWS = int(os.getenv('INCREMENTAL_REPLAY_ROWS', '200'))
+INCREMENTAL_MAX_DEGRADATION = float(os.getenv('INCREMENTAL_MAX_DEGRADATION', '0.10'))
+
+UPDATE_MODES = ("auto", "incremental", "full")
+MODEL_NAMES = ("xgboost", "lightgbm", "random_forest")
+
+# Boosting stops once validation error has not improved for this many rounds (0 disables)
+EARLY_STOPPING_ROUNDS = int(os.getenv('EARLY_STOPPING_ROUNDS', '10'))
+# Share of the training rows set aside as the early-stopping validation slice
+EARLY_STOPPING_FRACTION = float(os.getenv('EARLY_STOPPING_FRACTION', '0.1'))
+# Fewer rounds than this are never kept; a model stopping sooner is refit with this many
+EARLY_STOPPING_MIN_ROUNDS = int(os.getenv('EARLY_STOPPING_MIN_ROUNDS', '20'))
+# (data version, metric) training matrices kept in memory
+TRAINING_MATRIX_CACHE_ENTRIES = int(os.getenv('TRAINING_MATRIX_CACHE_ENTRIES', '16'))
+
+def require_target(metric):
+    """Reject a target that is also a model feature: it would be predicted from itself"""
+    if metric in FEATURE_COLS:
+        raise HTTPException(status_code=400, detail=f"'{metric}' is a model feature and cannot be a training target")
+
+def require_models(model_names):
+    """Reject model names the registry cannot train, before they are charged or registered"""
+    unknown = [model for model in model_names if model not in MODEL_NAMES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown model(s) {', '.join(unknown)}. Use: {', '.join(MODEL_NAMES)}")
+
+def build_model(model_name, early_stopping=False):
+    """Create an unfitted regressor for the given model name"""
+    if model_name == "xgboost":
+        return XGBRegressor(
+            n_estimators=100, learning_rate=0.1, random_state=42,
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS if early_stopping and EARLY_STOPPING_ROUNDS else None
+        )
+    if model_name == "lightgbm":
+        return LGBMRegressor(n_estimators=100, learning_rate=0.1, random_state=42)
+    return RandomForestRegressor(n_estimators=100, random_state=42)
+
+class TrainingMatrices:
+    """
+    Train/test split of one (data version, metric) as contiguous float32
+    arrays, shared by every model trained on it.
+    """
+
+    def __init__(self, version, metric, X_train, X_test, y_train, y_test, holdout_index):
+        self.version = version
+        self.metric = metric
+        self.X_train = X_train
+        self.X_test = X_test
+        self.y_train = y_train
+        self.y_test = y_test
+        self.holdout_index = holdout_index
+
+    @staticmethod
+    def features(X):
+        """Named view over a feature array, so models keep their feature names"""
+        return pd.DataFrame(X, columns=FEATURE_COLS, copy=False)
+
+    @property
+    def train(self):
+        return self.features(self.X_train), self.y_train
+
+    @property
+    def test(self):
+        return self.features(self.X_test), self.y_test
+
+    @property
+    def nbytes(self):
+        return self.X_train.nbytes + self.X_test.nbytes + self.y_train.nbytes + self.y_test.nbytes
+
+def build_training_matrices(df, metric, version=None):
+    """Drop incomplete rows once and split into float32 train/test arrays"""
+    data = df.dropna(subset=FEATURE_COLS + [metric])
+
+    if len(data) == 0:
+        raise HTTPException(status_code=400, detail="No valid data for training")
+
+    X = np.ascontiguousarray(data[FEATURE_COLS].to_numpy(dtype=np.float32))
+    y = data[metric].to_numpy(dtype=np.float32)
+    # Splitting positions gives the same partition as splitting the frame itself
+    train_pos, test_pos = train_test_split(np.arange(len(data)), test_size=0.2, random_state=42)
+    return TrainingMatrices(
+        version, metric, X[train_pos], X[test_pos], y[train_pos], y[test_pos],
+        data.index.to_numpy()[test_pos]
+    )
+
+class TrainingMatrixCache:
+    """LRU of TrainingMatrices keyed by (dataset, data version, metric), charged to the memory budget"""
+
+    def __init__(self, max_entries=TRAINING_MATRIX_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, snapshot, metric):
+        key = (snapshot.dataset_id or "default", snapshot.version, metric)
+        with self._lock:
+            matrices = self._entries.get(key)
+            if matrices is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if matrices is not None:
+            memory_budget.touch("training_matrices", key)
+            return matrices
+
+        matrices = build_training_matrices(snapshot.frame, metric, snapshot.version)
+        with self._lock:
+            self._entries[key] = matrices
+            self.builds += 1
+            dropped = []
+            while len(self._entries) > self.max_entries:
+                dropped.append(self._entries.popitem(last=False)[0])
+        for old_key in dropped:
+            memory_budget.release("training_matrices", old_key)
+        memory_budget.charge("training_matrices", key, matrices.nbytes, lambda: self._evict(key, matrices))
+        return matrices
+
+    def _evict(self, key, matrices):
+        with self._lock:
+            if self._entries.get(key) is matrices:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(m.nbytes for m in self._entries.values()),
+                "hits": self.hits,
+                "builds": self.builds
+            }
+
+training_matrices = TrainingMatrixCache()
+
+def validation_split(X_train, y_train, fraction=EARLY_STOPPING_FRACTION):
+    """
+    Carve the early-stopping validation slice out of the training rows:
+    returns (X_fit, y_fit, eval_set), with eval_set None when there are too
+    few rows to spare one. The hold-out stays untouched for scoring.
+    """
+    size = int(len(X_train) * fraction)
+    if EARLY_STOPPING_ROUNDS <= 0 or size < 1 or size >= len(X_train):
+        return X_train, y_train, None
+    fit_pos, val_pos = train_test_split(np.arange(len(X_train)), test_size=size, random_state=42)
+    X_fit, X_val = X_train.iloc[fit_pos], X_train.iloc[val_pos]
+    y = np.asarray(y_train)
+    return X_fit, y[fit_pos], (X_val, y[val_pos])
+
+def train_single_model(model_name, X_train, y_train, eval_set=None):
+    """
+    Train one model, falling back to RandomForest on failure.
+
+    With `eval_set=(X_val, y_val)` (see `validation_split`) boosting models
+    stop early once the validation error stops improving; they then predict
+    with their best round. One stopping before EARLY_STOPPING_MIN_ROUNDS is
+    refit with that many rounds instead.
+    """
+    try:
+        early_stopping = eval_set is not None and EARLY_STOPPING_ROUNDS > 0
+        model = build_model(model_name, early_stopping)
+        if early_stopping and isinstance(model, XGBRegressor):
+            model.fit(X_train, y_train, eval_set=[eval_set], verbose=False)
+        elif early_stopping and isinstance(model, LGBMRegressor):
+            model.fit(X_train, y_train, eval_set=[eval_set],
+                      callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+        else:
+            model.fit(X_train, y_train)
+        rounds = best_rounds(model)
+        if rounds and rounds < EARLY_STOPPING_MIN_ROUNDS:
+            # A noisy validation slice can stop boosting after a round or two, leaving a flat model
+            print(f"⚠️ {model_name} stopped at {rounds} rounds, refitting with {EARLY_STOPPING_MIN_ROUNDS}")
+            model = build_model(model_name).set_params(n_estimators=EARLY_STOPPING_MIN_ROUNDS)
+            model.fit(X_train, y_train)
+            rounds = None
+        print(f"✅ {model_name} trained successfully" + (f" (stopped at {rounds} rounds)" if rounds else ""))
+        return model_name, model
+    except Exception as e:
+        print(f"⚠️ {model_name} failed: {e}")
+        # Fallback to RandomForest
+        fallback_model = RandomForestRegressor(n_estimators=100, random_state=42)
+        fallback_model.fit(X_train, y_train)
+        print(f"✅ {model_name} fallback (RandomForest) trained")
+        return f"{model_name}_fallback", fallback_model
+
+def best_rounds(model):
+    """Boosting rounds up to the best hold-out score, or None without early stopping"""
+    if isinstance(model, XGBRegressor):
+        try:
+            return int(model.best_iteration) + 1
+        except AttributeError:
+            return None
+    if isinstance(model, LGBMRegressor):
+        return int(model.best_iteration_) or None
+    return None
+
+def best_booster(model):
+    """
+    Native booster to warm-start from, ending at the best round so new rounds
+    follow the useful trees rather than the ones boosted while waiting to stop.
+    LightGBM already continues from `best_iteration`; XGBoost needs a slice.
+    """
+    if isinstance(model, XGBRegressor):
+        rounds = best_rounds(model)
+        booster = model.get_booster()
+        return booster[:rounds] if rounds else booster
+    return model.booster_
+
+def continue_training(model, X, y, rounds):
+    """
+    Return a copy of `model` extended with `rounds` more boosting rounds
+    (XGBoost/LightGBM) or `rounds` new trees (RandomForest) fitted on X, y.
+    RandomForest retires its oldest trees so the forest keeps its size.
+    """
+    if isinstance(model, XGBRegressor):
+        updated = XGBRegressor(**{**model.get_params(), "n_estimators": rounds, "early_stopping_rounds": None})
+        updated.fit(X, y, xgb_model=best_booster(model))
+        return updated
+    if isinstance(model, LGBMRegressor):
+        updated = LGBMRegressor(**{**model.get_params(), "n_estimators": rounds})
+        updated.fit(X, y, init_model=best_booster(model))
+        return updated
+
+    updated = copy.deepcopy(model)
+    forest_size = len(model.estimators_)
+    updated.set_params(warm_start=True, n_estimators=forest_size + rounds)
+    updated.fit(X, y)
+    updated.estimators_ = updated.estimators_[-forest_size:]
+    updated.set_params(warm_start=False, n_estimators=forest_size)
+    return updated
+
+def count_trees(model):
+    """Number of boosting rounds used for prediction, or trees in a forest"""
+    rounds = best_rounds(model)
+    if rounds:
+        return rounds
+    if isinstance(model, XGBRegressor):
+        return int(model.get_booster().num_boosted_rounds())
+    if isinstance(model, LGBMRegressor):
+        return int(model.booster_.current_iteration())
+    return len(getattr(model, "estimators_", []))
+
+def model_nbytes(model):
+    """Approximate memory held by a fitted model (serialized boosters, forest node arrays)"""
+    try:
+        if isinstance(model, XGBRegressor):
+            return len(model.get_booster().save_raw())
+        if isinstance(model, LGBMRegressor):
+            return len(model.booster_.model_to_string())
+        return sum(tree.tree_.__getstate__()["nodes"].nbytes + tree.tree_.value.nbytes
+                   for tree in getattr(model, "estimators_", []))
+    except Exception:
+        return 0
+
+def training_digest(df, metric, row_count):
+    """Fingerprint of the first `row_count` feature/target rows a model was trained on"""
+    head = df.iloc[:row_count][FEATURE_COLS + [metric]]
+    row_hashes = pd.util.hash_pandas_object(head, index=False).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+
+def mean_absolute_error(model, X, y):
+    if len(X) == 0:
+        return None
+    return float(np.mean(np.abs(model.predict(X) - np.asarray(y))))
+
+class ModelEntry:
+    """A fitted model plus the bookkeeping needed to refresh it incrementally"""
+
+    def __init__(self, metric, model_name, trained_name, model, data_version, row_count,
+                 digest, holdout_index, holdout_mae, update_mode, update_seconds, incremental_updates=0,
+                 dataset_id=None, base="full"):
+        self.dataset_id = dataset_id
+        self.metric = metric
+        self.model_name = model_name
+        self.trained_name = trained_name
+        self.model = model
+        self.data_version = data_version
+        self.row_count = row_count
+        self.digest = digest
+        self.holdout_index = holdout_index
+        self.holdout_mae = holdout_mae
+        self.update_mode = update_mode
+        self.update_seconds = update_seconds
+        self.incremental_updates = incremental_updates
+        # How the model's lineage started: "full" fit or "streaming" sample; warm starts keep it
+        self.base = base
+        self.updated_at = datetime.utcnow()
+        self.nbytes = model_nbytes(model)
+
+    @property
+    def identity(self):
+        """
+        Names the fitted model the same way in every process: training is
+        seeded, so the same lineage on the same rows yields the same model
+        """
+        return f"{self.trained_name}/{self.base}/{self.digest}/{self.incremental_updates}"
+
+    def info(self):
+        return {
+            "dataset_id": self.dataset_id,
+            "metric": self.metric,
+            "model": self.model_name,
+            "trained_model": self.trained_name,
+            "data_version": self.data_version,
+            "rows": self.row_count,
+            "trees": count_trees(self.model),
+            "bytes": self.nbytes,
+            "incremental_updates": self.incremental_updates,
+            "holdout_mae": self.holdout_mae,
+            "last_update": self.update_mode,
+            "last_update_seconds": round(self.update_seconds, 3),
+            "updated_at": self.updated_at.isoformat()
+        }
+
+class ModelRegistry:
+    """
+    Process-wide store of fitted models keyed by (dataset, metric, model name).
+
+    Models are reused while the dataset version is unchanged. When new rows
+    arrive the registry either continues training the existing model on them
+    (warm start) or refits from scratch, as decided by `choose_update`.
+    Every model is charged to the memory budget, which may evict it; it is
+    then retrained (or loaded from its artifact) on next use.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, metric, model_name, dataset_id=None):
+        return self._entries.get((dataset_id or "default", metric, model_name))
+
+    def entries(self, dataset_id=None):
+        """Registered models, optionally only those of one dataset ("default" for the main table)"""
+        entries = list(self._entries.values())
+        if dataset_id is None:
+            return entries
+        return [entry for entry in entries if (entry.dataset_id or "default") == dataset_id]
+
+    def identity(self, dataset_id, metric, model_names):
+        """
+        {model name: ModelEntry.identity} of the models serving `metric`, or
+        None for a model not registered here yet (it will be loaded from the
+        shared artifact or fit from scratch, as any process would). Keys of
+        shared cached results include it, so a retrain that keeps the data
+        version never serves results of the replaced models, in this process
+        or another.
+        """
+        prefix = dataset_id or "default"
+        identities = {}
+        for model_name in model_names:
+            entry = self._entries.get((prefix, metric, model_name))
+            identities[model_name] = entry.identity if entry is not None else None
+        return identities
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+
+    def _evict(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def adopt(self, entry):
+        """Register a model trained outside `refresh` (e.g. on a streamed sample)"""
+        key = (entry.dataset_id or "default", entry.metric, entry.model_name)
+        self._store(key, entry)
+        memory_budget.charge("models", key, entry.nbytes, lambda: self._evict(key, entry))
+        return self._report(entry, entry.update_mode, f"trained on {entry.dataset_id or 'default'} data")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_model(self, snapshot, metric, model_name, mode="auto", rounds=None):
+        """Return an up-to-date entry for `snapshot`, training or refreshing as needed"""
+        entry, _ = self.refresh(snapshot, metric, model_name, mode=mode, rounds=rounds)
+        return entry
+
+    def get_models(self, snapshot, metric, model_names):
+        """Return {trained model name: fitted model} for the requested models"""
+        models = {}
+        for model_name in model_names:
+            entry = self.get_model(snapshot, metric, model_name)
+            models[entry.trained_name] = entry.model
+        return models
+
+    def refresh(self, snapshot, metric, model_name, mode="auto", rounds=None):
+        """Bring one model up to date with `snapshot`; returns (entry, report)"""
+        if mode not in UPDATE_MODES:
+            raise HTTPException(status_code=400, detail=f"Unknown update mode '{mode}'. Use one of: {', '.join(UPDATE_MODES)}")
+        if metric not in snapshot.frame.columns:
+            raise HTTPException(status_code=400, detail=f"Column '{metric}' not found in dataset")
+        # Endpoints check these up front; this keeps any other caller from registering junk
+        require_target(metric)
+        require_models([model_name])
+
+        key = (snapshot.dataset_id or "default", metric, model_name)
+        with self._key_lock(key):
+            entry, report = self._refresh_locked(key, snapshot, metric, model_name, mode, rounds)
+        # Charged outside the key lock: eviction callbacks take other locks
+        if report["action"] == "reuse":
+            memory_budget.touch("models", key)
+        else:
+            memory_budget.charge("models", key, entry.nbytes, lambda: self._evict(key, entry))
+        return entry, report
+
+    def _refresh_locked(self, key, snapshot, metric, model_name, mode, rounds):
+        entry = self._entries.get(key)
+        # A streamed model (no data version yet) was chosen explicitly; keep it over shared artifacts
+        stale = entry is None or entry.data_version not in (None, snapshot.version)
+        if stale and mode != "full":
+            shared = self._load_artifact(snapshot, metric, model_name)
+            if shared is not None:
+                self._store(key, shared)
+                return shared, self._report(shared, "shared", "loaded model trained by another worker")
+
+        action, reason = self.choose_update(entry, snapshot, metric, mode)
+
+        if action == "reuse":
+            if entry.data_version is None:
+                self._rebase(entry, snapshot, metric)
+            elif entry.data_version != snapshot.version:
+                entry.data_version = snapshot.version
+            return entry, self._report(entry, action, reason)
+
+        if action == "incremental":
+            updated = self._train_incremental(entry, snapshot, rounds or INCREMENTAL_ROUNDS)
+            if updated is None:
+                action, reason = "full", "incremental update degraded hold-out error"
+            else:
+                entry = updated
+
+        if action == "full":
+            entry = self._train_full(snapshot, metric, model_name)
+
+        self._store(key, entry)
+        self._save_artifact(entry)
+        return entry, self._report(entry, action, reason)
+
+    def choose_update(self, entry, snapshot, metric, mode="auto"):
+        """
+        Decide how to bring `entry` up to date: returns (action, reason) with
+        action one of "reuse", "incremental" or "full".
+
+        A full refit is used when there is no model yet, it is a RandomForest
+        fallback, the rows it was trained on changed (edits, deletions, or a
+        re-scaled Sustainability_Score), the new rows exceed
+        INCREMENTAL_MAX_NEW_FRACTION of the trained rows, or the model has
+        already been warm-started INCREMENTAL_MAX_UPDATES times. A model
+        trained on a streamed sample (no data version yet) is reused as is and
+        becomes the baseline later updates start from.
+        """
+        if entry is None:
+            return "full", "no registered model"
+        if entry.data_version == snapshot.version and mode != "full":
+            return "reuse", "model is current"
+        if mode == "full":
+            return "full", "full refit requested"
+        if entry.data_version is None:
+            return "reuse", "streamed model becomes the baseline"
+        if entry.trained_name != entry.model_name:
+            return "full", "fallback models are always refit"
+        if snapshot.row_count < entry.row_count or training_digest(snapshot.frame, metric, entry.row_count) != entry.digest:
+            return "full", "training history changed"
+
+        new_rows = snapshot.row_count - entry.row_count
+        if new_rows == 0:
+            return "reuse", "no new rows"
+        if mode == "incremental":
+            return "incremental", "incremental update requested"
+        if new_rows / max(entry.row_count, 1) > INCREMENTAL_MAX_NEW_FRACTION:
+            return "full", f"{new_rows} new rows exceed {INCREMENTAL_MAX_NEW_FRACTION:.0%} of training rows"
+        if entry.incremental_updates >= INCREMENTAL_MAX_UPDATES:
+            return "full", f"{entry.incremental_updates} incremental updates since last full refit"
+        return "incremental", f"{new_rows} new rows"
+
+    def _rebase(self, entry, snapshot, metric):
+        """Tie a streamed model to `snapshot` as if it had been fully fit on it"""
+        matrices = training_matrices.get(snapshot, metric)
+        entry.data_version = snapshot.version
+        entry.row_count = snapshot.row_count
+        entry.digest = training_digest(snapshot.frame, metric, snapshot.row_count)
+        # Later incremental updates are judged on this snapshot's hold-out, not the streamed one
+        entry.holdout_index = matrices.holdout_index
+        entry.holdout_mae = mean_absolute_error(entry.model, *matrices.test)
+
+    def _train_full(self, snapshot, metric, model_name):
+        started = time.perf_counter()
+        matrices = training_matrices.get(snapshot, metric)
+        X_train, y_train = matrices.train
+        X_test, y_test = matrices.test
+        # Early stopping watches a slice of the training rows; the hold-out only scores the result
+        X_fit, y_fit, eval_set = validation_split(X_train, y_train)
+        trained_name, model = train_single_model(model_name, X_fit, y_fit, eval_set=eval_set)
+        return ModelEntry(
+            metric=metric,
+            model_name=model_name,
+            trained_name=trained_name,
+            model=model,
+            data_version=snapshot.version,
+            row_count=snapshot.row_count,
+            digest=training_digest(snapshot.frame, metric, snapshot.row_count),
+            holdout_index=matrices.holdout_index,
+            holdout_mae=mean_absolute_error(model, X_test, y_test),
+            update_mode="full",
+            update_seconds=time.perf_counter() - started,
+            dataset_id=snapshot.dataset_id
+        )
+
+    def _train_incremental(self, entry, snapshot, rounds):
+        """Warm-start `entry` on the new rows plus a replay window of recent history"""
+        started = time.perf_counter()
+        frame = snapshot.frame
+        columns = FEATURE_COLS + [entry.metric]
+
+        history = frame.iloc[:entry.row_count].dropna(subset=columns)
+        holdout = history.loc[history.index.intersection(entry.holdout_index)]
+        replay = history.drop(index=holdout.index).tail(INCREMENTAL_REPLAY_ROWS)
+        new_rows = frame.iloc[entry.row_count:].dropna(subset=columns)
+        window = pd.concat([replay, new_rows])
+
+        model = continue_training(entry.model, window[FEATURE_COLS], window[entry.metric], rounds)
+        holdout_mae = mean_absolute_error(model, holdout[FEATURE_COLS], holdout[entry.metric])
+
+        if (entry.holdout_mae is not None and holdout_mae is not None
+                and holdout_mae > entry.holdout_mae * (1 + INCREMENTAL_MAX_DEGRADATION)):
+            print(f"⚠️ {entry.model_name} incremental update raised hold-out MAE "
+                  f"{entry.holdout_mae:.3f} → {holdout_mae:.3f}, refitting")
+            return None
+
+        print(f"✅ {entry.model_name} warm-started on {len(new_rows)} new rows (+{rounds} rounds)")
+        return ModelEntry(
+            metric=entry.metric,
+            model_name=entry.model_name,
+            trained_name=entry.trained_name,
+            model=model,
+            data_version=snapshot.version,
+            row_count=snapshot.row_count,
+            digest=training_digest(frame, entry.metric, snapshot.row_count),
+            holdout_index=entry.holdout_index,
+            holdout_mae=holdout_mae,
+            update_mode="incremental",
+            update_seconds=time.perf_counter() - started,
+            incremental_updates=entry.incremental_updates + 1,
+            dataset_id=entry.dataset_id,
+            base=entry.base
+        )
+
+    def _load_artifact(self, snapshot, metric, model_name):
+        """Adopt a model another worker already trained on exactly this data"""
+        if not model_artifacts.enabled:
+            return None
+        started = time.perf_counter()
+        digest = training_digest(snapshot.frame, metric, snapshot.row_count)
+        payload = model_artifacts.load(metric, model_name, digest)
+        if payload is None:
+            return None
+        return ModelEntry(
+            metric=metric,
+            model_name=model_name,
+            trained_name=payload["trained_name"],
+            model=payload["model"],
+            data_version=snapshot.version,
+            row_count=snapshot.row_count,
+            digest=digest,
+            holdout_index=payload["holdout_index"],
+            holdout_mae=payload["holdout_mae"],
+            update_mode="shared",
+            update_seconds=time.perf_counter() - started,
+            incremental_updates=payload["incremental_updates"],
+            dataset_id=snapshot.dataset_id,
+            base=payload.get("base", "full")
+        )
+
+    def _save_artifact(self, entry):
+        model_artifacts.save(entry.metric, entry.model_name, entry.digest, {
+            "trained_name": entry.trained_name,
+            "model": entry.model,
+            "holdout_index": entry.holdout_index,
+            "holdout_mae": entry.holdout_mae,
+            "incremental_updates": entry.incremental_updates,
+            "base": entry.base
+        })
+
+    def _report(self, entry, action, reason):
+        return {
+            "metric": entry.metric,
+            "model": entry.model_name,
+            "action": action,
+            "reason": reason,
+            "data_version": entry.data_version,
+            "trees": count_trees(entry.model),
+            "holdout_mae": entry.holdout_mae,
+            "seconds": round(entry.update_seconds, 3) if action != "reuse" else 0.0
+        }
+
+    def refresh_all(self, snapshot, mode="auto", rounds=None, metric=None, model_names=None):
+        """Refresh every registered model of the snapshot's dataset (optionally filtered) against `snapshot`"""
+        reports = []
+        for entry in self.entries(snapshot.dataset_id or "default"):
+            if metric is not None and entry.metric != metric:
+                continue
+            if model_names is not None and entry.model_name not in model_names:
+                continue
+            _, report = self.refresh(snapshot, entry.metric, entry.model_name, mode=mode, rounds=rounds)
+            reports.append(report)
+        return reports
+
+model_registry = ModelRegistry()
@@ -0,0 +1,250 @@
+"""
+Out-of-core training for tables larger than a worker's memory.
+
+The table is streamed in `STREAM_CHUNK_ROWS` chunks (a server-side cursor
+on Postgres, chunked reads of the CSV fallback) and only a time-stratified
+reservoir sample of at most `STREAM_SAMPLE_ROWS` rows is kept: every
+`STREAM_STRATUM_DAYS`-day period of history gets an equal share, filled by
+reservoir sampling (Algorithm R) so each row of the period is equally
+likely to be kept, however many rows the period has. A second, smaller
+reservoir holds the hold-out rows. Models are trained on the sample with
+the same features as the in-memory path, so memory is bounded by one chunk
+plus the sample rather than by the table.
+"""
+
+from fastapi import HTTPException
+import numpy as np
+import pandas as pd
+import time
+import os
+from app.services.data_store import CSV_PATH, DERIVED_COLUMNS, build_filtered_query, get_engine
+from app.services.model_registry import FEATURE_COLS, ModelEntry, mean_absolute_error, train_single_model, validation_split
+
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', '100000'))
+# Rows kept for training across all strata; the hold-out reservoir gets a fraction on top
+STREAM_SAMPLE_ROWS = int(os.getenv('STREAM_SAMPLE_ROWS', '500000'))
+STREAM_STRATUM_DAYS = int(os.getenv('STREAM_STRATUM_DAYS', '30'))
+STREAM_HOLDOUT_FRACTION = float(os.getenv('STREAM_HOLDOUT_FRACTION', '0.2'))
+
+DAY_NS = 86_400 * 10**9
+ENERGY = 'Energy_Consumption_kWh'
+
+def stream_columns(metrics):
+    """Raw columns a streaming pass reads for `metrics`"""
+    derived = [metric for metric in metrics if metric in DERIVED_COLUMNS]
+    if derived:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Derived column(s) {', '.join(derived)} depend on the whole table and cannot be trained from a stream"
+        )
+    return ['Timestamp'] + list(dict.fromkeys([ENERGY] + list(metrics)))
+
+def stream_chunks(columns, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Yield the table's `columns` in chunks of `chunk_rows`: from Postgres
+    through a server-side cursor in Timestamp order, or from the CSV fallback.
+    """
+    query = build_filtered_query(columns)
+    try:
+        connection = get_engine().connect()
+    except Exception as e:
+        print(f"⚠️ Streaming from database unavailable ({e.__class__.__name__}), reading CSV in chunks")
+        yield from pd.read_csv(CSV_PATH, usecols=columns, chunksize=chunk_rows)
+        return
+    with connection:
+        conn = connection.execution_options(stream_results=True, max_row_buffer=chunk_rows)
+        yield from pd.read_sql(query, conn, chunksize=chunk_rows)
+
+def timestamps_ns(values):
+    """Timestamps as int64 nanoseconds of their wall-clock time"""
+    stamps = pd.to_datetime(values)
+    if stamps.dt.tz is not None:
+        stamps = stamps.dt.tz_localize(None)
+    return stamps.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+class StratifiedReservoir:
+    """
+    Uniform sample of at most `capacity` rows, split evenly across time
+    strata of `stratum_ns`.
+
+    A stratum's share shrinks as new strata appear; rows over the new share
+    are dropped at random, which keeps each stratum's sample uniform.
+    """
+
+    def __init__(self, capacity, width, stratum_ns, rng):
+        self.capacity = capacity
+        self.width = width
+        self.stratum_ns = stratum_ns
+        self._rng = rng
+        self._strata = {}  # stratum -> [stamps, values, rows seen]
+
+    @property
+    def share(self):
+        return max(1, self.capacity // max(1, len(self._strata)))
+
+    @property
+    def nbytes(self):
+        return sum(stamps.nbytes + values.nbytes for stamps, values, _ in self._strata.values())
+
+    def add(self, stamps, values):
+        if len(stamps) == 0:
+            return
+        keys = stamps // self.stratum_ns
+        order = np.argsort(keys, kind='stable')
+        keys, stamps, values = keys[order], stamps[order], values[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+        new = [int(k) for k in keys[starts] if int(k) not in self._strata]
+        if new:
+            for key in new:
+                self._strata[key] = [np.empty(0, np.int64), np.empty((0, self.width), np.float32), 0]
+            share = self.share
+            for state in self._strata.values():
+                if len(state[0]) > share:
+                    keep = np.sort(self._rng.choice(len(state[0]), share, replace=False))
+                    state[0], state[1] = state[0][keep], state[1][keep]
+
+        share = self.share
+        for start, end in zip(starts, np.r_[starts[1:], len(keys)]):
+            self._add(self._strata[int(keys[start])], stamps[start:end], values[start:end], share)
+
+    def _add(self, state, stamps, values, share):
+        kept, kept_values, seen = state
+        free = share - len(kept)
+        if free > 0:
+            take = min(free, len(stamps))
+            kept = np.concatenate([kept, stamps[:take]])
+            kept_values = np.concatenate([kept_values, values[:take]])
+            seen += take
+            stamps, values = stamps[take:], values[take:]
+        if len(stamps):
+            # Algorithm R in bulk: the i-th row seen lands in slot floor(u * i) if that slot exists
+            positions = seen + np.arange(1, len(stamps) + 1)
+            slots = (self._rng.random(len(stamps)) * positions).astype(np.int64)
+            hit = slots < len(kept)
+            kept[slots[hit]] = stamps[hit]
+            kept_values[slots[hit]] = values[hit]
+            seen += len(stamps)
+        state[0], state[1], state[2] = kept, kept_values, seen
+
+    def sample(self):
+        """Kept (stamps, values) in time order"""
+        if not self._strata:
+            return np.empty(0, np.int64), np.empty((0, self.width), np.float32)
+        stamps = np.concatenate([state[0] for state in self._strata.values()])
+        values = np.concatenate([state[1] for state in self._strata.values()])
+        order = np.argsort(stamps, kind='stable')
+        return stamps[order], values[order]
+
+class StreamSample:
+    """Training and hold-out rows sampled from one streaming pass over the table"""
+
+    def __init__(self, columns, train, holdout, rows_streamed, chunks, first_stamp, strata, seconds, peak_bytes):
+        # Columns of the value arrays (everything streamed but Timestamp)
+        self.columns = columns
+        self.train = train
+        self.holdout = holdout
+        self.rows_streamed = rows_streamed
+        self.chunks = chunks
+        self.first_stamp = first_stamp
+        self.strata = strata
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+
+    def matrices(self, metric):
+        """(X_train, y_train, X_test, y_test) for `metric`, with the in-memory path's features"""
+        return (*self._matrix(self.train, metric), *self._matrix(self.holdout, metric))
+
+    def _matrix(self, rows, metric):
+        stamps, values = rows
+        energy = values[:, self.columns.index(ENERGY)]
+        y = values[:, self.columns.index(metric)]
+        valid = ~(np.isnan(energy) | np.isnan(y))
+        stamps, energy, y = stamps[valid], energy[valid], y[valid]
+        dates = stamps.astype('datetime64[ns]')
+        X = np.column_stack([
+            energy,
+            (stamps - self.first_stamp) // DAY_NS,
+            dates.astype('datetime64[M]').astype(np.int64) % 12 + 1,
+            (dates.astype('datetime64[D]') - dates.astype('datetime64[Y]')).astype(np.int64) + 1
+        ]).astype(np.float32)
+        return pd.DataFrame(X, columns=FEATURE_COLS, copy=False), y
+
+    def info(self):
+        return {
+            "rows_streamed": self.rows_streamed,
+            "chunks": self.chunks,
+            "train_rows": len(self.train[0]),
+            "holdout_rows": len(self.holdout[0]),
+            "strata": self.strata,
+            "peak_sample_bytes": self.peak_bytes,
+            "seconds": round(self.seconds, 3)
+        }
+
+def sample_stream(metrics, chunks=None, sample_rows=STREAM_SAMPLE_ROWS, stratum_days=STREAM_STRATUM_DAYS,
+                  holdout_fraction=STREAM_HOLDOUT_FRACTION, should_stop=None, seed=42):
+    """
+    One pass over `chunks` (default: the streamed table) into train and
+    hold-out reservoirs; each row goes to the hold-out with `holdout_fraction`.
+    """
+    started = time.perf_counter()
+    columns = stream_columns(metrics)
+    value_columns = columns[1:]
+    if chunks is None:
+        chunks = stream_chunks(columns)
+    rng = np.random.default_rng(seed)
+    train = StratifiedReservoir(sample_rows, len(value_columns), stratum_days * DAY_NS, rng)
+    holdout = StratifiedReservoir(max(1, int(sample_rows * holdout_fraction)), len(value_columns),
+                                  stratum_days * DAY_NS, rng)
+    rows, count, first_stamp, peak = 0, 0, None, 0
+    for chunk in chunks:
+        if should_stop is not None and should_stop():
+            raise HTTPException(status_code=409, detail="Streaming pass cancelled")
+        missing = [column for column in columns if column not in chunk.columns]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Column(s) not found in table: {', '.join(missing)}")
+        stamps = timestamps_ns(chunk['Timestamp'])
+        values = chunk[value_columns].to_numpy(dtype=np.float32)
+        valid = stamps != np.iinfo(np.int64).min  # NaT
+        stamps, values = stamps[valid], values[valid]
+        if len(stamps):
+            first_stamp = int(stamps.min()) if first_stamp is None else min(first_stamp, int(stamps.min()))
+            to_holdout = rng.random(len(stamps)) < holdout_fraction
+            train.add(stamps[~to_holdout], values[~to_holdout])
+            holdout.add(stamps[to_holdout], values[to_holdout])
+        rows += len(chunk)
+        count += 1
+        peak = max(peak, train.nbytes + holdout.nbytes)
+    if first_stamp is None:
+        raise HTTPException(status_code=400, detail="No valid data for training")
+    print(f"🌊 Streamed {rows} rows in {count} chunks, kept {len(train.sample()[0])} for training")
+    return StreamSample(value_columns, train.sample(), holdout.sample(), rows, count, first_stamp,
+                        len(train._strata), time.perf_counter() - started, peak)
+
+def train_from_sample(sample, metric, model_name):
+    """
+    Fit one model on a StreamSample; returns a ModelEntry for the default
+    dataset. It has no data version: the first forecast against the loaded
+    table adopts it as that version's full fit (see ModelRegistry.choose_update).
+    """
+    started = time.perf_counter()
+    X_train, y_train, X_test, y_test = sample.matrices(metric)
+    if len(X_train) == 0:
+        raise HTTPException(status_code=400, detail="No valid data for training")
+    X_fit, y_fit, eval_set = validation_split(X_train, y_train)
+    trained_name, model = train_single_model(model_name, X_fit, y_fit, eval_set=eval_set)
+    return ModelEntry(
+        metric=metric,
+        model_name=model_name,
+        trained_name=trained_name,
+        model=model,
+        data_version=None,
+        row_count=sample.rows_streamed,
+        digest=None,
+        holdout_index=None,
+        holdout_mae=mean_absolute_error(model, X_test, y_test),
+        update_mode="streaming",
+        update_seconds=time.perf_counter() - started,
+        dataset_id=None,
+        base="streaming"
+    )
@@ -0,0 +1,350 @@
+"""
+Two-tier read-through cache for computed endpoint payloads.
+
+Tier 1 is an in-process LRU. Tier 2 is the `dashboard_data` table (Postgres),
+or a SQLite file with the same columns when no database is reachable, so
+horizontally scaled instances share results. Keys embed the dataset content
+fingerprint, so a data change never serves stale payloads.
+
+Stampede protection:
+- single flight: concurrent misses for one key wait for a single computation;
+- probabilistic early refresh (XFetch): shortly before expiry, one caller
+  recomputes while the others keep getting the cached value, which spreads
+  recomputation across instances instead of all expiring at once.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+import threading
+import tempfile
+import hashlib
+import random
+import sqlite3
+import math
+import json
+import time
+import uuid
+import os
+from app.services.data_store import get_engine
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'auto')  # auto, postgres, sqlite, memory
+CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH', os.path.join(tempfile.gettempdir(), "greenview-cache.sqlite3"))
+CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', '3600'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '256'))
+CACHE_SWEEP_SECONDS = int(os.getenv('CACHE_SWEEP_SECONDS', '300'))
+# XFetch aggressiveness; 0 disables early refresh
+CACHE_EARLY_REFRESH_BETA = float(os.getenv('CACHE_EARLY_REFRESH_BETA', '1.0'))
+
+def make_cache_key(namespace, params, data_fingerprint):
+    """Stable key for a namespace, request parameters and dataset content"""
+    canonical = json.dumps({"ns": namespace, "params": params, "data": data_fingerprint},
+                           sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+def should_refresh_early(expires_at, compute_seconds, beta=CACHE_EARLY_REFRESH_BETA):
+    """XFetch: refresh before expiry with a probability growing as expiry nears"""
+    if beta <= 0 or compute_seconds <= 0:
+        return False
+    return time.time() - compute_seconds * beta * math.log(random.random() or 1e-12) >= expires_at
+
+class PostgresCacheBackend:
+    """Shared tier stored in the `dashboard_data` table"""
+
+    name = "postgres"
+
+    def __init__(self, engine):
+        from sqlalchemy import text
+        self._text = text
+        self.engine = engine
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1 FROM dashboard_data LIMIT 0"))
+
+    def get(self, namespace, key):
+        with self.engine.connect() as conn:
+            row = conn.execute(self._text(
+                "SELECT data, EXTRACT(EPOCH FROM expires_at) FROM dashboard_data "
+                "WHERE data_type = :ns AND data->>'cache_key' = :key AND expires_at > NOW() "
+                "ORDER BY generated_at DESC LIMIT 1"
+            ), {"ns": namespace, "key": key}).first()
+        if row is None:
+            return None
+        data = row[0] if isinstance(row[0], dict) else json.loads(row[0])
+        return data["payload"], float(row[1]), float(data.get("compute_seconds", 0.0))
+
+    def set(self, namespace, key, payload, expires_at, compute_seconds):
+        document = json.dumps({"cache_key": key, "payload": payload, "compute_seconds": compute_seconds}, default=str)
+        with self.engine.begin() as conn:
+            conn.execute(self._text(
+                "DELETE FROM dashboard_data WHERE data_type = :ns AND data->>'cache_key' = :key"
+            ), {"ns": namespace, "key": key})
+            conn.execute(self._text(
+                "INSERT INTO dashboard_data (data_type, data, generated_at, expires_at) "
+                "VALUES (:ns, CAST(:data AS JSONB), NOW(), :expires_at)"
+            ), {"ns": namespace, "data": document,
+                "expires_at": datetime.fromtimestamp(expires_at, tz=timezone.utc)})
+
+    def sweep(self):
+        with self.engine.begin() as conn:
+            result = conn.execute(self._text("DELETE FROM dashboard_data WHERE expires_at < NOW()"))
+        return result.rowcount or 0
+
+class SQLiteCacheBackend:
+    """Local stand-in for `dashboard_data` with the same columns"""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dashboard_data ("
+                "id TEXT PRIMARY KEY, dataset_id TEXT, data_type TEXT NOT NULL, cache_key TEXT NOT NULL, "
+                "data TEXT NOT NULL, generated_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_dashboard_data_expires_at ON dashboard_data(expires_at)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_dashboard_data_cache_key ON dashboard_data(data_type, cache_key)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, namespace, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data, expires_at FROM dashboard_data WHERE data_type = ? AND cache_key = ? AND expires_at > ?",
+                (namespace, key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        return data["payload"], float(row[1]), float(data.get("compute_seconds", 0.0))
+
+    def set(self, namespace, key, payload, expires_at, compute_seconds):
+        document = json.dumps({"cache_key": key, "payload": payload, "compute_seconds": compute_seconds}, default=str)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO dashboard_data (id, data_type, cache_key, data, generated_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(uuid.uuid4()), namespace, key, document, time.time(), expires_at)
+            )
+
+    def sweep(self):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM dashboard_data WHERE expires_at < ?", (time.time(),)).rowcount
+
+def create_backend(kind=CACHE_BACKEND):
+    """Pick the shared tier: Postgres `dashboard_data` when reachable, else SQLite"""
+    if kind == "memory":
+        return None
+    if kind in ("auto", "postgres"):
+        try:
+            backend = PostgresCacheBackend(get_engine())
+            print("✅ Result cache backed by dashboard_data")
+            return backend
+        except Exception as e:
+            if kind == "postgres":
+                print(f"⚠️ dashboard_data cache unavailable, using in-process cache only: {e}")
+                return None
+            print(f"⚠️ dashboard_data cache unavailable ({e.__class__.__name__}), using SQLite stand-in")
+    try:
+        return SQLiteCacheBackend(CACHE_SQLITE_PATH)
+    except Exception as e:
+        print(f"⚠️ SQLite cache unavailable, using in-process cache only: {e}")
+        return None
+
+class ResultCache:
+    """In-process LRU in front of a shared `dashboard_data` backend"""
+
+    def __init__(self, backend="lazy", max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS):
+        self._backend = backend
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (payload, expires_at, compute_seconds, namespace)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._last_sweep = time.time()
+        self._stats = {}
+
+    @property
+    def backend(self):
+        if self._backend == "lazy":
+            self._backend = create_backend()
+        return self._backend
+
+    def _count(self, namespace, field, amount=1):
+        with self._lock:
+            stats = self._stats.setdefault(namespace, {
+                "memory_hits": 0, "shared_hits": 0, "misses": 0, "early_refreshes": 0,
+                "coalesced_waits": 0, "compute_seconds": 0.0, "backend_errors": 0
+            })
+            stats[field] += amount
+
+    def _memory_get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item
+
+    def _memory_set(self, key, payload, expires_at, compute_seconds, namespace):
+        with self._lock:
+            self._entries[key] = (payload, expires_at, compute_seconds, namespace)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _shared_get(self, namespace, key):
+        backend = self.backend
+        if backend is None:
+            return None
+        try:
+            return backend.get(namespace, key)
+        except Exception as e:
+            self._count(namespace, "backend_errors")
+            print(f"⚠️ Cache backend read failed: {e}")
+            return None
+
+    def _shared_set(self, namespace, key, payload, expires_at, compute_seconds):
+        backend = self.backend
+        if backend is None:
+            return
+        try:
+            backend.set(namespace, key, payload, expires_at, compute_seconds)
+        except Exception as e:
+            self._count(namespace, "backend_errors")
+            print(f"⚠️ Cache backend write failed: {e}")
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        if time.time() - self._last_sweep < CACHE_SWEEP_SECONDS or self.backend is None:
+            return
+        self._last_sweep = time.time()
+        try:
+            removed = self.backend.sweep()
+            if removed:
+                print(f"🧹 Swept {removed} expired cache rows")
+        except Exception as e:
+            print(f"⚠️ Cache sweep failed: {e}")
+
+    def get_or_compute(self, namespace, params, data_fingerprint, compute, ttl_seconds=None):
+        """Return the cached payload for (namespace, params, data), computing it at most once"""
+        key = make_cache_key(namespace, params, data_fingerprint)
+        ttl_seconds = ttl_seconds or self.ttl_seconds
+
+        item = self._memory_get(key)
+        if item is not None:
+            payload, expires_at, compute_seconds, _ = item
+            if not should_refresh_early(expires_at, compute_seconds):
+                self._count(namespace, "memory_hits")
+                return payload
+            # Early refresh: one caller recomputes, everyone else keeps the cached value
+            flight = self._begin_flight(key)
+            if flight is None:
+                self._count(namespace, "memory_hits")
+                return payload
+            self._count(namespace, "early_refreshes")
+            return self._compute(namespace, key, compute, ttl_seconds, flight)
+
+        while True:
+            flight = self._begin_flight(key)
+            if flight is not None:
+                break
+            # Another request is computing this key; wait for it, then re-check
+            self._count(namespace, "coalesced_waits")
+            self._wait_flight(key)
+            item = self._memory_get(key)
+            if item is not None:
+                self._count(namespace, "memory_hits")
+                return item[0]
+
+        try:
+            item = self._memory_get(key)
+            if item is not None:
+                self._end_flight(key, flight)
+                self._count(namespace, "memory_hits")
+                return item[0]
+            shared = self._shared_get(namespace, key)
+            if shared is not None:
+                payload, expires_at, compute_seconds = shared
+                self._memory_set(key, payload, expires_at, compute_seconds, namespace)
+                self._end_flight(key, flight)
+                self._count(namespace, "shared_hits")
+                return payload
+        except Exception:
+            self._end_flight(key, flight)
+            raise
+
+        self._count(namespace, "misses")
+        return self._compute(namespace, key, compute, ttl_seconds, flight)
+
+    def _compute(self, namespace, key, compute, ttl_seconds, flight):
+        try:
+            started = time.perf_counter()
+            payload = compute()
+            compute_seconds = time.perf_counter() - started
+            expires_at = time.time() + ttl_seconds
+            self._memory_set(key, payload, expires_at, compute_seconds, namespace)
+            self._count(namespace, "compute_seconds", compute_seconds)
+            self._shared_set(namespace, key, payload, expires_at, compute_seconds)
+            return payload
+        finally:
+            self._end_flight(key, flight)
+
+    def _begin_flight(self, key):
+        with self._lock:
+            if key in self._inflight:
+                return None
+            event = threading.Event()
+            self._inflight[key] = event
+            return event
+
+    def _wait_flight(self, key):
+        with self._lock:
+            event = self._inflight.get(key)
+        if event is not None:
+            event.wait()
+
+    def _end_flight(self, key, event):
+        with self._lock:
+            if self._inflight.get(key) is event:
+                del self._inflight[key]
+        event.set()
+
+    def invalidate(self, namespace=None):
+        """Drop in-process entries (shared rows expire or are keyed by data fingerprint)"""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                for key in [k for k, v in self._entries.items() if v[3] == namespace]:
+                    del self._entries[key]
+
+    def stats(self):
+        """Hit-rate metrics per namespace and overall"""
+        with self._lock:
+            namespaces = {ns: dict(s) for ns, s in self._stats.items()}
+            entries = len(self._entries)
+        totals = {"memory_hits": 0, "shared_hits": 0, "misses": 0}
+        for s in namespaces.values():
+            lookups = s["memory_hits"] + s["shared_hits"] + s["misses"]
+            s["hit_rate"] = round((s["memory_hits"] + s["shared_hits"]) / lookups, 4) if lookups else None
+            s["compute_seconds"] = round(s["compute_seconds"], 3)
+            for field in totals:
+                totals[field] += s[field]
+        lookups = sum(totals.values())
+        backend = self._backend if self._backend != "lazy" else None
+        return {
+            "backend": backend.name if backend is not None else "memory",
+            "memory_entries": entries,
+            "max_entries": self.max_entries,
+            "hit_rate": round((totals["memory_hits"] + totals["shared_hits"]) / lookups, 4) if lookups else None,
+            **totals,
+            "namespaces": namespaces
+        }
+
+result_cache = ResultCache()
@@ -0,0 +1,250 @@
+from fastapi import HTTPException
+import numpy as np
+import threading
+import warnings
+import os
+from app.services.data_store import dataset_store
+
+# Query name -> dataset column
+ROLLING_DIMENSIONS = {
+    "facility": "Facility",
+    "region": "Region"
+}
+ROLLING_WINDOWS = (7, 30, 90)
+ROLLING_MEASURES = [
+    'Energy_Consumption_kWh',
+    'CO2_Emissions_kg',
+    'Renewable_Energy_Percentage',
+    'Recycled_Waste_Percentage'
+]
+# Initial ring slots per group; rings double when a window would not fit
+ROLLING_MIN_CAPACITY = int(os.getenv('ROLLING_MIN_CAPACITY', '32'))
+
+EMPTY_DAY = np.iinfo(np.int32).min
+
+def day_numbers(timestamps):
+    """Days since the epoch of each timestamp"""
+    return timestamps.to_numpy().astype('datetime64[D]').astype(np.int64).astype(np.int32)
+
+def _capacity(rows):
+    capacity = ROLLING_MIN_CAPACITY
+    while capacity < rows:
+        capacity *= 2
+    return capacity
+
+class RingWindows:
+    """
+    The rows of the last `span` days of every group in ring buffers.
+
+    All groups share one capacity, so the state is three compact arrays:
+    `days` (groups x slots), `values` (groups x slots x measures) and a
+    write position per group. A new row overwrites the oldest slot of its
+    group; when that slot still lies inside the span, every ring doubles
+    instead, so windows are always exact.
+    """
+
+    def __init__(self, measures, span, capacity=ROLLING_MIN_CAPACITY):
+        self.measures = measures
+        self.span = span
+        self.members = []
+        self._index = {}
+        self.days = np.full((0, capacity), EMPTY_DAY, dtype=np.int32)
+        self.values = np.full((0, capacity, len(measures)), np.nan, dtype=np.float32)
+        self.head = np.zeros(0, dtype=np.int64)
+        self.latest_day = None
+
+    @property
+    def capacity(self):
+        return self.days.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.days.nbytes + self.values.nbytes + self.head.nbytes
+
+    def _group_indices(self, members):
+        new = [m for m in dict.fromkeys(members) if m not in self._index]
+        if new:
+            for member in new:
+                self._index[member] = len(self.members)
+                self.members.append(member)
+            extra = len(new)
+            self.days = np.concatenate([self.days, np.full((extra, self.capacity), EMPTY_DAY, dtype=np.int32)])
+            self.values = np.concatenate(
+                [self.values, np.full((extra, self.capacity, len(self.measures)), np.nan, dtype=np.float32)]
+            )
+            self.head = np.concatenate([self.head, np.zeros(extra, dtype=np.int64)])
+        return np.fromiter((self._index[m] for m in members), dtype=np.int64, count=len(members))
+
+    def _grow(self, capacity):
+        """Unroll every ring oldest-first into a larger one"""
+        order = (self.head[:, None] + np.arange(self.capacity)) % self.capacity
+        days = np.full((len(self.members), capacity), EMPTY_DAY, dtype=np.int32)
+        values = np.full((len(self.members), capacity, len(self.measures)), np.nan, dtype=np.float32)
+        days[:, :self.capacity] = np.take_along_axis(self.days, order, axis=1)
+        values[:, :self.capacity] = np.take_along_axis(self.values, order[:, :, None], axis=1)
+        self.head = np.full(len(self.members), self.capacity, dtype=np.int64)
+        self.days, self.values = days, values
+
+    def append(self, members, days, values):
+        """Add rows (member labels, day numbers, measure matrix) in arrival order"""
+        if len(days) == 0:
+            return
+        groups = self._group_indices(members)
+        latest = int(days.max()) if self.latest_day is None else max(self.latest_day, int(days.max()))
+        cutoff = latest - self.span + 1
+
+        # Every ring must hold its live rows plus the whole batch
+        needed = (self.days >= cutoff).sum(axis=1) + np.bincount(groups, minlength=len(self.members))
+        if needed.max() > self.capacity:
+            self._grow(_capacity(int(needed.max())))
+
+        # Slot of each row: its group's write position plus its rank within the batch
+        order = np.argsort(groups, kind='stable')
+        sorted_groups = groups[order]
+        rank = np.empty(len(groups), dtype=np.int64)
+        rank[order] = np.arange(len(groups)) - np.searchsorted(sorted_groups, sorted_groups, side='left')
+        slots = (self.head[groups] + rank) % self.capacity
+        if (self.days[groups, slots] >= cutoff).any():
+            # Rows arrived out of order and the oldest slot is still inside the span
+            self._grow(self.capacity * 2)
+            slots = (self.head[groups] + rank) % self.capacity
+        self.days[groups, slots] = days
+        self.values[groups, slots] = values
+        self.head += np.bincount(groups, minlength=len(self.members))
+        self.head %= self.capacity
+        self.latest_day = latest
+
+    def window(self, days, percentiles=()):
+        """
+        Per group and measure: row count, mean and percentiles over the last
+        `days` days up to the latest day, computed for all groups at once.
+        """
+        cutoff = self.latest_day - days + 1
+        inside = (self.days >= cutoff)[:, :, None]
+        masked = np.where(inside, self.values, np.nan)
+        counts = (~np.isnan(masked)).sum(axis=1)
+        sums = np.nansum(masked, axis=1, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        quantiles = {}
+        if percentiles and len(self.members):
+            with warnings.catch_warnings():
+                # Groups without rows in the window yield NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                values = np.nanpercentile(masked, percentiles, axis=1)
+            quantiles = {p: values[i] for i, p in enumerate(percentiles)}
+        return counts, means, quantiles
+
+class RollingStatsEngine:
+    """
+    7/30/90-day rolling means and percentiles per facility and region.
+
+    Keeps ring-buffer windows (see RingWindows) built from the last rows of
+    the cached dataset and advanced with appended rows through the
+    DatasetStore subscription; any other data change rebuilds them on the
+    next query. Queries never group the full history.
+    """
+
+    def __init__(self, store=dataset_store, windows=ROLLING_WINDOWS, measures=ROLLING_MEASURES):
+        self._store = store
+        self.windows = windows
+        self.measures = measures
+        self._lock = threading.Lock()
+        self._rings = {}
+        self.version = None
+        store.subscribe(self.on_data_change)
+
+    def on_data_change(self, snapshot, new_rows):
+        """DatasetStore subscriber: advance the windows, or invalidate"""
+        with self._lock:
+            if self.version is None:
+                return
+            if new_rows is None:
+                self.version = None
+                return
+            self._append(new_rows)
+            self.version = snapshot.version
+
+    def ensure_current(self):
+        """Return the snapshot the windows reflect, rebuilding them if stale"""
+        snapshot = self._store.get()
+        with self._lock:
+            if self.version != snapshot.version:
+                self._build(snapshot)
+        return snapshot
+
+    def _build(self, snapshot):
+        frame = snapshot.frame
+        measures = [m for m in self.measures if m in frame.columns]
+        span = max(self.windows)
+        # Only rows that can fall inside the longest window are kept
+        days = day_numbers(frame['Timestamp'])
+        recent = frame[days >= days.max() - span + 1] if len(frame) else frame
+        self._rings = {
+            dimension: RingWindows(measures, span)
+            for dimension, column in ROLLING_DIMENSIONS.items() if column in frame.columns
+        }
+        self._append(recent)
+        self.version = snapshot.version
+        print(f"🪟 Rolling windows built for dataset version {snapshot.version} "
+              f"({len(recent)} rows, {self.nbytes() / 1024:.0f} KiB)")
+
+    def _append(self, rows):
+        if rows.empty:
+            return
+        days = day_numbers(rows['Timestamp'])
+        for dimension, ring in self._rings.items():
+            members = rows[ROLLING_DIMENSIONS[dimension]].astype(str).tolist()
+            ring.append(members, days, rows[ring.measures].to_numpy(dtype=np.float32))
+
+    def nbytes(self):
+        return sum(ring.nbytes for ring in self._rings.values())
+
+    def query(self, dimension, windows=None, measures=None, percentiles=(50, 90), members=None):
+        """Rolling statistics of every (or the given) member for each window"""
+        if dimension not in ROLLING_DIMENSIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown dimension '{dimension}'. Use one of: {', '.join(ROLLING_DIMENSIONS)}")
+        windows = windows or self.windows
+        unsupported = [w for w in windows if not 1 <= w <= max(self.windows)]
+        if unsupported:
+            raise HTTPException(status_code=400, detail=f"Windows must be between 1 and {max(self.windows)} days")
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+
+        with self._lock:
+            ring = self._rings.get(dimension)
+            if ring is None:
+                raise HTTPException(status_code=400, detail=f"Dimension '{dimension}' is not present in the dataset")
+            measures = measures or ring.measures
+            missing = [m for m in measures if m not in ring.measures]
+            if missing:
+                raise HTTPException(status_code=400, detail=f"Unknown measure(s): {', '.join(missing)}")
+            if ring.latest_day is None:
+                return None, []
+            columns = [ring.measures.index(m) for m in measures]
+            computed = {w: ring.window(w, tuple(percentiles)) for w in windows}
+            names = list(ring.members)
+            as_of = np.datetime64(int(ring.latest_day), 'D')
+
+        wanted = set(members) if members else None
+        results = []
+        for g, member in enumerate(names):
+            if wanted is not None and member not in wanted:
+                continue
+            item = {"member": member}
+            for w, (counts, means, quantiles) in computed.items():
+                item[f"{w}d"] = {
+                    m: {
+                        "count": int(counts[g, c]),
+                        "mean": _value(means[g, c]),
+                        **{f"p{p:g}": _value(q[g, c]) for p, q in quantiles.items()}
+                    }
+                    for m, c in zip(measures, columns)
+                }
+            results.append(item)
+        return str(as_of), sorted(results, key=lambda item: item["member"])
+
+def _value(x):
+    return round(float(x), 4) if np.isfinite(x) else None
+
+rolling_stats = RollingStatsEngine()
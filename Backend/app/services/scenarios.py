@@ -0,0 +1,85 @@
+from fastapi import HTTPException
+import pandas as pd
+import numpy as np
+import os
+from app.services.forecast_cache import build_future_frame
+from app.services.model_registry import FEATURE_COLS
+
+SCENARIO_TYPES = ("constant", "ramp")
+# Upper bound on scenarios x horizon days evaluated by one request
+SCENARIO_MAX_CELLS = int(os.getenv('SCENARIO_MAX_CELLS', '200000'))
+
+def scenario_label(scenario):
+    if scenario.get("name"):
+        return scenario["name"]
+    if scenario.get("level") is not None:
+        return f"{scenario['type']} {scenario['level']:g} kWh"
+    return f"{scenario['type']} {scenario.get('change_percent', 0.0):+g}%"
+
+def energy_trajectories(scenarios, base_energy, forecast_days):
+    """
+    Energy_Consumption_kWh per scenario and horizon day, shape (scenarios, days).
+
+    - constant: `level` kWh, or the last observed value changed by `change_percent`
+    - ramp: linear path from the last observed value (day 1) to `level` or to
+      the last value changed by `change_percent` (last horizon day)
+    """
+    days = np.arange(1, forecast_days + 1, dtype=np.float64)
+    progress = days / forecast_days
+    trajectories = np.empty((len(scenarios), forecast_days), dtype=np.float64)
+    for i, scenario in enumerate(scenarios):
+        kind = scenario.get("type", "constant")
+        if kind not in SCENARIO_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unknown scenario type '{kind}'. Use one of: {', '.join(SCENARIO_TYPES)}")
+        if scenario.get("level") is not None:
+            target = float(scenario["level"])
+        else:
+            target = base_energy * (1 + float(scenario.get("change_percent") or 0.0) / 100)
+        if kind == "constant":
+            trajectories[i] = target
+        else:
+            trajectories[i] = base_energy + (target - base_energy) * progress
+    return trajectories
+
+def build_scenario_matrix(df, trajectories):
+    """
+    Stack every scenario's horizon into one feature matrix (scenario-major).
+
+    Time features are the same for every scenario, so they are built once and
+    tiled; only the energy column differs between scenario blocks.
+    """
+    n_scenarios, forecast_days = trajectories.shape
+    future_df, future_dates = build_future_frame(df, forecast_days)
+    time_features = future_df[FEATURE_COLS].to_numpy(dtype=np.float32)
+    stacked = np.tile(time_features, (n_scenarios, 1))
+    stacked[:, FEATURE_COLS.index('Energy_Consumption_kWh')] = trajectories.reshape(-1)
+    return pd.DataFrame(stacked, columns=FEATURE_COLS, copy=False), future_dates
+
+def simulate_scenarios(df, models, metric, scenarios, forecast_days):
+    """
+    Evaluate scenarios x horizon days x models with one predict call per model.
+
+    Returns (dates, trajectories, {model: (scenarios, days) predictions}).
+    """
+    if not scenarios:
+        raise HTTPException(status_code=400, detail="At least one scenario is required")
+    if forecast_days < 1:
+        raise HTTPException(status_code=400, detail="forecast_days must be at least 1")
+    if len(scenarios) * forecast_days > SCENARIO_MAX_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(scenarios)} scenarios x {forecast_days} days exceeds the limit of {SCENARIO_MAX_CELLS} cells"
+        )
+
+    base_energy = float(df['Energy_Consumption_kWh'].iloc[-1])
+    trajectories = energy_trajectories(scenarios, base_energy, forecast_days)
+    features, future_dates = build_scenario_matrix(df, trajectories)
+
+    results = {}
+    for model_name, model in models.items():
+        pred = np.asarray(model.predict(features), dtype=np.float64).reshape(len(scenarios), forecast_days)
+        # Scale predictions for sustainability score
+        if metric == 'Sustainability_Score':
+            pred = pred * 100
+        results[model_name] = pred
+    return future_dates, trajectories, results
@@ -0,0 +1,148 @@
+from fastapi import HTTPException
+import pandas as pd
+import threading
+import time
+import os
+from app.services.data_store import CSV_PATH, TABLE_NAME, dataset_store, get_engine
+
+# How long schema read from the database or CSV is trusted before re-introspecting
+SCHEMA_TTL_SECONDS = int(os.getenv('SCHEMA_TTL_SECONDS', '300'))
+
+DERIVED_TYPES = {
+    'Year': 'int32',
+    'Month': 'int32',
+    'DayOfYear': 'int32',
+    'Elapsed_Days': 'int64',
+    'Sustainability_Score': 'float64'
+}
+
+def column_kind(type_name):
+    """Coarse kind of a pandas dtype or SQL type name"""
+    name = str(type_name).lower()
+    if 'date' in name or 'time' in name:
+        return 'datetime'
+    if any(token in name for token in ('int', 'float', 'double', 'numeric', 'decimal', 'real', 'bool')):
+        return 'numeric'
+    return 'text'
+
+def _describe(columns, row_count, source, exact, version=None):
+    """Catalog entry from [(name, type)] raw columns, adding the prepared columns"""
+    raw_columns = [name for name, _ in columns]
+    described = [
+        {"name": name, "type": str(type_name), "kind": column_kind(type_name), "derived": False}
+        for name, type_name in columns
+    ]
+    if 'Timestamp' in raw_columns:
+        described += [
+            {"name": name, "type": type_name, "kind": column_kind(type_name), "derived": True}
+            for name, type_name in DERIVED_TYPES.items() if name not in raw_columns
+        ]
+    return {
+        "source": source,
+        "version": version,
+        "row_count": row_count,
+        "row_count_exact": exact,
+        "raw_columns": raw_columns,
+        "columns": described
+    }
+
+def describe_snapshot(snapshot):
+    """Schema of the loaded snapshot, from its metadata only"""
+    dtypes = snapshot.frame.dtypes
+    columns = [(name, dtypes[name]) for name in snapshot.raw_columns]
+    return _describe(columns, snapshot.row_count, snapshot.source, True, snapshot.version)
+
+def introspect_database():
+    """Columns from information_schema and the planner's row estimate; reads no rows"""
+    from sqlalchemy import text
+    with get_engine().connect() as conn:
+        columns = conn.execute(text(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_name = :table ORDER BY ordinal_position"
+        ), {"table": TABLE_NAME}).fetchall()
+        estimate = conn.execute(text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"
+        ), {"table": TABLE_NAME}).scalar()
+    if not columns:
+        raise LookupError(f"Table {TABLE_NAME} not found")
+    return _describe([(name, data_type) for name, data_type in columns],
+                     max(int(estimate or 0), 0), "database", False)
+
+def introspect_csv(path=CSV_PATH, sample_rows=100):
+    """
+    Column types from the header and a small sample of the CSV fallback; the
+    row count is estimated from the file size and the sample's bytes per row.
+    """
+    with open(path, 'rb') as f:
+        lines = [line for _, line in zip(range(sample_rows + 2), f)]
+    sample = pd.read_csv(path, nrows=sample_rows)
+    if 'Timestamp' in sample.columns:
+        sample['Timestamp'] = pd.to_datetime(sample['Timestamp'])
+    columns = [(name, sample[name].dtype) for name in sample.columns]
+    if len(lines) <= sample_rows + 1:
+        # The sample is the whole file
+        return _describe(columns, len(sample), "csv", True)
+    header_bytes = len(lines[0])
+    row_bytes = sum(len(line) for line in lines[1:sample_rows + 1]) / sample_rows
+    estimate = round((os.path.getsize(path) - header_bytes) / row_bytes)
+    return _describe(columns, estimate, "csv", False)
+
+class SchemaCatalog:
+    """
+    Cached column names, types and row counts of the dataset.
+
+    Answers from the loaded snapshot's metadata when there is one; otherwise
+    introspects the database (information_schema) or the CSV header, so
+    validating a metric name never loads or scans the data.
+    """
+
+    def __init__(self, store=dataset_store, ttl_seconds=SCHEMA_TTL_SECONDS):
+        self._store = store
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._cached = None
+        self._expires_at = 0.0
+        store.subscribe(self.on_data_change)
+
+    def on_data_change(self, snapshot, new_rows):
+        with self._lock:
+            self._cached = describe_snapshot(snapshot)
+
+    def describe(self):
+        snapshot = self._store.peek()
+        with self._lock:
+            if snapshot is not None:
+                if self._cached is None or self._cached["version"] != snapshot.version:
+                    self._cached = describe_snapshot(snapshot)
+                return self._cached
+            if self._cached is not None and time.monotonic() < self._expires_at:
+                return self._cached
+
+            for introspect in (introspect_database, introspect_csv):
+                try:
+                    self._cached = introspect()
+                    self._expires_at = time.monotonic() + self._ttl_seconds
+                    return self._cached
+                except Exception as e:
+                    print(f"⚠️ Schema introspection via {introspect.__name__} failed: {e}")
+
+        # Neither source is reachable: describe whatever the store falls back to
+        return describe_snapshot(self._store.get())
+
+    def column_names(self):
+        return {column["name"] for column in self.describe()["columns"]}
+
+    def raw_columns(self):
+        return self.describe()["raw_columns"]
+
+    def require_column(self, name, detail=None):
+        """Raise 400 unless `name` is a column of the (prepared) dataset"""
+        if name not in self.column_names():
+            raise HTTPException(status_code=400, detail=detail or f"Column '{name}' not found in dataset")
+
+    def invalidate(self):
+        with self._lock:
+            self._cached = None
+            self._expires_at = 0.0
+
+schema_catalog = SchemaCatalog()
@@ -0,0 +1,183 @@
+from fastapi import HTTPException
+from functools import lru_cache
+import numpy as np
+import json
+import os
+
+SECTOR_EMISSIONS_PATH = os.getenv(
+    'SECTOR_EMISSIONS_PATH',
+    os.path.join(os.path.dirname(__file__), "../../World_CO2_emissions_by_sector.json")
+)
+
+YEAR_FIELD = "Category"
+# Per-capita column of the file; not a sector, so it is left out of the matrix
+PER_CAPITA_FIELD = "Total CO2/cap"
+
+STATS = ("total", "share", "cagr", "yoy")
+
+class SectorEmissionsIndex:
+    """
+    Year × sector emissions matrix with prefix sums.
+
+    `prefix[i]` holds the per-sector sums of the first i years, so the total
+    over any year window is one subtraction of two rows. Range totals, shares,
+    CAGR and year-over-year deltas are all O(1) per query (O(sectors) work),
+    and `query_many` answers a batch of windows with a single vectorized pass.
+    """
+
+    def __init__(self, years, sectors, values):
+        order = np.argsort(years)
+        self.years = np.asarray(years, dtype=np.int32)[order]
+        self.sectors = list(sectors)
+        self.values = np.ascontiguousarray(np.asarray(values, dtype=np.float64)[order])
+
+        # Column -1 is the all-sector total so totals share the sector code path
+        with_total = np.column_stack([self.values, self.values.sum(axis=1)])
+        self.series = with_total
+        self.prefix = np.vstack([np.zeros((1, with_total.shape[1])), np.cumsum(with_total, axis=0)])
+        self.first_year = int(self.years[0])
+        self.last_year = int(self.years[-1])
+        self.contiguous = bool(np.all(np.diff(self.years) == 1))
+
+    @classmethod
+    def from_json(cls, path=SECTOR_EMISSIONS_PATH):
+        with open(path) as f:
+            records = json.load(f)
+        sectors = [k for k in records[0] if k not in (YEAR_FIELD, PER_CAPITA_FIELD)]
+        years = [int(r[YEAR_FIELD]) for r in records]
+        values = [[float(r.get(s) or 0.0) for s in sectors] for r in records]
+        return cls(years, sectors, values)
+
+    def info(self):
+        return {
+            "first_year": self.first_year,
+            "last_year": self.last_year,
+            "years": len(self.years),
+            "sectors": self.sectors
+        }
+
+    def year_positions(self, years):
+        """Map years to row positions (direct offset when the years are contiguous)"""
+        years = np.asarray(years, dtype=np.int64)
+        if self.contiguous:
+            return years - self.first_year
+        positions = np.searchsorted(self.years, years)
+        positions = np.minimum(positions, len(self.years) - 1)
+        if not np.all(self.years[positions] == years):
+            raise HTTPException(status_code=400, detail="Requested year not present in sector dataset")
+        return positions
+
+    def sector_positions(self, sectors):
+        """Column positions for the requested sectors (all sectors when None)"""
+        if not sectors:
+            return list(range(len(self.sectors)))
+        unknown = [s for s in sectors if s not in self.sectors]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown sector(s): {', '.join(unknown)}. Available: {', '.join(self.sectors)}"
+            )
+        return [self.sectors.index(s) for s in sectors]
+
+    def validate_window(self, start_year, end_year):
+        if start_year > end_year:
+            raise HTTPException(status_code=400, detail="start_year must not be after end_year")
+        if start_year < self.first_year or end_year > self.last_year:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Years must be within {self.first_year}-{self.last_year}"
+            )
+
+    def query(self, start_year, end_year, sectors=None, stats=STATS):
+        """Answer one window query"""
+        return self.query_many([{"start_year": start_year, "end_year": end_year,
+                                 "sectors": sectors, "stats": stats}])[0]
+
+    def query_many(self, queries):
+        """
+        Answer a batch of window queries in request order.
+
+        Each query is a dict with `start_year`, `end_year` and optional
+        `sectors` and `stats`. Invalid queries yield `{"error": ...}` in place
+        without failing the batch.
+        """
+        results = [None] * len(queries)
+        valid = []
+        for i, q in enumerate(queries):
+            try:
+                self.validate_window(q["start_year"], q["end_year"])
+                columns = self.sector_positions(q.get("sectors"))
+                stats = q.get("stats") or STATS
+                unknown = [s for s in stats if s not in STATS]
+                if unknown:
+                    raise HTTPException(status_code=400, detail=f"Unknown stat(s): {', '.join(unknown)}")
+                valid.append((i, q, columns, stats))
+            except HTTPException as e:
+                results[i] = {"start_year": q.get("start_year"), "end_year": q.get("end_year"), "error": e.detail}
+
+        if not valid:
+            return results
+
+        starts = self.year_positions([q["start_year"] for _, q, _, _ in valid])
+        ends = self.year_positions([q["end_year"] for _, q, _, _ in valid])
+
+        # One vectorized pass over every valid query: (queries × sectors+1)
+        totals = self.prefix[ends + 1] - self.prefix[starts]
+        first = self.series[starts]
+        last = self.series[ends]
+        previous = self.series[np.maximum(ends - 1, 0)]
+        spans = (self.years[ends] - self.years[starts]).astype(np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = totals[:, :-1] / totals[:, -1:]
+            cagr = np.where(
+                (spans[:, None] > 0) & (first > 0),
+                np.power(last / first, 1.0 / np.where(spans > 0, spans, 1.0)[:, None]) - 1.0,
+                np.nan
+            )
+            has_previous = (ends > 0)[:, None]
+            yoy_delta = np.where(has_previous, last - previous, np.nan)
+            yoy_pct = np.where(has_previous & (previous != 0), 100.0 * (last - previous) / previous, np.nan)
+            mean_delta = np.where(spans[:, None] > 0, (last - first) / np.where(spans > 0, spans, 1.0)[:, None], np.nan)
+
+        for row, (i, q, columns, stats) in enumerate(valid):
+            names = [self.sectors[c] for c in columns]
+            result = {"start_year": int(q["start_year"]), "end_year": int(q["end_year"]), "sectors": names}
+            if "total" in stats:
+                result["total"] = {
+                    "by_sector": _values(names, totals[row, columns]),
+                    "all_sectors": _clean(totals[row, -1]),
+                    "selected_sectors": _clean(totals[row, columns].sum())
+                }
+            if "share" in stats:
+                result["share"] = _values(names, shares[row, columns])
+            if "cagr" in stats:
+                result["cagr"] = {
+                    "by_sector": _values(names, cagr[row, columns]),
+                    "all_sectors": _clean(cagr[row, -1])
+                }
+            if "yoy" in stats:
+                result["yoy"] = {
+                    "year": int(q["end_year"]),
+                    "delta": _values(names, yoy_delta[row, columns]),
+                    "percent": _values(names, yoy_pct[row, columns]),
+                    "all_sectors_delta": _clean(yoy_delta[row, -1]),
+                    "mean_annual_delta": _values(names, mean_delta[row, columns])
+                }
+            results[i] = result
+
+        return results
+
+def _clean(value):
+    value = float(value)
+    return None if not np.isfinite(value) else value
+
+def _values(names, values):
+    return {name: _clean(v) for name, v in zip(names, values)}
+
+@lru_cache(maxsize=1)
+def get_sector_index():
+    """Load the sector emissions file once per process"""
+    index = SectorEmissionsIndex.from_json()
+    print(f"✅ Sector emissions loaded ({index.first_year}-{index.last_year}, {len(index.sectors)} sectors)")
+    return index
@@ -0,0 +1,248 @@
+"""
+Publish the prepared dataset once into POSIX shared memory so every uvicorn
+worker maps the same column buffers instead of holding its own copy.
+
+Layout of a data segment (`<prefix>-<generation>`):
+
+    header  | 8s magic | I format | Q generation | d published_at | Q meta length |
+    meta    | JSON: rows, source, raw columns, per-column kind/dtype/offset/size |
+    columns | 64-byte aligned buffers (numeric values, int64 datetimes, int32 codes)
+
+A small control segment (`<prefix>-control`) records the latest generation
+and its segment name. Generations increase monotonically across workers and
+double as the dataset version, so every worker reports the same version for
+the same data.
+"""
+
+from multiprocessing import shared_memory
+import pandas as pd
+import numpy as np
+import tempfile
+import struct
+import json
+import time
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: shared publishing is POSIX-only
+    fcntl = None
+
+SHARED_DATASET_NAME = os.getenv('SHARED_DATASET_NAME', 'greenview-dataset')
+
+MAGIC = b'GVDATA01'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIQdQ')
+CONTROL = struct.Struct('<8sQd64s')
+ALIGNMENT = 64
+
+def shared_dataset_enabled():
+    """Shared publishing is on with SHARED_DATASET=1, or by default when running several workers"""
+    setting = os.getenv('SHARED_DATASET')
+    if setting is not None:
+        return setting.lower() in ('1', 'true', 'yes') and fcntl is not None
+    return int(os.getenv('WEB_CONCURRENCY', '1')) > 1 and fcntl is not None
+
+def _untrack(shm):
+    """Stop Python's resource tracker from unlinking a segment other workers still use"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def encode_columns(frame):
+    """Turn each column into a flat NumPy buffer plus the metadata to rebuild it"""
+    columns = []
+    for name in frame.columns:
+        series = frame[name]
+        spec = {"name": name}
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            tz = getattr(series.dt, 'tz', None)
+            if tz is not None:
+                series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+                spec["tz"] = str(tz)
+            values = series.to_numpy()
+            spec["unit"] = np.datetime_data(values.dtype)[0]
+            values = values.view(np.int64)
+            spec["kind"] = "datetime"
+        elif pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+            values = series.to_numpy()
+            if values.dtype == object:
+                values = values.astype(np.float64)
+            spec["kind"] = "numeric"
+        else:
+            codes, categories = pd.factorize(series, use_na_sentinel=True)
+            values = codes.astype(np.int32)
+            spec["kind"] = "category"
+            spec["categories"] = [str(c) for c in categories]
+        values = np.ascontiguousarray(values)
+        spec["dtype"] = values.dtype.str
+        columns.append((spec, values))
+    return columns
+
+class SharedDataset:
+    """Publisher/attacher for the shared dataset segments of one prefix"""
+
+    def __init__(self, prefix=SHARED_DATASET_NAME):
+        self.prefix = prefix
+        self.lock_path = os.path.join(tempfile.gettempdir(), f"{prefix}.lock")
+        self._attached = {}
+
+    def _locked(self):
+        lock_file = open(self.lock_path, 'a+')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _open_control(self, create=False):
+        name = f"{self.prefix}-control"
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            if not create:
+                return None
+            shm = shared_memory.SharedMemory(name=name, create=True, size=CONTROL.size)
+            CONTROL.pack_into(shm.buf, 0, MAGIC, 0, 0.0, b'')
+        _untrack(shm)
+        return shm
+
+    def latest(self):
+        """(generation, published_at, segment name) of the newest published dataset, or None"""
+        control = self._open_control()
+        if control is None:
+            return None
+        try:
+            magic, generation, published_at, segment = CONTROL.unpack_from(control.buf, 0)
+        finally:
+            control.close()
+        if magic != MAGIC or generation == 0:
+            return None
+        return generation, published_at, segment.rstrip(b'\0').decode()
+
+    def publish(self, frame, raw_columns, source):
+        """Write `frame` into a new segment and make it the latest generation"""
+        columns = encode_columns(frame)
+        lock_file = self._locked()
+        try:
+            control = self._open_control(create=True)
+            _, generation, _, previous_segment = CONTROL.unpack_from(control.buf, 0)
+            generation += 1
+            segment_name = f"{self.prefix}-{generation}"
+
+            meta = {"rows": len(frame), "source": source, "raw_columns": list(raw_columns), "columns": []}
+            offset = 0
+            for spec, values in columns:
+                spec["offset"] = offset
+                spec["nbytes"] = values.nbytes
+                meta["columns"].append(spec)
+                offset = _align(offset + values.nbytes)
+            meta_bytes = json.dumps(meta).encode()
+            data_start = _align(HEADER.size + len(meta_bytes))
+
+            shm = shared_memory.SharedMemory(name=segment_name, create=True, size=max(data_start + offset, 1))
+            _untrack(shm)
+            published_at = time.time()
+            HEADER.pack_into(shm.buf, 0, MAGIC, FORMAT_VERSION, generation, published_at, len(meta_bytes))
+            shm.buf[HEADER.size:HEADER.size + len(meta_bytes)] = meta_bytes
+            for spec, values in columns:
+                start = data_start + spec["offset"]
+                shm.buf[start:start + values.nbytes] = values.view(np.uint8).reshape(-1)
+
+            CONTROL.pack_into(control.buf, 0, MAGIC, generation, published_at, segment_name.encode())
+            control.close()
+            self._attached[generation] = shm
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+        # Workers that already mapped the old segment keep their mapping after unlink
+        previous_segment = previous_segment.rstrip(b'\0').decode()
+        if previous_segment:
+            self._unlink(previous_segment)
+        print(f"🔗 Dataset generation {generation} published to shared memory ({len(frame)} rows)")
+        return generation
+
+    def touch(self, generation):
+        """Mark the latest generation as freshly validated against the source"""
+        lock_file = self._locked()
+        try:
+            control = self._open_control()
+            if control is None:
+                return
+            magic, current, _, segment = CONTROL.unpack_from(control.buf, 0)
+            if current == generation:
+                CONTROL.pack_into(control.buf, 0, magic, current, time.time(), segment)
+            control.close()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def attach(self):
+        """
+        Map the latest generation read-only and rebuild a DataFrame over it.
+
+        Numeric and datetime columns are zero-copy views of the shared buffer;
+        text columns are rebuilt from int32 codes and their category list.
+        Returns (frame, raw_columns, source, generation, published_at) or None.
+        """
+        latest = self.latest()
+        if latest is None:
+            return None
+        generation, _, segment_name = latest
+        shm = self._attached.get(generation)
+        if shm is None:
+            try:
+                shm = shared_memory.SharedMemory(name=segment_name)
+            except FileNotFoundError:
+                return None
+            _untrack(shm)
+
+        magic, fmt, seg_generation, published_at, meta_length = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION or seg_generation != generation:
+            return None
+        meta = json.loads(bytes(shm.buf[HEADER.size:HEADER.size + meta_length]))
+        data_start = _align(HEADER.size + meta_length)
+        rows = meta["rows"]
+
+        data = {}
+        for spec in meta["columns"]:
+            values = np.ndarray((rows,), dtype=np.dtype(spec["dtype"]), buffer=shm.buf,
+                                offset=data_start + spec["offset"])
+            values.setflags(write=False)
+            if spec["kind"] == "datetime":
+                column = pd.Series(values.view(f'datetime64[{spec["unit"]}]'), copy=False)
+                if "tz" in spec:
+                    column = column.dt.tz_localize('UTC').dt.tz_convert(spec["tz"])
+            elif spec["kind"] == "category":
+                categories = np.asarray(spec["categories"] + [None], dtype=object)
+                column = pd.Series(categories[values], dtype=object)
+            else:
+                column = pd.Series(values, copy=False)
+            data[spec["name"]] = column
+
+        frame = pd.DataFrame(data, copy=False)
+        self._remember(generation, shm)
+        return frame, meta["raw_columns"], meta["source"], generation, published_at
+
+    def _remember(self, generation, shm):
+        self._attached[generation] = shm
+        for old in [g for g in self._attached if g < generation]:
+            try:
+                self._attached[old].close()
+                del self._attached[old]
+            except BufferError:
+                # An older snapshot still holds views into this mapping; retry next time
+                pass
+
+    def _unlink(self, segment_name):
+        try:
+            shm = shared_memory.SharedMemory(name=segment_name)
+            shm.unlink()
+            shm.close()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Could not unlink shared segment {segment_name}: {e}")
@@ -0,0 +1,458 @@
+"""
+Background training jobs persisted in the `ml_training_jobs` table.
+
+Jobs are (metric x model) refreshes that run outside the request on a
+bounded pool of worker threads, highest priority first. Job state and
+progress are written to `ml_training_jobs` (Postgres) or to a SQLite file
+with the same columns when no database is reachable, so jobs can be polled
+from any instance. Trained models land in the shared model registry, so the
+forecast endpoints serve them as soon as each task finishes.
+"""
+
+from datetime import datetime, timezone
+from fastapi import HTTPException
+import threading
+import tempfile
+import sqlite3
+import queue
+import json
+import time
+import uuid
+import os
+from app.services.data_store import dataset_store, get_engine
+from app.services.model_registry import UPDATE_MODES, model_registry, require_models, require_target
+from app.services.schema_catalog import schema_catalog
+from app.services.result_cache import result_cache
+from app.services.out_of_core import sample_stream, stream_columns, train_from_sample
+
+JOB_BACKEND = os.getenv('JOB_BACKEND', 'auto')  # auto, postgres, sqlite, memory
+JOB_SQLITE_PATH = os.getenv('JOB_SQLITE_PATH', os.path.join(tempfile.gettempdir(), "greenview-jobs.sqlite3"))
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', '2'))
+# Upper bound on metric x model tasks in one job
+JOB_MAX_TASKS = int(os.getenv('JOB_MAX_TASKS', '200'))
+# Finished jobs kept in memory per instance; older ones are read back from the job store
+JOB_RETAINED_FINISHED = int(os.getenv('JOB_RETAINED_FINISHED', '100'))
+
+# `streaming` trains on a sample of the table streamed in chunks (see out_of_core)
+JOB_MODES = UPDATE_MODES + ("streaming",)
+JOB_STATUSES = ("pending", "running", "completed", "failed", "cancelled")
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+class TrainingJob:
+    """One submitted job and its progress"""
+
+    def __init__(self, metrics, models, mode="auto", rounds=None, priority=0, job_id=None):
+        self.job_id = job_id or f"train-{uuid.uuid4().hex[:12]}"
+        self.metrics = list(metrics)
+        self.models = list(models)
+        self.mode = mode
+        self.rounds = rounds
+        self.priority = priority
+        self.status = "pending"
+        self.completed_tasks = 0
+        self.current_task = None
+        self.results = []
+        # Streaming jobs: what the pass over the table read and kept
+        self.sample = None
+        self.error = None
+        self.created_at = _utcnow()
+        self.started_at = None
+        self.completed_at = None
+        self.cancel_requested = threading.Event()
+
+    @property
+    def total_tasks(self):
+        return len(self.metrics) * len(self.models)
+
+    def tasks(self):
+        return [(metric, model_name) for metric in self.metrics for model_name in self.models]
+
+    def parameters(self):
+        """JSON document stored in `ml_training_jobs.parameters`"""
+        return {
+            "metrics": self.metrics,
+            "models": self.models,
+            "mode": self.mode,
+            "rounds": self.rounds,
+            "priority": self.priority,
+            "progress": {
+                "completed": self.completed_tasks,
+                "total": self.total_tasks,
+                "current": self.current_task
+            },
+            "results": self.results,
+            "sample": self.sample
+        }
+
+    def info(self):
+        duration = None
+        if self.started_at is not None:
+            duration = ((self.completed_at or _utcnow()) - self.started_at).total_seconds()
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "priority": self.priority,
+            "metrics": self.metrics,
+            "models": self.models,
+            "mode": self.mode,
+            "progress": {
+                "completed": self.completed_tasks,
+                "total": self.total_tasks,
+                "percent": round(100 * self.completed_tasks / self.total_tasks, 1) if self.total_tasks else 100.0,
+                "current": self.current_task
+            },
+            "results": self.results,
+            "sample": self.sample,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "duration_seconds": round(duration, 3) if duration is not None else None
+        }
+
+    @classmethod
+    def from_row(cls, job_id, status, parameters, error, created_at, started_at, completed_at):
+        parameters = parameters if isinstance(parameters, dict) else json.loads(parameters or "{}")
+        job = cls(parameters.get("metrics", []), parameters.get("models", []), parameters.get("mode", "auto"),
+                  parameters.get("rounds"), parameters.get("priority", 0), job_id=job_id)
+        job.status = status
+        progress = parameters.get("progress", {})
+        job.completed_tasks = progress.get("completed", 0)
+        job.current_task = progress.get("current")
+        job.results = parameters.get("results", [])
+        job.sample = parameters.get("sample")
+        job.error = error
+        job.created_at = _parse_time(created_at) or job.created_at
+        job.started_at = _parse_time(started_at)
+        job.completed_at = _parse_time(completed_at)
+        return job
+
+def _parse_time(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+class PostgresJobBackend:
+    """Job state in the `ml_training_jobs` table"""
+
+    name = "postgres"
+
+    def __init__(self, engine):
+        from sqlalchemy import text
+        self._text = text
+        self.engine = engine
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1 FROM ml_training_jobs LIMIT 0"))
+
+    def save(self, job):
+        duration = None
+        if job.started_at and job.completed_at:
+            duration = int((job.completed_at - job.started_at).total_seconds() // 60)
+        with self.engine.begin() as conn:
+            conn.execute(self._text(
+                "INSERT INTO ml_training_jobs (job_id, model_type, datasets, status, parameters, "
+                "training_duration_minutes, started_at, completed_at, error_message, created_at) "
+                "VALUES (:job_id, :model_type, '{}', :status, CAST(:parameters AS JSONB), :duration, "
+                ":started_at, :completed_at, :error, :created_at) "
+                "ON CONFLICT (job_id) DO UPDATE SET status = EXCLUDED.status, parameters = EXCLUDED.parameters, "
+                "training_duration_minutes = EXCLUDED.training_duration_minutes, started_at = EXCLUDED.started_at, "
+                "completed_at = EXCLUDED.completed_at, error_message = EXCLUDED.error_message"
+            ), {
+                "job_id": job.job_id, "model_type": ",".join(job.models), "status": job.status,
+                "parameters": json.dumps(job.parameters(), default=str), "duration": duration,
+                "started_at": job.started_at, "completed_at": job.completed_at,
+                "error": job.error, "created_at": job.created_at
+            })
+
+    def load(self, job_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(self._text(
+                "SELECT job_id, status, parameters, error_message, created_at, started_at, completed_at "
+                "FROM ml_training_jobs WHERE job_id = :job_id"
+            ), {"job_id": job_id}).first()
+        return TrainingJob.from_row(*row) if row else None
+
+    def recent(self, status=None, limit=50):
+        sql = ("SELECT job_id, status, parameters, error_message, created_at, started_at, completed_at "
+               "FROM ml_training_jobs")
+        params = {"limit": limit}
+        if status:
+            sql += " WHERE status = :status"
+            params["status"] = status
+        sql += " ORDER BY created_at DESC LIMIT :limit"
+        with self.engine.connect() as conn:
+            return [TrainingJob.from_row(*row) for row in conn.execute(self._text(sql), params)]
+
+class SQLiteJobBackend:
+    """Local stand-in for `ml_training_jobs` with the same columns"""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ml_training_jobs ("
+                "id TEXT PRIMARY KEY, job_id TEXT UNIQUE NOT NULL, model_type TEXT NOT NULL, "
+                "datasets TEXT NOT NULL DEFAULT '[]', status TEXT DEFAULT 'pending', parameters TEXT, "
+                "accuracy_score REAL, training_duration_minutes INTEGER, started_at TEXT, completed_at TEXT, "
+                "error_message TEXT, created_at TEXT NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def save(self, job):
+        duration = None
+        if job.started_at and job.completed_at:
+            duration = int((job.completed_at - job.started_at).total_seconds() // 60)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO ml_training_jobs (id, job_id, model_type, status, parameters, training_duration_minutes, "
+                "started_at, completed_at, error_message, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, parameters = excluded.parameters, "
+                "training_duration_minutes = excluded.training_duration_minutes, started_at = excluded.started_at, "
+                "completed_at = excluded.completed_at, error_message = excluded.error_message",
+                (str(uuid.uuid4()), job.job_id, ",".join(job.models), job.status,
+                 json.dumps(job.parameters(), default=str), duration,
+                 job.started_at.isoformat() if job.started_at else None,
+                 job.completed_at.isoformat() if job.completed_at else None,
+                 job.error, job.created_at.isoformat())
+            )
+
+    def load(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, status, parameters, error_message, created_at, started_at, completed_at "
+                "FROM ml_training_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return TrainingJob.from_row(*row) if row else None
+
+    def recent(self, status=None, limit=50):
+        sql = ("SELECT job_id, status, parameters, error_message, created_at, started_at, completed_at "
+               "FROM ml_training_jobs")
+        params = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [TrainingJob.from_row(*row) for row in conn.execute(sql, params)]
+
+def create_job_backend(kind=JOB_BACKEND):
+    """Pick where job state lives: Postgres `ml_training_jobs` when reachable, else SQLite"""
+    if kind == "memory":
+        return None
+    if kind in ("auto", "postgres"):
+        try:
+            backend = PostgresJobBackend(get_engine())
+            print("✅ Training jobs persisted in ml_training_jobs")
+            return backend
+        except Exception as e:
+            if kind == "postgres":
+                print(f"⚠️ ml_training_jobs unavailable, keeping jobs in memory only: {e}")
+                return None
+            print(f"⚠️ ml_training_jobs unavailable ({e.__class__.__name__}), using SQLite stand-in")
+    try:
+        return SQLiteJobBackend(JOB_SQLITE_PATH)
+    except Exception as e:
+        print(f"⚠️ SQLite job store unavailable, keeping jobs in memory only: {e}")
+        return None
+
+class TrainingJobQueue:
+    """
+    In-process job runner: a priority queue drained by `TRAINING_WORKERS`
+    threads. Cancellation is cooperative: pending jobs are dropped, running
+    jobs stop before their next (metric, model) task.
+    """
+
+    def __init__(self, workers=TRAINING_WORKERS, backend="lazy"):
+        self.workers = max(1, workers)
+        self._backend = backend
+        self._queue = queue.PriorityQueue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._sequence = 0
+
+    @property
+    def backend(self):
+        if self._backend == "lazy":
+            self._backend = create_job_backend()
+        return self._backend
+
+    def _persist(self, job):
+        backend = self.backend
+        if backend is None:
+            return
+        try:
+            backend.save(job)
+        except Exception as e:
+            print(f"⚠️ Could not persist training job {job.job_id}: {e}")
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"training-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, metrics, models, mode="auto", rounds=None, priority=0):
+        """Validate and enqueue a job; higher `priority` runs first"""
+        if not metrics or not models:
+            raise HTTPException(status_code=400, detail="A job needs at least one metric and one model")
+        if mode not in JOB_MODES:
+            raise HTTPException(status_code=400, detail=f"Unknown update mode '{mode}'. Use one of: {', '.join(JOB_MODES)}")
+        require_models(models)
+        for metric in metrics:
+            schema_catalog.require_column(metric)
+            require_target(metric)
+        if mode == "streaming":
+            stream_columns(metrics)
+        job = TrainingJob(dict.fromkeys(metrics), dict.fromkeys(models), mode, rounds, priority)
+        if job.total_tasks > JOB_MAX_TASKS:
+            raise HTTPException(status_code=400, detail=f"{job.total_tasks} tasks exceed the limit of {JOB_MAX_TASKS} per job")
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._sequence += 1
+            sequence = self._sequence
+        self._persist(job)
+        self._queue.put((-priority, sequence, job.job_id))
+        self._ensure_workers()
+        print(f"🧵 Training job {job.job_id} queued ({job.total_tasks} tasks, priority {priority})")
+        return job
+
+    def get(self, job_id):
+        """A job of this instance, or one persisted by another instance"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        backend = self.backend
+        if backend is not None:
+            try:
+                return backend.load(job_id)
+            except Exception as e:
+                print(f"⚠️ Could not load training job {job_id}: {e}")
+        return None
+
+    def list(self, status=None, limit=50):
+        if status is not None and status not in JOB_STATUSES:
+            raise HTTPException(status_code=400, detail=f"Unknown status '{status}'. Use one of: {', '.join(JOB_STATUSES)}")
+        jobs = {job.job_id: job for job in self._jobs.values() if status is None or job.status == status}
+        backend = self.backend
+        if backend is not None:
+            try:
+                for job in backend.recent(status, limit):
+                    jobs.setdefault(job.job_id, job)
+            except Exception as e:
+                print(f"⚠️ Could not list persisted training jobs: {e}")
+        return sorted(jobs.values(), key=lambda job: job.created_at, reverse=True)[:limit]
+
+    def cancel(self, job_id):
+        """Cancel a pending job, or stop a running one after its current task"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Training job '{job_id}' not found on this instance")
+        if job.status in FINAL_STATUSES:
+            return job
+        job.cancel_requested.set()
+        with self._lock:
+            if job.status == "pending":
+                job.status = "cancelled"
+                job.completed_at = _utcnow()
+        if job.status == "cancelled":
+            self._persist(job)
+            self._prune()
+        return job
+
+    def _work(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            try:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        with self._lock:
+            if job.status != "pending":
+                return
+            job.status = "running"
+            job.started_at = _utcnow()
+        self._persist(job)
+
+        changed = False
+        try:
+            snapshot = sample = None
+            if job.mode == "streaming":
+                # One bounded-memory pass over the table serves every task of the job
+                job.current_task = "streaming table"
+                self._persist(job)
+                sample = sample_stream(job.metrics, should_stop=job.cancel_requested.is_set)
+                job.sample = sample.info()
+            else:
+                snapshot = dataset_store.get()
+            for metric, model_name in job.tasks():
+                if job.cancel_requested.is_set():
+                    job.status = "cancelled"
+                    break
+                job.current_task = f"{metric}/{model_name}"
+                self._persist(job)
+                started = time.perf_counter()
+                try:
+                    if sample is not None:
+                        report = model_registry.adopt(train_from_sample(sample, metric, model_name))
+                    else:
+                        _, report = model_registry.refresh(snapshot, metric, model_name, mode=job.mode, rounds=job.rounds)
+                    changed = changed or report["action"] != "reuse"
+                    job.results.append(report)
+                except HTTPException as e:
+                    job.results.append({"metric": metric, "model": model_name, "action": "failed", "reason": e.detail})
+                except Exception as e:
+                    job.results.append({"metric": metric, "model": model_name, "action": "failed", "reason": str(e)})
+                job.results[-1]["task_seconds"] = round(time.perf_counter() - started, 3)
+                job.completed_tasks += 1
+            else:
+                failed = [r for r in job.results if r["action"] == "failed"]
+                job.status = "failed" if failed and len(failed) == len(job.results) else "completed"
+                if failed:
+                    job.error = f"{len(failed)} of {len(job.results)} tasks failed"
+        except Exception as e:
+            if job.cancel_requested.is_set():
+                job.status = "cancelled"
+            else:
+                job.status = "failed"
+                job.error = e.detail if isinstance(e, HTTPException) else str(e)
+        finally:
+            job.current_task = None
+            job.completed_at = _utcnow()
+            if changed:
+                # Drop this process's results of the replaced models; shared rows are keyed
+                # by model identity, so new requests miss them anyway
+                result_cache.invalidate("forecast")
+                result_cache.invalidate("scenarios")
+            self._persist(job)
+            self._prune()
+            print(f"🧵 Training job {job.job_id} {job.status} ({job.completed_tasks}/{job.total_tasks} tasks)")
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond JOB_RETAINED_FINISHED; they stay in the job store"""
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job.status in FINAL_STATUSES]
+            if len(finished) <= JOB_RETAINED_FINISHED:
+                return
+            finished.sort(key=lambda job: job.completed_at or job.created_at)
+            for job in finished[:len(finished) - JOB_RETAINED_FINISHED]:
+                del self._jobs[job.job_id]
+
+training_jobs = TrainingJobQueue()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: incremental (warm-start) model refresh vs. full refit.
+
+Simulates daily arrivals of new rows on a synthetic sustainability dataset.
+After each day, every model is brought up to date twice — once through the
+ModelRegistry in `auto` mode (warm start with the fallback policy) and once
+with a full refit — and both are scored on the *next* day's rows, which
+neither has seen yet.
+
+Usage:
+    cd Backend && python benchmarks/incremental_refresh.py --history-days 730 --rows-per-day 24 --days 30
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.data_store import DatasetStore
+from app.services.model_registry import FEATURE_COLS, ModelRegistry, build_training_matrices, train_single_model
+
+def synthetic_rows(start, days, rows_per_day, seed):
+    """Daily-seasonal synthetic readings with a slow downward CO2 trend"""
+    rng = np.random.default_rng(seed)
+    timestamps = np.repeat(pd.date_range(start, periods=days, freq='D'), rows_per_day)
+    n = len(timestamps)
+    day_index = (timestamps - pd.Timestamp('2020-01-01')).days.to_numpy()
+    season = np.sin(2 * np.pi * timestamps.dayofyear.to_numpy() / 365.25)
+    energy = rng.normal(6000, 1200, n) * (1 + 0.15 * season)
+    return pd.DataFrame({
+        'Timestamp': timestamps,
+        'Energy_Consumption_kWh': energy,
+        'CO2_Emissions_kg': 0.45 * energy - 0.2 * day_index + 400 * season + rng.normal(0, 250, n),
+        'Waste_Generated_kg': rng.normal(900, 200, n),
+        'Heat_Generation_MWh': rng.normal(400, 60, n),
+        'Electricity_Generation_MWh': rng.normal(500, 120, n)
+    })
+
+def mae(model, rows, metric):
+    return float(np.mean(np.abs(model.predict(rows[FEATURE_COLS]) - rows[metric].to_numpy())))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history-days', type=int, default=730)
+    parser.add_argument('--rows-per-day', type=int, default=24)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--metric', default='CO2_Emissions_kg')
+    parser.add_argument('--models', nargs='+', default=['xgboost', 'lightgbm', 'random_forest'])
+    args = parser.parse_args()
+
+    history = synthetic_rows('2020-01-01', args.history_days, args.rows_per_day, seed=1)
+    arrivals = synthetic_rows(
+        history['Timestamp'].max() + pd.Timedelta(days=1), args.days + 1, args.rows_per_day, seed=2
+    )
+    daily_batches = [group for _, group in arrivals.groupby(arrivals['Timestamp'].dt.date)]
+
+    # In-memory only: appended rows live as long as the store
+    store = DatasetStore(loader=lambda: (history.copy(), "synthetic"), ttl_seconds=10 ** 9,
+                         writer=lambda rows, source: None)
+    registry = ModelRegistry()
+    snapshot = store.get()
+    for model_name in args.models:
+        registry.refresh(snapshot, args.metric, model_name, mode="full")
+
+    results = {name: {"inc_seconds": [], "full_seconds": [], "inc_mae": [], "full_mae": [], "actions": []}
+               for name in args.models}
+
+    for day in range(args.days):
+        snapshot = store.append_rows(daily_batches[day])
+        next_day = daily_batches[day + 1].copy()
+        next_day['Elapsed_Days'] = (next_day['Timestamp'] - snapshot.frame['Timestamp'].min()).dt.days
+        next_day['Month'] = next_day['Timestamp'].dt.month
+        next_day['DayOfYear'] = next_day['Timestamp'].dt.dayofyear
+
+        X_train, y_train = build_training_matrices(snapshot.frame, args.metric).train
+        for model_name in args.models:
+            started = time.perf_counter()
+            entry, report = registry.refresh(snapshot, args.metric, model_name, mode="auto")
+            results[model_name]["inc_seconds"].append(time.perf_counter() - started)
+            results[model_name]["inc_mae"].append(mae(entry.model, next_day, args.metric))
+            results[model_name]["actions"].append(report["action"])
+
+            started = time.perf_counter()
+            _, full_model = train_single_model(model_name, X_train, y_train)
+            results[model_name]["full_seconds"].append(time.perf_counter() - started)
+            results[model_name]["full_mae"].append(mae(full_model, next_day, args.metric))
+
+    print()
+    print(f"History: {len(history):,} rows, {args.days} daily batches of {args.rows_per_day} rows, metric {args.metric}")
+    print(f"{'model':<15}{'refresh ms':>12}{'refit ms':>12}{'speedup':>9}{'refresh MAE':>14}{'refit MAE':>12}{'full refits':>13}")
+    for model_name, r in results.items():
+        inc_ms = 1000 * np.mean(r["inc_seconds"])
+        full_ms = 1000 * np.mean(r["full_seconds"])
+        print(f"{model_name:<15}{inc_ms:>12.1f}{full_ms:>12.1f}{full_ms / inc_ms:>8.1f}x"
+              f"{np.mean(r['inc_mae']):>14.2f}{np.mean(r['full_mae']):>12.2f}"
+              f"{r['actions'].count('full'):>8}/{args.days}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak memory of in-memory vs. out-of-core (streamed) training.
+
+Generates a synthetic sustainability table chunk by chunk and trains one
+model two ways, each in a fresh process so peak RSS is measured cleanly:
+
+  in-memory   all chunks concatenated into one frame (what a single
+              `pd.read_sql` returns), then the registry's training matrices
+  streaming   chunks fed one at a time through `sample_stream`, which keeps
+              only a time-stratified reservoir sample
+
+Both models are scored on the same unseen synthetic rows.
+
+Usage:
+    cd Backend && python benchmarks/out_of_core_training.py --rows 10000000 --sample-rows 500000
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+METRIC = 'CO2_Emissions_kg'
+START = pd.Timestamp('2015-01-01')
+
+def synthetic_chunk(index, chunk_rows, total_rows, days, seed=0):
+    """Rows [index * chunk_rows, ...) of a time-ordered table spanning `days` days"""
+    rng = np.random.default_rng(seed * 100_003 + index)
+    first = index * chunk_rows
+    n = min(chunk_rows, total_rows - first)
+    offsets = (np.arange(first, first + n) * (days * 86_400 / total_rows)).astype('timedelta64[s]')
+    timestamps = START.to_datetime64() + offsets
+    day_of_year = pd.DatetimeIndex(timestamps).dayofyear.to_numpy()
+    season = np.sin(2 * np.pi * day_of_year / 365.25)
+    energy = rng.normal(6000, 1200, n) * (1 + 0.15 * season)
+    trend = np.arange(first, first + n) * (days / total_rows)
+    return pd.DataFrame({
+        'Timestamp': timestamps,
+        'Energy_Consumption_kWh': energy,
+        METRIC: 0.45 * energy - 0.2 * trend + 400 * season + rng.normal(0, 250, n)
+    })
+
+def chunks(args, seed=0):
+    count = -(-args.rows // args.chunk_rows)
+    for index in range(count):
+        yield synthetic_chunk(index, args.chunk_rows, args.rows, args.days, seed)
+
+def evaluation_rows(args):
+    """Fresh rows over the same period, seen by neither model"""
+    return pd.concat([synthetic_chunk(i, 2_000, 20_000, args.days, seed=1) for i in range(10)])
+
+def rss_mib():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+def peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def add_features(df, first):
+    df['Elapsed_Days'] = (df['Timestamp'] - first).dt.days
+    df['Month'] = df['Timestamp'].dt.month
+    df['DayOfYear'] = df['Timestamp'].dt.dayofyear
+    return df
+
+def run_in_memory(args, results):
+    from app.services.model_registry import FEATURE_COLS, build_training_matrices, train_single_model
+    baseline = rss_mib()
+    started = time.perf_counter()
+    df = pd.concat(list(chunks(args)), ignore_index=True)
+    add_features(df, df['Timestamp'].min())
+    matrices = build_training_matrices(df, METRIC)
+    del df
+    _, model = train_single_model(args.model, *matrices.train, eval_set=matrices.test)
+    seconds = time.perf_counter() - started
+    evaluation = add_features(evaluation_rows(args), START)
+    mae = float(np.mean(np.abs(model.predict(evaluation[FEATURE_COLS].astype(np.float32)) - evaluation[METRIC])))
+    results.put(("in-memory", len(matrices.X_train) + len(matrices.X_test), seconds, baseline, peak_rss_mib(), mae))
+
+def run_streaming(args, results):
+    from app.services.model_registry import FEATURE_COLS
+    from app.services.out_of_core import sample_stream, train_from_sample
+    baseline = rss_mib()
+    started = time.perf_counter()
+    sample = sample_stream([METRIC], chunks=chunks(args), sample_rows=args.sample_rows)
+    entry = train_from_sample(sample, METRIC, args.model)
+    seconds = time.perf_counter() - started
+    evaluation = add_features(evaluation_rows(args), START)
+    mae = float(np.mean(np.abs(entry.model.predict(evaluation[FEATURE_COLS].astype(np.float32)) - evaluation[METRIC])))
+    results.put(("streaming", len(sample.train[0]) + len(sample.holdout[0]), seconds, baseline, peak_rss_mib(), mae))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--days', type=int, default=3650)
+    parser.add_argument('--chunk-rows', type=int, default=100_000)
+    parser.add_argument('--sample-rows', type=int, default=500_000)
+    parser.add_argument('--model', default='lightgbm', choices=['lightgbm', 'xgboost'])
+    parser.add_argument('--skip-in-memory', action='store_true', help="only run the streaming path")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    runs = [run_streaming] if args.skip_in_memory else [run_in_memory, run_streaming]
+    rows = []
+    for run in runs:
+        process = context.Process(target=run, args=(args, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{run.__name__} exited with code {process.exitcode} (out of memory?)")
+            continue
+        rows.append(results.get())
+
+    print()
+    print(f"{args.rows:,} rows over {args.days} days, {args.chunk_rows:,}-row chunks, model {args.model}")
+    print(f"{'method':<12}{'train rows':>14}{'seconds':>10}{'peak RSS MiB':>15}{'above import':>15}{'eval MAE':>11}")
+    for method, train_rows, seconds, baseline, peak, mae in rows:
+        print(f"{method:<12}{train_rows:>14,}{seconds:>10.1f}{peak:>15.0f}{peak - baseline:>15.0f}{mae:>11.1f}")
+
+if __name__ == "__main__":
+    main()
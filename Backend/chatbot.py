@@ -1,26 +1,10 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
-from xgboost import XGBRegressor
-from lightgbm import LGBMRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import MinMaxScaler
-from sqlalchemy import create_engine
+from app.services.data_store import dataset_store
+from app.services.model_registry import FEATURE_COLS, model_registry
 import re
 
-# ----------------------------
-# 🔌 Supabase DB Connection
-# ----------------------------
-username = 'postgres.bmwsulkktotsdxrhxlwp'
-password = 'GreenView1234'
-host = 'aws-1-eu-west-3.pooler.supabase.com'
-port = '5432'
-database = 'postgres'
-table_name = 'sustainability_table'
-
-db_url = f'postgresql://{username}:{password}@{host}:{port}/{database}'
-engine = create_engine(db_url)
-
 # ----------------------------
 # 🧠 App Config
 # ----------------------------
@@ -28,39 +12,21 @@ st.set_page_config(page_title="GreenView Chatbot", layout="wide")
 st.title("💬 GreenView AI Copilot 🤖")
 
 # ----------------------------
-# 📥 Load Data
+# 📥 Load Prepared Data
 # ----------------------------
-@st.cache_data
-def load_data():
-    return pd.read_sql(f"SELECT * FROM {table_name}", engine)
-
+# Shared with the API and the dashboard: prepared once per data version
 try:
-    df = load_data()
+    snapshot = dataset_store.get()
 except Exception as e:
     st.error(f"Failed to connect to Supabase: {e}")
     st.stop()
 
-if 'Timestamp' not in df.columns:
-    st.error("Missing 'Timestamp' column in your table.")
-    st.stop()
-
-df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-df['Year'] = df['Timestamp'].dt.year
-df['Month'] = df['Timestamp'].dt.month
-df['DayOfYear'] = df['Timestamp'].dt.dayofyear
-df['Elapsed_Days'] = (df['Timestamp'] - df['Timestamp'].min()).dt.days
-
-# Sustainability Score
-def calculate_sustainability_score(row):
-    weights = {
-        'CO2_Emissions_kg': -0.5,
-        'Energy_Consumption_kWh': -0.3,
-        'Waste_Generated_kg': -0.2
-    }
-    return sum(row.get(k, 0) * w for k, w in weights.items())
+df = snapshot.frame
 
-df['Sustainability_Score'] = df.apply(calculate_sustainability_score, axis=1)
-df['Sustainability_Score'] = MinMaxScaler().fit_transform(df[['Sustainability_Score']])
+@st.cache_resource(max_entries=32, show_spinner="Training model...")
+def get_fitted_model(data_version, metric, model_name, _snapshot):
+    """Fitted model per (data version, metric, model); each question only predicts"""
+    return model_registry.get_model(_snapshot, metric, model_name).model
 
 # ----------------------------
 # 💬 Chat Section
@@ -102,16 +68,8 @@ if question:
         st.error(f"'{target}' column not found in your dataset.")
         st.stop()
 
-    # Model training
-    feature_cols = ['Energy_Consumption_kWh', 'Elapsed_Days', 'Month', 'DayOfYear']
-    data = df.dropna(subset=feature_cols + [target])
-    X = data[feature_cols]
-    y = data[target]
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    model = XGBRegressor(n_estimators=100) if model_name == "xgboost" else LGBMRegressor(n_estimators=100)
-    model.fit(X_train, y_train)
+    # Cached model for this data version; trained once, then reused by every question
+    model = get_fitted_model(snapshot.version, target, model_name, snapshot)
 
     # Forecast
     future_day = df['Elapsed_Days'].max() + days_ahead
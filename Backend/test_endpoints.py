@@ -96,6 +96,76 @@ def test_ml_predictions():
     except Exception as e:
         print(f"❌ Exception: {e}")
 
+def test_ml_predictions_stream():
+    """Test the streaming ML Predictions endpoint"""
+    print("\n📡 Testing streaming ML Predictions endpoint...")
+    
+    forecast_request = {
+        "metric": "CO2_Emissions_kg",
+        "forecast_days": 30,
+        "models": ["xgboost", "lightgbm", "random_forest"]
+    }
+    
+    try:
+        with requests.post(
+            f"{BASE_URL}/api/v1/ml-predictions/forecast/stream",
+            json=forecast_request,
+            stream=True,
+            timeout=30
+        ) as response:
+            if response.status_code != 200:
+                print(f"❌ Error: {response.status_code} - {response.text}")
+                return
+            
+            start = time.time()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                elapsed = time.time() - start
+                if event["event"] == "model":
+                    print(f"✅ [{elapsed:.2f}s] {event['model']}: {len(event['predictions'])} points")
+                elif event["event"] == "error":
+                    print(f"❌ [{elapsed:.2f}s] {event['detail']}")
+                else:
+                    print(f"   [{elapsed:.2f}s] {event['event']}")
+                    
+    except Exception as e:
+        print(f"❌ Exception: {e}")
+
+def test_energy_scenarios():
+    """Test the batched what-if scenario endpoint"""
+    print("\n🔀 Testing energy scenario endpoint...")
+    
+    scenario_request = {
+        "metric": "CO2_Emissions_kg",
+        "forecast_days": 90,
+        "models": ["xgboost", "lightgbm"],
+        "scenarios": [
+            {"name": "baseline"},
+            {"change_percent": -10},
+            {"change_percent": -20},
+            {"type": "ramp", "change_percent": -30}
+        ]
+    }
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/api/v1/ml-predictions/scenarios",
+            json=scenario_request,
+            timeout=30
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            for model_name, finals in data["final_predictions"].items():
+                print(f"✅ {model_name}: " + ", ".join(f"{name} → {value}" for name, value in finals.items()))
+        else:
+            print(f"❌ Error: {response.status_code} - {response.text}")
+            
+    except Exception as e:
+        print(f"❌ Exception: {e}")
+
 def test_sustainability_score():
     """Test the sustainability score endpoint"""
     print("\n🌱 Testing Sustainability Score endpoint...")
@@ -164,6 +234,8 @@ if __name__ == "__main__":
     test_sustainability_score()
     test_data_source()
     test_ml_predictions()
+    test_ml_predictions_stream()
+    test_energy_scenarios()
     test_ai_copilot()
     
     print("\n" + "=" * 60)
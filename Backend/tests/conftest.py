@@ -0,0 +1,32 @@
+"""
+Unit tests for the services. They run offline: the database settings point
+at a closed port so every load falls back to the bundled CSV, and caches and
+job state stay in process.
+"""
+
+import os
+
+os.environ.setdefault('DB_HOST', '127.0.0.1')
+os.environ.setdefault('DB_PORT', '1')
+os.environ.setdefault('ASYNC_DB', 'off')
+os.environ.setdefault('CACHE_BACKEND', 'memory')
+os.environ.setdefault('JOB_BACKEND', 'memory')
+os.environ.setdefault('CHANGE_NOTIFICATIONS', 'off')
+
+import numpy as np
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def daily_frame():
+    """90 days of prepared rows with the model features"""
+    stamps = pd.date_range('2024-01-01', periods=90, freq='D')
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Timestamp': stamps,
+        'Energy_Consumption_kWh': rng.normal(1000, 50, len(stamps)),
+        'CO2_Emissions_kg': rng.normal(150, 10, len(stamps)),
+        'Elapsed_Days': np.arange(len(stamps)),
+        'Month': stamps.month,
+        'DayOfYear': stamps.dayofyear
+    })
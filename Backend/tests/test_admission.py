@@ -0,0 +1,121 @@
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import asyncio
+import json
+import pytest
+from app.services import admission
+from app.services.admission import ApiClient, FairScheduler, RateLimiter, TokenBucket
+from app.services.forecast_cache import MAX_FORECAST_DAYS
+from app.services.training_jobs import JOB_MAX_TASKS
+
+ANONYMOUS = ApiClient("anonymous:test", "anonymous client test", False)
+KEYED = ApiClient("key:test", "test", True)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    return now
+
+def test_bucket_spends_and_refills(clock):
+    bucket = TokenBucket(capacity=100, rate=10)
+    assert bucket.take(60) == 0
+    assert bucket.take(60) == pytest.approx(2.0)
+    clock[0] += 2
+    assert bucket.take(60) == 0
+    assert not bucket.full()
+    clock[0] += 100
+    assert bucket.full()
+
+def test_oversized_cost_drains_a_full_bucket(clock):
+    bucket = TokenBucket(capacity=100, rate=10)
+    assert bucket.take(5000) == 0
+    assert bucket.take(5000) == pytest.approx(10.0)
+
+def test_limiter_rejects_with_retry_after(clock):
+    limiter = RateLimiter(capacity=1000, rate=100, anonymous_share=0.25)
+    limiter.check(ANONYMOUS, 200)
+    with pytest.raises(HTTPException) as error:
+        limiter.check(ANONYMOUS, 200)
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "6"
+    # Keyed clients have their own, larger bucket
+    limiter.check(KEYED, 1000)
+
+def test_negative_cost_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        RateLimiter().check(KEYED, -1)
+    assert error.value.status_code == 400
+
+@pytest.mark.parametrize("client", [ANONYMOUS, KEYED])
+def test_maximal_valid_requests_are_admitted(clock, client):
+    limiter = RateLimiter()
+    limiter.check(client, 3 * MAX_FORECAST_DAYS)
+    clock[0] += 3600
+    limiter.check(client, JOB_MAX_TASKS * admission.TRAINING_FIT_COST)
+    # ...and throttled, not refused, when repeated at once
+    with pytest.raises(HTTPException) as error:
+        limiter.check(client, 3 * MAX_FORECAST_DAYS)
+    assert error.value.status_code == 429
+
+def test_maximal_forecast_is_admitted_by_the_endpoint(monkeypatch):
+    from app.main import app
+    from app.api.v1 import ml_predictions
+    monkeypatch.setattr(ml_predictions, "rate_limiter", RateLimiter())
+    with TestClient(app) as client:
+        response = client.post("/api/v1/ml-predictions/forecast", json={
+            "metric": "CO2_Emissions_kg",
+            "models": ["xgboost", "lightgbm", "random_forest"],
+            "forecast_days": MAX_FORECAST_DAYS,
+            "max_points": 100
+        })
+    assert response.status_code == 200, response.text
+    assert len(response.json()["predictions"]) == 3
+
+def test_scheduler_hands_slots_round_robin():
+    async def scenario():
+        scheduler = FairScheduler(slots=1, max_waiting=8, timeout_seconds=5)
+        order = []
+        first = ApiClient("a", "a", True)
+        second = ApiClient("b", "b", True)
+
+        async def run(client, label):
+            async with scheduler.slot(client):
+                order.append(label)
+                await asyncio.sleep(0.01)
+
+        holder = asyncio.ensure_future(run(first, "a0"))
+        await asyncio.sleep(0)
+        waiting = [asyncio.ensure_future(run(first, f"a{i}")) for i in (1, 2)]
+        await asyncio.sleep(0)
+        waiting.append(asyncio.ensure_future(run(second, "b1")))
+        await asyncio.gather(holder, *waiting)
+        return order
+
+    # The backlog of "a" does not hold back b's first request
+    assert asyncio.run(scenario()) == ["a0", "a1", "b1", "a2"]
+
+def test_scheduler_timeout_is_429_with_retry_after():
+    async def scenario():
+        scheduler = FairScheduler(slots=0, timeout_seconds=0.01)
+        async with scheduler.slot(KEYED):
+            pass
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 429
+    assert "Retry-After" in error.value.headers
+
+def test_stream_reports_retry_after_when_no_slot_frees(monkeypatch):
+    from app.api.v1 import ml_predictions
+    monkeypatch.setattr(ml_predictions, "ml_scheduler", FairScheduler(slots=0, timeout_seconds=0.01))
+    request = ml_predictions.PredictionRequest(metric="CO2_Emissions_kg", forecast_days=30)
+
+    async def collect(stream_format):
+        return [chunk async for chunk in ml_predictions.forecast_event_stream(request, stream_format, KEYED)]
+
+    events = [json.loads(line) for line in asyncio.run(collect("ndjson"))]
+    assert events[-1]["event"] == "error"
+    assert events[-1]["status_code"] == 429
+    assert events[-1]["retry_after"] >= 1
+    assert asyncio.run(collect("sse"))[-1].startswith("retry: ")
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+from app.services.analytics_cube import AnalyticsCube
+from app.services.data_store import DatasetStore, load_fallback_data
+
+@pytest.fixture(scope="module")
+def cube():
+    cube = AnalyticsCube(DatasetStore(loader=load_fallback_data, ttl_seconds=3600))
+    return cube, cube.ensure_current().frame
+
+def expected(frame, start, end, freq):
+    rows = frame[(frame['Timestamp'] >= start) & (frame['Timestamp'] <= end)]
+    return rows.groupby(rows['Timestamp'].dt.to_period(freq))['CO2_Emissions_kg'].agg(['sum', 'count'])
+
+@pytest.mark.parametrize("granularity, freq", [("month", "M"), ("week", "W-SUN")])
+def test_mid_period_bounds_count_only_rows_in_range(cube, granularity, freq):
+    cube, frame = cube
+    start, end = "2023-01-15", "2023-03-10"
+    rollups = cube.query("all", granularity, start, end, None, ["CO2_Emissions_kg"])
+    truth = expected(frame, start, end, freq)
+
+    assert [item["rows"] for item in rollups] == truth['count'].tolist()
+    assert [item["CO2_Emissions_kg"]["sum"] for item in rollups] == pytest.approx(truth['sum'].tolist())
+    assert rollups[0]["partial"] and rollups[-1]["partial"]
+    assert not any(item["partial"] for item in rollups[1:-1])
+
+def test_aligned_bounds_use_whole_periods(cube):
+    cube, frame = cube
+    rollups = cube.query("all", "month", "2023-02-01", "2023-03-31", None, ["CO2_Emissions_kg"])
+    assert [item["period"] for item in rollups] == ["2023-02-01", "2023-03-01"]
+    assert not any(item["partial"] for item in rollups)
+    assert [item["rows"] for item in rollups] == expected(frame, "2023-02-01", "2023-03-31", "M")['count'].tolist()
+
+def test_members_filter_applies_to_partial_periods(cube):
+    cube, frame = cube
+    member = str(frame['Facility'].iloc[0])
+    rollups = cube.query("facility", "month", "2023-01-15", "2023-02-10", [member], ["CO2_Emissions_kg"])
+    rows = frame[(frame['Facility'] == member) & (frame['Timestamp'] >= "2023-01-15") & (frame['Timestamp'] <= "2023-02-10")]
+    assert {item["member"] for item in rollups} == {member}
+    assert sum(item["rows"] for item in rollups) == len(rows)
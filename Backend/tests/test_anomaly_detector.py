@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.anomaly_detector import AnomalyDetector, P2Quantile, RunningStats
+
+@pytest.mark.parametrize("p", [0.25, 0.5, 0.75, 0.9])
+def test_p2_tracks_the_exact_quantile(p):
+    values = np.random.default_rng(1).lognormal(3, 0.5, 20000)
+    sketch = P2Quantile(p)
+    for x in values:
+        sketch.add(x)
+    exact = np.quantile(values, p)
+    assert sketch.value() == pytest.approx(exact, rel=0.02)
+
+def test_p2_with_fewer_than_five_values():
+    sketch = P2Quantile(0.5)
+    assert sketch.value() is None
+    for x in (3.0, 1.0, 2.0):
+        sketch.add(x)
+    assert sketch.value() == 2.0
+
+def test_welford_matches_numpy_on_large_offsets():
+    # Values far from zero: a naive sum of squares loses the variance
+    values = 1e9 + np.random.default_rng(2).normal(0, 3, 5000)
+    stats = RunningStats()
+    for x in values:
+        stats.add(x)
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert stats.std == pytest.approx(values.std(ddof=1), rel=1e-6)
+
+def test_scores_are_taken_before_the_value_is_added():
+    stats = RunningStats()
+    for x in np.random.default_rng(3).normal(100, 5, 500):
+        stats.add(x)
+    z, ewma_z, robust_z = stats.scores(150.0)
+    assert z > 5 and ewma_z > 5 and robust_z > 5
+    assert stats.count == 500
+
+def test_detector_reports_spikes_per_facility():
+    rng = np.random.default_rng(4)
+    stamps = pd.date_range('2024-01-01', periods=200, freq='D')
+    frame = pd.DataFrame({
+        'Timestamp': np.tile(stamps, 2),
+        'Facility': np.repeat(['Plant A', 'Plant B'], 200),
+        # Plant B runs at ten times Plant A's level: per-facility baselines keep it normal
+        'CO2_Emissions_kg': np.r_[rng.normal(100, 5, 200), rng.normal(1000, 50, 200)]
+    })
+    frame.loc[150, 'CO2_Emissions_kg'] = 200.0
+    detector = AnomalyDetector(store=None, metrics=['CO2_Emissions_kg'])
+    found = detector.process(frame, version=1)
+    assert [(a["facility"], a["direction"]) for a in found] == [("Plant A", "spike")]
+    assert found[0]["timestamp"] == stamps[150].isoformat()
+    assert set(detector.baselines()) == {"Plant A/CO2_Emissions_kg", "Plant B/CO2_Emissions_kg"}
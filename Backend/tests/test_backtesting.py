@@ -0,0 +1,23 @@
+from pydantic import ValidationError
+import numpy as np
+import pytest
+from app.api.v1.ml_predictions import BacktestRequest
+from app.services.backtesting import BACKTEST_MAX_FOLDS, rolling_origins
+
+def test_folds_tile_the_end_of_the_history():
+    days = np.arange(200)
+    windows = rolling_origins(days, folds=3, horizon_days=30, min_train_rows=60)
+    assert windows == [(110, 140), (140, 170), (170, 200)]
+
+def test_folds_without_enough_history_are_skipped():
+    windows = rolling_origins(np.arange(100), folds=5, horizon_days=20, min_train_rows=50)
+    assert [train_end for train_end, _ in windows] == [60, 80]
+
+@pytest.mark.parametrize("field, value", [
+    ("folds", -1), ("folds", 0), ("folds", BACKTEST_MAX_FOLDS + 1),
+    ("horizon_days", 0), ("horizon_days", 10**6), ("step_days", 0)
+])
+def test_request_bounds_name_the_field(field, value):
+    with pytest.raises(ValidationError) as error:
+        BacktestRequest(**{field: value})
+    assert error.value.errors()[0]["loc"] == (field,)
@@ -0,0 +1,81 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from app.services import data_export, data_store
+from app.services.data_export import decode_cursor, encode_cursor, export_page, iter_csv, iter_ndjson
+from app.services.data_store import DatasetSnapshot
+
+def snapshot_of(frame, version=1):
+    return DatasetSnapshot(frame, version, "test", list(frame.columns))
+
+@pytest.fixture
+def shuffled():
+    """Rows out of time order, three per day, two facilities"""
+    rng = np.random.default_rng(0)
+    stamps = np.repeat(pd.date_range('2024-01-01', periods=40, freq='D'), 3)
+    frame = pd.DataFrame({
+        'Timestamp': stamps,
+        'Facility': rng.choice(['Plant A', 'Plant B'], len(stamps)),
+        'CO2_Emissions_kg': np.arange(len(stamps), dtype=float)
+    })
+    return frame.sample(frac=1, random_state=1).reset_index(drop=True)
+
+def all_pages(snapshot, limit, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page = export_page(snapshot, cursor=cursor, limit=limit, **kwargs)
+        pages.append(page.positions)
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(1704067200000000000, 42)) == (1704067200000000000, 42)
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not a cursor")
+    assert error.value.status_code == 400
+
+def test_pages_cover_every_row_once_in_key_order(shuffled, monkeypatch):
+    # Small scan windows so pages span several of them
+    monkeypatch.setattr(data_store, 'KEYSET_SCAN_ROWS', 7)
+    snapshot = snapshot_of(shuffled)
+    pages = all_pages(snapshot, limit=25)
+    positions = np.concatenate(pages)
+    assert [len(p) for p in pages] == [25] * 4 + [20]
+    assert sorted(positions) == list(range(len(shuffled)))
+    keys = list(zip(shuffled['Timestamp'].to_numpy()[positions], positions))
+    assert keys == sorted(keys)
+
+def test_filters_and_time_window_apply_to_every_page(shuffled):
+    snapshot = snapshot_of(shuffled)
+    positions = np.concatenate(all_pages(snapshot, limit=10, start=pd.Timestamp('2024-01-10').date(),
+                                         end=pd.Timestamp('2024-01-20').date(),
+                                         filters={"Facility": ["Plant A"]}))
+    rows = shuffled.iloc[positions]
+    expected = shuffled[(shuffled['Facility'] == "Plant A")
+                        & shuffled['Timestamp'].between('2024-01-10', '2024-01-20')]
+    assert sorted(positions) == sorted(expected.index)
+    assert rows['Timestamp'].is_monotonic_increasing
+
+def test_appended_rows_do_not_shift_later_pages(shuffled):
+    first = export_page(snapshot_of(shuffled), limit=50)
+    late = pd.DataFrame({
+        'Timestamp': pd.date_range('2024-03-01', periods=5, freq='D'),
+        'Facility': 'Plant A',
+        'CO2_Emissions_kg': -1.0
+    })
+    grown = snapshot_of(pd.concat([shuffled, late], ignore_index=True), version=2)
+    rest = export_page(grown, cursor=first.next_cursor, limit=1000).positions
+    assert not set(first.positions) & set(rest)
+    assert set(rest[-5:]) == set(range(len(shuffled), len(grown.frame)))
+    assert len(first.positions) + len(rest) == len(grown.frame)
+
+def test_csv_and_ndjson_batches_join_into_one_document(shuffled, monkeypatch):
+    monkeypatch.setattr(data_export, 'EXPORT_BATCH_ROWS', 16)
+    page = export_page(snapshot_of(shuffled), columns=['Timestamp', 'CO2_Emissions_kg'], limit=100)
+    csv = pd.read_csv(io.BytesIO(b"".join(iter_csv(page))))
+    ndjson = pd.read_json(io.BytesIO(b"".join(iter_ndjson(page))), lines=True)
+    assert len(csv) == len(ndjson) == 100
+    assert csv['CO2_Emissions_kg'].tolist() == shuffled['CO2_Emissions_kg'].take(page.positions).tolist()
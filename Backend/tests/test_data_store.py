@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from app.services.data_store import DatasetStore, load_fallback_data
+
+def new_rows(snapshot, count=3):
+    """The last `count` raw rows again, one day apart after the latest"""
+    rows = snapshot.frame[snapshot.raw_columns].tail(count).copy()
+    rows['Timestamp'] = snapshot.frame['Timestamp'].max() + pd.to_timedelta(range(1, count + 1), unit='D')
+    return rows.to_dict('records')
+
+def test_append_to_csv_fallback_is_refused():
+    store = DatasetStore(loader=load_fallback_data, ttl_seconds=3600)
+    before = store.get()
+    assert before.source == "csv"
+    with pytest.raises(HTTPException) as error:
+        store.append_rows(new_rows(before))
+    assert error.value.status_code == 409
+    after = store.get()
+    assert after.version == before.version and after.row_count == before.row_count
+
+def test_append_is_published_only_after_the_write():
+    written = []
+    store = DatasetStore(loader=load_fallback_data, ttl_seconds=3600,
+                         writer=lambda rows, source: written.append(len(rows)))
+    before = store.get()
+    after = store.append_rows(new_rows(before))
+    assert written == [3]
+    assert after.row_count == before.row_count + 3 and after.version > before.version
+
+def test_failed_write_publishes_nothing():
+    def failing(rows, source):
+        raise HTTPException(status_code=503, detail="down")
+    store = DatasetStore(loader=load_fallback_data, ttl_seconds=3600, writer=failing)
+    before = store.get()
+    with pytest.raises(HTTPException) as error:
+        store.append_rows(new_rows(before))
+    assert error.value.status_code == 503
+    assert store.get().version == before.version
@@ -0,0 +1,53 @@
+from fastapi import HTTPException
+import numpy as np
+import pytest
+from app.services.downsampling import downsample_indices, downsample_points, lttb_indices, minmax_indices
+
+def series(n=1000, seed=1):
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.normal(size=n))
+    y[n // 3] = y.max() + 50  # a spike that must stay visible
+    return np.arange(n, dtype=np.float64), y
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+@pytest.mark.parametrize("max_points", [3, 4, 5, 7, 10, 99, 800])
+def test_never_more_than_max_points(method, max_points):
+    x, y = series()
+    indices = downsample_indices(x, y, max_points, method)
+    assert len(indices) <= max_points
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert np.all(np.diff(indices) > 0)
+
+@pytest.mark.parametrize("max_points", [3, 4, 20])
+def test_minmax_keeps_the_spike(max_points):
+    _, y = series()
+    assert len(y) // 3 in minmax_indices(y, max_points)
+
+def test_minmax_keeps_every_bucket_extreme():
+    _, y = series()
+    kept = minmax_indices(y, 100)
+    assert y.argmin() in kept and y.argmax() in kept
+
+def test_lttb_keeps_the_spike():
+    x, y = series()
+    indices = lttb_indices(x, y, 50)
+    assert len(indices) == 50
+    assert len(y) // 3 in indices
+
+def test_short_series_is_returned_unchanged():
+    x, y = series(10)
+    np.testing.assert_array_equal(downsample_indices(x, y, 20), np.arange(10))
+    np.testing.assert_array_equal(downsample_indices(x, y, None), np.arange(10))
+
+def test_invalid_parameters():
+    x, y = series()
+    with pytest.raises(HTTPException):
+        downsample_indices(x, y, 2)
+    with pytest.raises(HTTPException):
+        downsample_indices(x, y, 10, "average")
+
+def test_points_keep_their_dicts():
+    points = [{"days_ahead": i + 1, "prediction": float(v)} for i, v in enumerate(series(500)[1])]
+    kept = downsample_points(points, 40, "prediction", "days_ahead", "minmax")
+    assert len(kept) <= 40
+    assert all(point in points for point in kept)
@@ -0,0 +1,26 @@
+import copy
+from app.services.data_store import dataset_store
+from app.services.model_registry import ModelRegistry
+
+METRIC = "CO2_Emissions_kg"
+
+def test_identity_is_the_same_in_independent_registries():
+    snapshot = dataset_store.get()
+    first, second = ModelRegistry(), ModelRegistry()
+    assert first.identity(None, METRIC, ["lightgbm"]) == {"lightgbm": None}
+    first.get_model(snapshot, METRIC, "lightgbm", mode="full")
+    second.get_model(snapshot, METRIC, "lightgbm", mode="full")
+    identity = first.identity(None, METRIC, ["lightgbm"])
+    assert identity["lightgbm"] is not None
+    # Another process fitting the same rows names its model the same way
+    assert second.identity(None, METRIC, ["lightgbm"]) == identity
+
+def test_identity_changes_when_the_model_is_replaced():
+    snapshot = dataset_store.get()
+    registry = ModelRegistry()
+    entry = registry.get_model(snapshot, METRIC, "xgboost", mode="full")
+    before = registry.identity(None, METRIC, ["xgboost"])
+    updated = copy.copy(entry)
+    updated.incremental_updates += 1
+    registry._store(("default", METRIC, "xgboost"), updated)
+    assert registry.identity(None, METRIC, ["xgboost"]) != before
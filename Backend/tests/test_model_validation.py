@@ -0,0 +1,46 @@
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import pytest
+from app.main import app
+from app.services.data_store import dataset_store
+from app.services.model_registry import model_registry
+
+FEATURE_TARGET = "Energy_Consumption_kWh"
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/v1/ml-predictions/forecast", {"metric": "CO2_Emissions_kg", "models": ["foo"]}),
+    ("/api/v1/ml-predictions/forecast/stream", {"metric": "CO2_Emissions_kg", "models": ["foo"]}),
+    ("/api/v1/ml-predictions/scenarios", {"metric": "CO2_Emissions_kg", "models": ["foo"], "scenarios": [{}]}),
+    ("/api/v1/ml-predictions/models/refresh", {"metric": "CO2_Emissions_kg", "models": ["foo"]}),
+    ("/api/v1/ml-predictions/jobs", {"models": ["foo"]}),
+])
+def test_unknown_models_are_rejected_and_never_registered(client, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert "Unknown model" in response.json()["detail"]
+    assert all(entry.model_name != "foo" for entry in model_registry.entries())
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/v1/ml-predictions/forecast", {"metric": FEATURE_TARGET}),
+    ("/api/v1/ml-predictions/forecast/stream", {"metric": FEATURE_TARGET}),
+    ("/api/v1/ml-predictions/scenarios", {"metric": FEATURE_TARGET, "scenarios": [{}]}),
+    ("/api/v1/ml-predictions/models/refresh", {"metric": FEATURE_TARGET, "models": ["xgboost"]}),
+    ("/api/v1/ml-predictions/jobs", {"metrics": [FEATURE_TARGET]}),
+    ("/api/v1/ml-predictions/backtest", {"metrics": [FEATURE_TARGET]}),
+])
+def test_feature_columns_are_rejected_as_targets(client, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert "model feature" in response.json()["detail"]
+
+def test_registry_refuses_direct_writes():
+    snapshot = dataset_store.get()
+    with pytest.raises(HTTPException):
+        model_registry.refresh(snapshot, "CO2_Emissions_kg", "foo")
+    with pytest.raises(HTTPException):
+        model_registry.refresh(snapshot, FEATURE_TARGET, "xgboost")
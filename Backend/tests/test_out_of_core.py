@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from app.services.out_of_core import DAY_NS, StratifiedReservoir, sample_stream
+
+def day_rows(days, rows_per_day, start_day=0):
+    stamps = np.repeat(np.arange(start_day, start_day + days, dtype=np.int64) * DAY_NS, rows_per_day)
+    return stamps, np.arange(len(stamps), dtype=np.float32).reshape(-1, 1)
+
+def test_capacity_is_split_evenly_across_strata():
+    reservoir = StratifiedReservoir(100, 1, 10 * DAY_NS, np.random.default_rng(0))
+    # 50 days = 5 strata, the first one much denser than the rest
+    reservoir.add(*day_rows(10, 500))
+    reservoir.add(*day_rows(40, 20, start_day=10))
+    stamps, values = reservoir.sample()
+    assert len(stamps) == 100
+    assert np.bincount(stamps // (10 * DAY_NS)).tolist() == [20] * 5
+    assert np.all(np.diff(stamps) >= 0)
+
+def test_each_row_is_equally_likely_to_be_kept():
+    hits = np.zeros(1000)
+    for seed in range(300):
+        reservoir = StratifiedReservoir(50, 1, 10 * DAY_NS, np.random.default_rng(seed))
+        stamps, values = day_rows(1, 1000)
+        # Several batches, as chunks of a stream
+        for batch in np.array_split(np.arange(1000), 7):
+            reservoir.add(stamps[batch], values[batch])
+        kept = reservoir.sample()[1][:, 0].astype(np.int64)
+        assert len(kept) == 50
+        hits[kept] += 1
+    # Each row expected in 5% of samples; compare early, middle and late rows of the stream
+    thirds = [part.mean() / 300 for part in np.array_split(hits, 3)]
+    assert thirds == pytest.approx([0.05] * 3, abs=0.006)
+
+def test_sample_stream_splits_train_and_holdout():
+    stamps = pd.date_range('2024-01-01', periods=2000, freq='h')
+    frame = pd.DataFrame({
+        'Timestamp': stamps,
+        'Energy_Consumption_kWh': np.linspace(900, 1100, len(stamps)),
+        'CO2_Emissions_kg': np.linspace(100, 200, len(stamps))
+    })
+    chunks = [frame.iloc[i:i + 300] for i in range(0, len(frame), 300)]
+    sample = sample_stream(['CO2_Emissions_kg'], chunks=chunks, sample_rows=400, holdout_fraction=0.25)
+    info = sample.info()
+    assert info["rows_streamed"] == 2000 and info["chunks"] == 7
+    assert info["train_rows"] <= 400 and info["holdout_rows"] <= 100
+    X_train, y_train, X_test, y_test = sample.matrices('CO2_Emissions_kg')
+    assert X_train['Elapsed_Days'].min() >= 0 and X_train['Month'].isin([1, 2, 3]).all()
+    assert len(X_train) == len(y_train) == info["train_rows"]
+
+def test_derived_metrics_cannot_be_streamed():
+    with pytest.raises(HTTPException) as error:
+        sample_stream(['Sustainability_Score'], chunks=[])
+    assert error.value.status_code == 400
@@ -0,0 +1,82 @@
+import threading
+import time
+import pytest
+from app.services import result_cache as result_cache_module
+from app.services.result_cache import ResultCache, SQLiteCacheBackend, should_refresh_early
+
+def test_xfetch_probability_grows_towards_expiry():
+    compute_seconds, now = 2.0, time.time()
+
+    def refresh_rate(seconds_left):
+        return sum(should_refresh_early(now + seconds_left, compute_seconds) for _ in range(2000)) / 2000
+
+    far, near, past = refresh_rate(60), refresh_rate(2), refresh_rate(-1)
+    assert far < 0.01 < near < 0.9 and past == 1.0
+    assert not should_refresh_early(now + 1, compute_seconds, beta=0)
+    assert not should_refresh_early(now + 1, 0.0)
+
+def test_concurrent_misses_compute_once():
+    cache = ResultCache(backend=None)
+    calls, results = [], []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return {"value": 42}
+
+    def request():
+        results.append(cache.get_or_compute("ns", {"q": 1}, "data", compute))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"value": 42}] * 8
+    stats = cache.stats()["namespaces"]["ns"]
+    assert stats["misses"] == 1 and stats["coalesced_waits"] == 7
+
+def test_failed_compute_releases_the_flight():
+    cache = ResultCache(backend=None)
+
+    def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("ns", {}, "data", failing)
+    assert cache.get_or_compute("ns", {}, "data", lambda: "ok") == "ok"
+
+def test_early_refresh_serves_cached_value_while_another_caller_recomputes(monkeypatch):
+    cache = ResultCache(backend=None)
+    cache.get_or_compute("ns", {}, "data", lambda: "old")
+    monkeypatch.setattr(result_cache_module, 'should_refresh_early', lambda *args: True)
+    release, refreshing = threading.Event(), threading.Event()
+
+    def slow_refresh():
+        refreshing.set()
+        release.wait()
+        return "new"
+
+    refresher = threading.Thread(target=cache.get_or_compute, args=("ns", {}, "data", slow_refresh))
+    refresher.start()
+    refreshing.wait()
+    # The refresh is in flight: others keep the cached value instead of waiting
+    assert cache.get_or_compute("ns", {}, "data", lambda: "unexpected") == "old"
+    release.set()
+    refresher.join()
+    monkeypatch.setattr(result_cache_module, 'should_refresh_early', lambda *args: False)
+    assert cache.get_or_compute("ns", {}, "data", lambda: "unexpected") == "new"
+
+def test_instances_share_results_through_the_backend(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = ResultCache(backend=SQLiteCacheBackend(path)), ResultCache(backend=SQLiteCacheBackend(path))
+    assert first.get_or_compute("ns", {"q": 1}, "v1", lambda: [1, 2, 3]) == [1, 2, 3]
+    assert second.get_or_compute("ns", {"q": 1}, "v1", lambda: pytest.fail("recomputed")) == [1, 2, 3]
+    assert second.stats()["shared_hits"] == 1
+    # A different data fingerprint is a different key
+    assert second.get_or_compute("ns", {"q": 1}, "v2", lambda: [4]) == [4]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from app.services.rolling_stats import RingWindows
+
+def brute_force(members, days, values, window):
+    """Count, mean and median per member over the last `window` days, from every row"""
+    cutoff = days.max() - window + 1
+    result = {}
+    for member in dict.fromkeys(members):
+        rows = values[(members == member) & (days >= cutoff), 0]
+        result[member] = (len(rows), rows.mean() if len(rows) else np.nan,
+                          np.percentile(rows, 50) if len(rows) else np.nan)
+    return result
+
+def stream(seed, batches=12, rows_per_batch=40):
+    rng = np.random.default_rng(seed)
+    members, days, values = [], [], []
+    for batch in range(batches):
+        # Mostly in order, with some rows arriving a few days late
+        batch_days = batch * 10 + rng.integers(-5, 10, rows_per_batch)
+        members.append(rng.choice(['A', 'B', 'C'], rows_per_batch, p=[0.6, 0.3, 0.1]))
+        days.append(batch_days.astype(np.int32))
+        values.append(rng.normal(100, 20, (rows_per_batch, 1)).astype(np.float32))
+    return members, days, values
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_windows_match_a_full_recomputation(seed):
+    ring = RingWindows(['x'], span=30, capacity=4)
+    seen_members, seen_days, seen_values = [], [], []
+    for members, days, values in zip(*stream(seed)):
+        ring.append(list(members), days, values)
+        seen_members.append(members)
+        seen_days.append(days)
+        seen_values.append(values)
+        all_members, all_days, all_values = (np.concatenate(a) for a in (seen_members, seen_days, seen_values))
+        for window in (7, 30):
+            counts, means, quantiles = ring.window(window, (50,))
+            expected = brute_force(all_members, all_days, all_values, window)
+            for member, (count, mean, median) in expected.items():
+                g = ring.members.index(member)
+                assert counts[g, 0] == count
+                np.testing.assert_allclose([means[g, 0], quantiles[50][g, 0]], [mean, median], rtol=1e-5)
+
+def test_rings_grow_only_as_needed():
+    ring = RingWindows(['x'], span=30, capacity=4)
+    for day in range(300):
+        ring.append(['A'] * 3, np.full(3, day, dtype=np.int32), np.ones((3, 1), dtype=np.float32))
+    # 30 days x 3 rows must fit; older rows are overwritten rather than kept
+    assert ring.capacity == 128
+    counts, means, _ = ring.window(30)
+    assert counts[0, 0] == 90 and means[0, 0] == 1.0
@@ -0,0 +1,46 @@
+from fastapi import HTTPException
+from sklearn.linear_model import LinearRegression
+import numpy as np
+import pytest
+from app.services import scenarios
+from app.services.forecast_cache import build_future_frame
+from app.services.model_registry import FEATURE_COLS
+
+def fitted_model(frame):
+    return LinearRegression().fit(frame[FEATURE_COLS], frame['CO2_Emissions_kg'])
+
+def test_constant_and_ramp_trajectories():
+    trajectories = scenarios.energy_trajectories(
+        [{"type": "constant", "change_percent": -10}, {"type": "constant", "level": 500},
+         {"type": "ramp", "change_percent": 20}],
+        base_energy=1000.0, forecast_days=4
+    )
+    np.testing.assert_allclose(trajectories[0], [900] * 4)
+    np.testing.assert_allclose(trajectories[1], [500] * 4)
+    np.testing.assert_allclose(trajectories[2], [1050, 1100, 1150, 1200])
+
+def test_unknown_scenario_type_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        scenarios.energy_trajectories([{"type": "spline"}], 1000.0, 3)
+    assert error.value.status_code == 400
+
+def test_stacked_predictions_match_one_scenario_at_a_time(daily_frame):
+    model = fitted_model(daily_frame)
+    grid = [{"type": "constant", "change_percent": p} for p in (-30, 0, 30)]
+    dates, trajectories, results = scenarios.simulate_scenarios(
+        daily_frame, {"linear": model}, 'CO2_Emissions_kg', grid, 10
+    )
+    assert len(dates) == 10
+    assert results["linear"].shape == (3, 10)
+    for i, energy in enumerate(trajectories):
+        future, _ = build_future_frame(daily_frame, 10)
+        future['Energy_Consumption_kWh'] = energy
+        np.testing.assert_allclose(results["linear"][i], model.predict(future[FEATURE_COLS]), rtol=1e-5)
+    # Different energy levels must give different answers
+    assert not np.allclose(results["linear"][0], results["linear"][2])
+
+def test_cell_limit(daily_frame, monkeypatch):
+    monkeypatch.setattr(scenarios, "SCENARIO_MAX_CELLS", 10)
+    with pytest.raises(HTTPException) as error:
+        scenarios.simulate_scenarios(daily_frame, {}, 'CO2_Emissions_kg', [{"type": "constant"}] * 2, 6)
+    assert error.value.status_code == 400
@@ -0,0 +1,66 @@
+import builtins
+import pytest
+from fastapi import HTTPException
+from app.services import schema_catalog
+from app.services.schema_catalog import SchemaCatalog, introspect_csv
+
+def write_csv(path, rows):
+    with open(path, 'w') as f:
+        f.write("Timestamp,CO2_Emissions_kg,Facility\n")
+        for i in range(rows):
+            f.write(f"2024-01-{i % 28 + 1:02d},{100 + i % 50}.5,Plant {i % 3}\n")
+    return str(path)
+
+def test_small_file_is_counted_exactly(tmp_path):
+    described = introspect_csv(write_csv(tmp_path / "small.csv", 40))
+    assert described["row_count"] == 40 and described["row_count_exact"]
+    assert "Month" in {column["name"] for column in described["columns"]}
+
+def test_large_file_is_estimated_without_reading_every_line(tmp_path, monkeypatch):
+    path = write_csv(tmp_path / "large.csv", 20000)
+    real_open = builtins.open
+    lines_read = []
+
+    class CountingFile:
+        def __init__(self, f):
+            self._f = f
+        def __iter__(self):
+            for line in self._f:
+                lines_read.append(1)
+                yield line
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            self._f.close()
+
+    monkeypatch.setattr(schema_catalog, "open", lambda *a, **k: CountingFile(real_open(*a, **k)), raising=False)
+    described = introspect_csv(path)
+    assert not described["row_count_exact"]
+    assert described["row_count"] == pytest.approx(20000, rel=0.05)
+    assert len(lines_read) <= 102
+
+class NoSnapshotStore:
+    """A store that never has data loaded, and fails if asked to load it"""
+
+    def subscribe(self, callback):
+        pass
+
+    def peek(self):
+        return None
+
+    def get(self):
+        raise AssertionError("the catalog must not load the dataset")
+
+def database_offline():
+    raise LookupError("offline")
+
+def test_unknown_metric_is_rejected_from_the_header(tmp_path, monkeypatch):
+    path = write_csv(tmp_path / "data.csv", 500)
+    monkeypatch.setattr(schema_catalog, "introspect_database", database_offline)
+    monkeypatch.setattr(schema_catalog, "introspect_csv", lambda: introspect_csv(path))
+    catalog = SchemaCatalog(store=NoSnapshotStore())
+    catalog.require_column("CO2_Emissions_kg")
+    catalog.require_column("Sustainability_Score")
+    with pytest.raises(HTTPException) as error:
+        catalog.require_column("Nope")
+    assert error.value.status_code == 400
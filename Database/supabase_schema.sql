@@ -185,7 +185,9 @@ CREATE TABLE audit_log (
 -- Indexes
 CREATE INDEX idx_datasets_status ON datasets(status);
 CREATE INDEX idx_dashboard_data_expires_at ON dashboard_data(expires_at);
+CREATE INDEX idx_dashboard_data_cache_key ON dashboard_data(data_type, (data->>'cache_key'));
 CREATE INDEX idx_ai_insights_priority ON ai_insights(priority);
+CREATE INDEX idx_ml_training_jobs_status_created ON ml_training_jobs(status, created_at DESC);
 
 -- Triggers for updated_at
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -197,4 +199,69 @@ END;
 $$ LANGUAGE 'plpgsql';
 
 CREATE TRIGGER update_datasets_updated_at BEFORE UPDATE ON datasets
-FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+-- Indexes for filtered reads of the sustainability table (created by data import,
+-- not by this script). The backend pushes time windows and facility/region/supplier
+-- filters into parameterized queries; "Timestamp" should be a TIMESTAMP column.
+DO $$
+BEGIN
+    IF to_regclass('public.sustainability_table') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS idx_sustainability_timestamp ON sustainability_table ("Timestamp");
+        CREATE INDEX IF NOT EXISTS idx_sustainability_facility_timestamp ON sustainability_table ("Facility", "Timestamp");
+        CREATE INDEX IF NOT EXISTS idx_sustainability_region_timestamp ON sustainability_table ("Region", "Timestamp");
+    END IF;
+END $$;
+
+-- Change notifications: the backend LISTENs on 'data_changes' and refreshes its
+-- dataset, model and response caches when these tables change. Identical payloads
+-- within one transaction are delivered once, so bulk writes send one notification
+-- per table (per dataset for uploaded data).
+CREATE OR REPLACE FUNCTION notify_data_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed_dataset UUID;
+BEGIN
+    IF TG_LEVEL = 'ROW' THEN
+        IF TG_TABLE_NAME = 'datasets' THEN
+            changed_dataset := COALESCE(NEW.id, OLD.id);
+        ELSE
+            changed_dataset := COALESCE(NEW.dataset_id, OLD.dataset_id);
+        END IF;
+    END IF;
+    PERFORM pg_notify('data_changes', json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'dataset_id', changed_dataset
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE 'plpgsql';
+
+CREATE TRIGGER notify_datasets_change AFTER INSERT OR UPDATE OR DELETE ON datasets
+FOR EACH ROW EXECUTE FUNCTION notify_data_change();
+
+CREATE TRIGGER notify_dataset_data_change AFTER INSERT OR UPDATE OR DELETE ON dataset_data
+FOR EACH ROW EXECUTE FUNCTION notify_data_change();
+
+-- The table the backend reads is TABLE_NAME (default sustainability_table) and is
+-- created by data import; one notification per statement. When TABLE_NAME is set to
+-- another table, run SELECT watch_table_changes('<TABLE_NAME>') once it exists.
+CREATE OR REPLACE FUNCTION watch_table_changes(watched_table TEXT)
+RETURNS VOID AS $$
+BEGIN
+    EXECUTE format('DROP TRIGGER IF EXISTS notify_sustainability_change ON %s', watched_table::regclass);
+    EXECUTE format(
+        'CREATE TRIGGER notify_sustainability_change '
+        'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s '
+        'FOR EACH STATEMENT EXECUTE FUNCTION notify_data_change()',
+        watched_table::regclass
+    );
+END;
+$$ LANGUAGE 'plpgsql';
+
+DO $$
+BEGIN
+    IF to_regclass('public.sustainability_table') IS NOT NULL THEN
+        PERFORM watch_table_changes('public.sustainability_table');
+    END IF;
+END $$;